@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Serve it with an ASGI server (e.g. ``uvicorn DjangoProject.asgi:application``)
+so async views such as cron_dispatch run on the event loop instead of holding
+a worker thread while they wait.
 """
 
 import os
@@ -22,6 +22,16 @@ load_dotenv(BASE_DIR / '.env')
 
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
+# Shared Gemini client (ecotrack/llm.py): 'gemini' or 'fake' (canned local responses for tests/offline runs)
+GEMINI_BACKEND = os.getenv('GEMINI_BACKEND', 'gemini')
+GEMINI_TIMEOUT = 30  # seconds per request
+GEMINI_MAX_CONCURRENCY = 8  # concurrent requests per process
+GEMINI_MAX_RETRIES = 2
+
+# Optional JSON file with emission factor overrides (same shape as ecotrack.emission_factors.CONFIG).
+# Workers pick up changes to this file without a restart.
+EMISSION_FACTORS_FILE = os.getenv('EMISSION_FACTORS_FILE', '')
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -92,6 +102,52 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The 'ai' cache stores Gemini-generated content (suggestions, questions). Point AI_CACHE_BACKEND /
+# AI_CACHE_LOCATION at a file, database or shared cache so all workers reuse the same entries.
+# The 'dashboard' cache stores per-user get_user_data snapshots (ecotrack/dashboard_cache.py); use a
+# shared backend in production, e.g. DASHBOARD_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# with DASHBOARD_CACHE_LOCATION=redis://127.0.0.1:6379/1.
+# The 'notifications' cache carries the subscription change feed from the web processes to the
+# notification_scheduler.py daemon (ecotrack/notification_wheel.py). It must be shared between them
+# (NOTIFICATION_CACHE_BACKEND / NOTIFICATION_CACHE_LOCATION); with a process-local backend the daemon
+# polls the database for changed subscriptions instead.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'ai': {
+        'BACKEND': os.getenv('AI_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('AI_CACHE_LOCATION', 'ecotrack-ai'),
+    },
+    'dashboard': {
+        'BACKEND': os.getenv('DASHBOARD_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DASHBOARD_CACHE_LOCATION', 'ecotrack-dashboard'),
+    },
+    'notifications': {
+        'BACKEND': os.getenv('NOTIFICATION_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('NOTIFICATION_CACHE_LOCATION', 'ecotrack-notifications'),
+    },
+}
+
+AI_CACHE_ALIAS = 'ai'
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+DASHBOARD_CACHE_TTL = 60 * 60 * 24
+NOTIFICATION_WHEEL_CACHE_ALIAS = 'notifications'
+
+# Gemini suggestions are regenerated after this many seconds, stale ones are still served meanwhile
+AI_SUGGESTIONS_TTL = 60 * 60 * 24
+AI_SUGGESTIONS_STALE_TTL = 60 * 60 * 24 * 7
+# Check-in questions are pre-generated nightly by `manage.py pregenerate_questions` for new habit sets
+# (it needs a shared AI cache backend, e.g. file-based, so the web workers see the pre-generated entries)
+AI_QUESTIONS_TTL = 60 * 60 * 24 * 2
+AI_QUESTIONS_STALE_TTL = 60 * 60 * 24 * 7
+# Gemini verdicts for check-in answers the local scorer cannot classify
+AI_VERDICT_TTL = 60 * 60 * 24 * 30
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -149,6 +205,25 @@ FIREBASE_MESSAGING_SENDER_ID = os.getenv('FIREBASE_MESSAGING_SENDER_ID', '')
 FIREBASE_APP_ID = os.getenv('FIREBASE_APP_ID', '')
 FIREBASE_VAPID_KEY = os.getenv('FIREBASE_VAPID_KEY', '')  # Firebase Web Push VAPID key
 
+# How cron_dispatch sends reminders: 'batch' (FCM send_each), 'single' (one request per token, for
+# environments where batch sending is blocked) or 'topic' (one shared message per minute to the
+# reminder-HHMM topic, batch sends for tokens not in the topic)
+FCM_DISPATCH_MODE = os.getenv('FCM_DISPATCH_MODE', 'batch')
+# Reminders an outbox worker claims and sends at a time (capped at 500, one FCM send_each call)
+FCM_BATCH_SIZE = 500
+# Concurrent per-token sending (firebase_service.ConcurrentFCMSender)
+FCM_MAX_WORKERS = 16
+FCM_RATE_LIMIT = 600000 / 60  # messages per second (FCM default project quota is 600k per minute)
+
+# Notification outbox (ecotrack/outbox.py). cron_dispatch queues each minute's reminders and, unless
+# OUTBOX_INLINE_DELIVERY is False (when `manage.py process_outbox --loop` workers run), delivers them
+# on a background thread of the web process.
+OUTBOX_INLINE_DELIVERY = True
+OUTBOX_LEASE_SECONDS = 120  # a claimed reminder is re-claimed if its worker has not finished by then
+OUTBOX_MAX_ATTEMPTS = 3
+OUTBOX_RETRY_DELAY = 60  # seconds before a transient failure is retried
+OUTBOX_RETENTION_DAYS = 14  # sent and failed reminders are deleted by `manage.py purge_outbox` after this
+
 # Email for VAPID claims
 VAPID_CLAIMS_EMAIL = "mailto:admin@ecotrack.com"
 
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the concurrent FCM sender.
+Sends synthetic reminders through StubTransport (simulated network latency and
+transient failures, nothing leaves the machine) at different worker counts.
+
+Usage: python benchmark_fcm.py [--messages 2000] [--workers 1 8 32 64] [--latency 0.05]
+                               [--failure-rate 0.01] [--rate 10000]
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoProject.settings')
+
+import django
+
+django.setup()
+
+from ecotrack.firebase_service import ConcurrentFCMSender, StubTransport
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000, help="Messages per run")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32, 64], help="Worker counts to compare")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per FCM request")
+    parser.add_argument("--failure-rate", type=float, default=0.01, help="Fraction of requests failing with 503")
+    parser.add_argument("--rate", type=float, default=10000, help="Rate limit in messages per second")
+    args = parser.parse_args()
+
+    notifications = [
+        {"token": f"stub-token-{i}", "title": "EcoTrack Reminder", "body": "Time to track your footprints 🌱"}
+        for i in range(args.messages)
+    ]
+
+    print(f"{args.messages} messages, {args.latency * 1000:.0f} ms latency, "
+          f"{args.failure_rate:.1%} transient failures, rate limit {args.rate:.0f}/s")
+    print(f"{'workers':>8} {'elapsed':>9} {'msg/s':>9} {'sent':>7} {'failed':>7} {'retries':>8}")
+    for workers in args.workers:
+        transport = StubTransport(latency=args.latency, failure_rate=args.failure_rate, seed=42)
+        sender = ConcurrentFCMSender(transport=transport, max_workers=workers, rate=args.rate, backoff_base=0.01)
+        report = sender.send(notifications)
+        print(f"{workers:>8} {report.elapsed:>8.2f}s {report.throughput:>9.0f} "
+              f"{report.success_count:>7} {report.failure_count:>7} {report.retry_count:>8}")
+
+
+if __name__ == "__main__":
+    main()
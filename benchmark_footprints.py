@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the batch carbon footprint engine.
+Compares calculate_personal_carbon_footprint (one survey at a time) with
+calculate_personal_carbon_footprint_batch (full result dicts) and
+calculate_personal_monthly_co2e_batch (totals only) on synthetic survey data.
+
+Usage: python benchmark_footprints.py [--sizes 10000 100000 1000000] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ecotrack.utils import (CONFIG, calculate_personal_carbon_footprint,
+                            calculate_personal_carbon_footprint_batch, calculate_personal_monthly_co2e_batch)
+
+
+def generate_survey(rng):
+    """Generate one random baseline survey in the format submitted by survey_form.html"""
+    factors = CONFIG["factors"]
+    multipliers = CONFIG["multipliers"]
+    num_vehicles = rng.randint(0, 3)
+    num_flights = rng.randint(0, 4)
+
+    survey = {
+        "how_many_people_are_in_your_household": rng.randint(1, 6),
+        "how_much_electricity_does_your_household_use_per_month": rng.randint(50, 1500),
+        "is_your_electricity_from_renewable_sources": rng.choice(list(factors["EF_ELECTRICITY"])),
+        "what_is_your_primary_heating_source": rng.choice(list(factors["EF_HEATING"])),
+        "what_percentage_of_your_monthly_electricity_consumption_do_you_think_is_used_for_heating": rng.randint(0, 60),
+        "how_many_vehicles_are_in_your_household": num_vehicles,
+        "how_much_distance_do_you_commute_in_public_transport_per_week_on_average": rng.randint(0, 200),
+        "how_many_flights_have_you_taken_in_the_past_year": num_flights,
+        "what_best_describes_your_diet": rng.choice(list(factors["EF_DIET"])),
+        "how_much_food_do_you_waste": rng.choice(list(multipliers["FOOD_WASTE"])),
+        "how_much_of_your_food_is_packaged_processed": rng.choice(list(multipliers["FOOD_PACKAGING"])),
+        "do_you_compost_food_waste": rng.choice(["All", "Some", "None"]),
+        "how_often_do_you_buy_new_clothes_electronics_or_appliances": rng.choice(list(multipliers["SHOPPING"])),
+        "how_much_water_does_your_household_use_per_month_in_litres": rng.randint(1000, 20000),
+        "do_you_offset_your_carbon_emissions": rng.choice(["Yes", "No"]),
+    }
+    for i in range(1, num_vehicles + 1):
+        survey[f"vehicle_{i}_type"] = rng.choice(list(factors["EF_VEHICLE_PER_KM"]))
+        survey[f"vehicle_{i}_mileage"] = rng.randint(1000, 30000)
+    for i in range(1, num_flights + 1):
+        survey[f"flight_{i}_type"] = rng.choice(list(factors["EF_FLIGHT"]))
+    for mat in ["glass", "metal", "plastic", "paper"]:
+        if rng.random() < 0.5:
+            survey[f"do_you_recycle_the_following_check_all_that_apply_{mat}"] = "on"
+    return survey
+
+
+def run_benchmark(size, rng):
+    """Time all implementations on `size` surveys and check they agree"""
+    surveys = [generate_survey(rng) for _ in range(size)]
+
+    start = time.perf_counter()
+    scalar_results = [calculate_personal_carbon_footprint(survey) for survey in surveys]
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_results = calculate_personal_carbon_footprint_batch(surveys)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_totals = calculate_personal_monthly_co2e_batch(surveys)
+    totals_seconds = time.perf_counter() - start
+
+    identical = (scalar_results == batch_results and
+                 [result['summary']['personal_monthly_co2e_kg'] for result in scalar_results] == batch_totals)
+    print(f"{size:>10,} users | scalar {scalar_seconds:7.2f}s | "
+          f"batch {batch_seconds:7.2f}s ({scalar_seconds / batch_seconds:5.1f}x) | "
+          f"totals only {totals_seconds:7.2f}s ({scalar_seconds / totals_seconds:5.1f}x) | identical: {identical}")
+    return identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print("Benchmarking carbon footprint calculation...")
+    all_identical = all([run_benchmark(size, rng) for size in args.sizes])
+    if not all_identical:
+        print("\nBatch results differ from the scalar function! ❌")
+        sys.exit(1)
+    print("\nBenchmark completed successfully! ✅")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Community, CommunityMembership, CommunityMessage, CommunityTask, TaskParticipation
+from .models import User, Community, CommunityMembership, CommunityMessage, CommunityTask, TaskParticipation, NotificationCopy, NotificationOutbox, Habit, HabitCheckIn
 
 
 @admin.register(Community)
@@ -47,5 +47,35 @@ class TaskParticipationAdmin(admin.ModelAdmin):
     search_fields = ['user__username', 'task__title']
 
 
+@admin.register(NotificationCopy)
+class NotificationCopyAdmin(admin.ModelAdmin):
+    list_display = ['text', 'is_active', 'created_at']
+    list_filter = ['is_active', 'created_at']
+    search_fields = ['text']
+    readonly_fields = ['text_hash', 'created_at']
+
+
+@admin.register(Habit)
+class HabitAdmin(admin.ModelAdmin):
+    list_display = ['user', 'text', 'created_at']
+    search_fields = ['user__username', 'text']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(HabitCheckIn)
+class HabitCheckInAdmin(admin.ModelAdmin):
+    list_display = ['habit', 'date', 'completed']
+    list_filter = ['completed', 'date']
+    search_fields = ['habit__user__username', 'habit__text']
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['subscription', 'scheduled_for', 'status', 'attempts', 'lease_owner', 'sent_at']
+    list_filter = ['status', 'scheduled_for']
+    search_fields = ['subscription__user__username', 'last_error']
+    readonly_fields = ['created_at', 'sent_at', 'lease_owner', 'lease_expires_at']
+
+
 # Register your models here.
 admin.site.register(User)
\ No newline at end of file
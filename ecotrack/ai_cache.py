@@ -0,0 +1,94 @@
+"""
+Caching for Gemini-generated content in EcoTrack.
+Generated content that depends only on a user's habits is stored in the Django
+cache (the 'ai' alias in settings.CACHES) under a fingerprint of the habit list,
+with a TTL and stale-while-revalidate: stale entries are served immediately while
+a background thread regenerates them.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+
+def get_ai_cache():
+    """Return the cache backend used for generated content."""
+    return caches[getattr(settings, 'AI_CACHE_ALIAS', 'default')]
+
+
+def is_shared() -> bool:
+    """Whether entries stored by one process are seen by the others (not a locmem or dummy backend)."""
+    return not isinstance(get_ai_cache(), (LocMemCache, DummyCache))
+
+
+def habits_fingerprint(habits: list) -> str:
+    """
+    Return a stable hash of a habit list.
+    Only the habit texts matter (ids, order, case and surrounding whitespace are ignored).
+    """
+    texts = sorted({
+        ' '.join(str(habit.get('text') or '').split()).lower()
+        for habit in habits or []
+        if isinstance(habit, dict)
+    })
+    return hashlib.sha256(json.dumps(texts).encode()).hexdigest()[:32]
+
+
+def store(key: str, value, ttl: int, stale_ttl: int = 0):
+    """Store a generated value for key, fresh for ttl seconds and kept stale for stale_ttl more."""
+    get_ai_cache().set(key, {'value': value, 'fresh_until': time.time() + ttl}, timeout=ttl + stale_ttl)
+
+
+def get_cached(key: str):
+    """Return the cached value for key (fresh or stale) without generating it, or None."""
+    entry = get_ai_cache().get(key)
+    return entry['value'] if entry is not None else None
+
+
+def needs_refresh(key: str, within: int = 0) -> bool:
+    """Return True if key is missing or stops being fresh within the next `within` seconds."""
+    entry = get_ai_cache().get(key)
+    return entry is None or entry['fresh_until'] <= time.time() + within
+
+
+def _refresh(key: str, generate: Callable, ttl: int, stale_ttl: int):
+    lock_key = f'{key}:refreshing'
+    try:
+        store(key, generate(), ttl, stale_ttl)
+    except Exception as e:
+        logger.error(f"Failed to refresh cached content for {key}: {type(e).__name__} - {e}")
+    finally:
+        get_ai_cache().delete(lock_key)
+
+
+def get_or_generate(key: str, generate: Callable, ttl: int, stale_ttl: int = 0):
+    """
+    Return the cached value for key, generating it on a miss.
+
+    Fresh entries (younger than ttl) are returned as is. Stale entries (up to
+    stale_ttl past ttl) are returned immediately and regenerated in a background
+    thread; only one refresh per key runs at a time.
+    """
+    cache = get_ai_cache()
+    entry = cache.get(key)
+
+    if entry is None:
+        value = generate()
+        store(key, value, ttl, stale_ttl)
+        return value
+
+    if entry['fresh_until'] <= time.time() and cache.add(f'{key}:refreshing', True, timeout=300):
+        threading.Thread(target=_refresh, args=(key, generate, ttl, stale_ttl), daemon=True).start()
+
+    return entry['value']
+
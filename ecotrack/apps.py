@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EcotrackConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ecotrack'
+
+    def ready(self):
+        from . import signals  # noqa: F401
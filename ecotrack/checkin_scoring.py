@@ -0,0 +1,155 @@
+"""
+Local scoring for the daily check-in questionnaire.
+Each answer scores 1 if it helps the user reduce their carbon footprint and 0 if it
+does not. Answers are classified with keyword rules (the verdicts are stored on the
+question set when it is generated); only answers the rules cannot classify are sent
+to the LLM, and its verdicts are cached.
+"""
+
+import hashlib
+import logging
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .ai_cache import get_ai_cache
+
+logger = logging.getLogger(__name__)
+
+# Answers that affirm / deny / partially affirm the question
+YES_WORDS = {"yes", "yeah", "always", "all", "definitely"}
+NO_WORDS = {"no", "not", "none", "never", "nope"}
+PARTIAL_WORDS = {"some", "partially", "partly", "sometimes", "mostly", "most", "a few", "few"}
+
+# Questions about something that increases the footprint ("Did you consume meat today?")
+NEGATIVE_QUESTION_KEYWORDS = [
+    "meat", "beef", "pork", "chicken", "car", "drive", "drove", "taxi", "uber", "flight", "fly", "flew",
+    "plastic", "single-use", "disposable", "bottled", "waste", "wasted", "throw", "threw", "trash",
+    "takeout", "take-out", "delivery", "fast fashion", "buy new", "bought new", "shopping",
+    "air conditioning", "ac", "heater", "long shower", "leave on", "left on",
+]
+# Words that turn such a question around ("Did you avoid single-use plastic?"); questions that
+# mention a helpful choice ("Did you compost food waste?") are never treated as negative either
+NEGATION_KEYWORDS = ["avoid", "avoided", "skip", "skipped", "reduce", "reduced", "refuse", "refused",
+                     "instead of", "without", "less", "fewer", "cut down", "turn off", "turned off"]
+
+# Option values that describe a helpful / harmful choice ("Walk/Cycle", "Car (single)")
+POSITIVE_OPTION_KEYWORDS = [
+    "walk", "walked", "cycle", "cycled", "cycling", "bike", "biked", "bicycle", "public transport",
+    "bus", "train", "metro", "tram", "subway", "carpool", "car pool", "car-pool", "plant-based",
+    "plant based", "vegan", "vegetarian", "work from home", "worked from home", "remote", "reusable",
+    "recycled", "recycle", "composted", "compost", "renewable", "solar", "led", "line dry", "air dry",
+    "cold wash", "unplugged", "local", "secondhand", "second-hand", "repaired",
+]
+NEGATIVE_OPTION_KEYWORDS = [
+    "car (single)", "single", "alone", "solo", "personal vehicle", "drove", "taxi", "uber", "flight",
+    "meat", "beef", "disposable", "single-use", "landfill", "trash", "bottled", "fast fashion",
+]
+
+
+def _normalize(text) -> str:
+    """Lowercase and strip emojis/punctuation (keeping hyphens and parentheses)."""
+    text = re.sub(r"[^a-z0-9\s\-()/,']", " ", str(text).lower())
+    return " ".join(text.split())
+
+
+def _contains(text: str, keywords: List[str]) -> bool:
+    return any(re.search(rf"(?<![a-z]){re.escape(keyword)}(?![a-z])", text) for keyword in keywords)
+
+
+def _answer_kind(value: str) -> Optional[str]:
+    """Return 'yes', 'no' or 'partial' for yes/no style answers, None otherwise."""
+    words = re.split(r"[\s,()/]+", value)
+    first, first_two = words[0], " ".join(words[:2])
+    if first in NO_WORDS:
+        return "no"
+    if first in YES_WORDS:
+        return "yes"
+    if first in PARTIAL_WORDS or first_two in PARTIAL_WORDS:
+        return "partial"
+    return None
+
+
+def classify_answer(question: str, value: str) -> Optional[int]:
+    """
+    Classify one answer with the keyword rules.
+
+    Returns 1 if the answer helps reduce the footprint, 0 if it does not and
+    None if the rules cannot tell.
+    """
+    question, value = _normalize(question), _normalize(value)
+    if not value:
+        return None
+
+    kind = _answer_kind(value)
+    if kind is not None:
+        question_is_negative = (_contains(question, NEGATIVE_QUESTION_KEYWORDS) and
+                                not _contains(question, NEGATION_KEYWORDS) and
+                                not _contains(question, POSITIVE_OPTION_KEYWORDS))
+        if kind == "partial":
+            return 0 if question_is_negative else 1
+        return int((kind == "yes") != question_is_negative)
+
+    positive = _contains(value, POSITIVE_OPTION_KEYWORDS)
+    negative = _contains(value, NEGATIVE_OPTION_KEYWORDS)
+    if positive != negative:
+        return int(positive)
+    return None
+
+
+def annotate_questions(questions: list) -> list:
+    """Store the rule verdict of every option on the question set as option['helpful']."""
+    for question in questions:
+        for option in question.get("options", []):
+            option["helpful"] = classify_answer(question.get("question", ""), option.get("value", ""))
+    return questions
+
+
+def _verdict_cache_key(question: str, value: str) -> str:
+    digest = hashlib.sha256(f"{_normalize(question)}\n{_normalize(value)}".encode()).hexdigest()[:32]
+    return f"checkin_verdict:{digest}"
+
+
+def score_answers(answers: Dict[str, str], questions: Optional[list] = None,
+                  judge: Optional[Callable[[List[Tuple[str, str]]], List[int]]] = None) -> int:
+    """
+    Score a submitted questionnaire ({question text: chosen option value}).
+
+    Verdicts stored on the question set are used first, then the keyword rules,
+    then cached LLM verdicts. Remaining answers are sent to `judge` in one call
+    (it returns a 0/1 verdict per (question, answer) pair) and its verdicts are
+    cached. Answers that cannot be classified at all score 0.
+    """
+    stored = {}
+    for question in questions or []:
+        for option in question.get("options", []):
+            stored[(question.get("question"), option.get("value"))] = option.get("helpful")
+
+    cache = get_ai_cache()
+    score = 0
+    unknown = []
+    for question, value in answers.items():
+        verdict = stored.get((question, value))
+        if verdict is None:
+            verdict = classify_answer(question, value)
+        if verdict is None:
+            verdict = cache.get(_verdict_cache_key(question, value))
+        if verdict is None:
+            unknown.append((question, value))
+        else:
+            score += int(verdict)
+
+    if unknown and judge is not None:
+        try:
+            verdicts = judge(unknown)
+        except Exception as e:
+            logger.error(f"Failed to judge check-in answers: {type(e).__name__} - {e}")
+            verdicts = []
+        ttl = getattr(settings, 'AI_VERDICT_TTL', None)
+        for (question, value), verdict in zip(unknown, verdicts):
+            verdict = 1 if verdict else 0
+            cache.set(_verdict_cache_key(question, value), verdict, timeout=ttl)
+            score += verdict
+
+    return score
@@ -0,0 +1,92 @@
+"""
+Per-user snapshot cache for the get_user_data dashboard payload.
+The encoded JSON body is stored in the Django cache (the 'dashboard' alias in
+settings.CACHES: locmem by default, Redis or another shared backend in
+production) together with the ETag it was built for. Writes that change the
+dashboard invalidate the snapshot once their transaction commits, and a snapshot
+whose ETag no longer matches the user is ignored, so a read that raced a write
+never serves stale data. Hits, misses and invalidations are counted in the same
+cache for hit-rate reporting.
+"""
+
+import logging
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'dashboard:snapshot:{}'
+STAT_KEYS = {
+    'hits': 'dashboard:stats:hits',
+    'misses': 'dashboard:stats:misses',
+    'invalidations': 'dashboard:stats:invalidations',
+}
+
+
+def get_dashboard_cache():
+    """Return the cache backend used for dashboard snapshots."""
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def is_shared() -> bool:
+    """Whether snapshots and counters are shared between processes (not a locmem or dummy backend)."""
+    return not isinstance(get_dashboard_cache(), (LocMemCache, DummyCache))
+
+
+def _count(stat: str, amount: int = 1):
+    cache = get_dashboard_cache()
+    key = STAT_KEYS[stat]
+    try:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, amount, timeout=None)
+
+
+def get_snapshot(user_id: int, etag: str) -> Optional[bytes]:
+    """Return the cached JSON body for the user if it was built for `etag`, else None."""
+    entry = get_dashboard_cache().get(SNAPSHOT_KEY.format(user_id))
+    if entry is not None and entry['etag'] == etag:
+        _count('hits')
+        return entry['body']
+    _count('misses')
+    return None
+
+
+def store_snapshot(user_id: int, etag: str, body: bytes):
+    get_dashboard_cache().set(
+        SNAPSHOT_KEY.format(user_id), {'etag': etag, 'body': body},
+        timeout=getattr(settings, 'DASHBOARD_CACHE_TTL', 60 * 60 * 24),
+    )
+
+
+def invalidate(user_ids: Iterable[int]):
+    """Drop the snapshots of the given users once the current transaction commits."""
+    keys = [SNAPSHOT_KEY.format(user_id) for user_id in user_ids]
+    if not keys:
+        return
+
+    def drop():
+        get_dashboard_cache().delete_many(keys)
+        _count('invalidations', len(keys))
+
+    transaction.on_commit(drop)
+
+
+def stats() -> Dict[str, float]:
+    """Hit, miss and invalidation counts since the last reset, and the hit rate."""
+    values = get_dashboard_cache().get_many(STAT_KEYS.values())
+    result = {stat: values.get(key, 0) for stat, key in STAT_KEYS.items()}
+    reads = result['hits'] + result['misses']
+    result['hit_rate'] = result['hits'] / reads if reads else 0.0
+    return result
+
+
+def reset_stats():
+    get_dashboard_cache().delete_many(list(STAT_KEYS.values()))
@@ -0,0 +1,182 @@
+"""
+Compiled emission-factor tables for the EcoTrack footprint calculators.
+CONFIG is compiled once into flat, immutable tables: every categorical answer is
+mapped to an integer code that indexes its factor, and scalar factors/constants
+live in one flat mapping. The active tables can be hot-reloaded with a new factor
+set without restarting workers.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CONFIG = {
+    "factors": {
+        "EF_ELECTRICITY": {"Yes": 0.05, "Partially": 0.25, "No": 0.475},
+        "EF_HEATING": {
+            "Natural Gas": 0.2, "Electricity": 0.45, "Oil": 0.27,
+            "Propane": 0.24, "Wood": 0.015, "Other": 0.3
+        },
+        "EF_VEHICLE_PER_KM": {
+            "Gasoline": 0.18, "Diesel": 0.17, "Hybrid": 0.12, "Electric": 0.05
+        },
+        "EF_FLIGHT": {"Short-haul (<3h)": 1100, "Medium-haul (3-6h)": 3000, "Long-haul (>6h)": 8000},
+        "EF_FLIGHT_PER_KM": 0.15,
+        "EF_DIET": {
+            "Vegan": 1600 / 12, "Vegetarian": 1900 / 12, "Pescatarian": 2100 / 12,
+            "Omnivore": 2500 / 12, "High Meat": 3300 / 12
+        },
+        "EF_PUBLIC_TRANSPORT_PER_KM": 0.1,
+        "EF_WASTE_LANDFILL": 0.45,
+        "EF_WATER_PER_LITRE": 0.0005
+    },
+    "multipliers": {
+        "FOOD_WASTE": {"Very little": 0.9, "Below average": 1.0, "Average": 1.2, "Above average": 1.5},
+        "FOOD_PACKAGING": {"Very little": 0.9, "Below average": 1.0, "Average": 1.3, "Above average": 1.6},
+        "SHOPPING": {"Rarely": 50, "Sometimes": 100, "Often": 200}
+    },
+    "constants": {
+        "HOUSEHOLD_SIZE_DEFAULT": 1,
+        "WEEKS_PER_MONTH": 4.33,
+        "MONTHS_PER_YEAR": 12,
+        "DAYS_PER_MONTH": 30,
+        "WASTE_PER_PERSON_PER_DAY_KG": 1.2,
+        "RECYCLING_DIVERSION_PER_ITEM": 0.05,
+        "COMPOST_DIVERSION": 0.15,
+        "OFFSET_PERCENTAGE": 0.10
+    }
+}
+
+# Categorical tables: name -> (CONFIG section, table, answer used when the question is
+# missing, factor used for unknown answers; None means the default answer's factor)
+CATEGORICAL_TABLES = {
+    "electricity": ("factors", "EF_ELECTRICITY", "No", None),
+    "heating": ("factors", "EF_HEATING", "Natural Gas", None),
+    "vehicle": ("factors", "EF_VEHICLE_PER_KM", "Gasoline", None),
+    "flight": ("factors", "EF_FLIGHT", "Short-haul (<3h)", 2000),
+    "diet": ("factors", "EF_DIET", "Omnivore", None),
+    "food_waste": ("multipliers", "FOOD_WASTE", "Average", 1.2),
+    "food_packaging": ("multipliers", "FOOD_PACKAGING", "Average", 1.3),
+    "shopping": ("multipliers", "SHOPPING", "Sometimes", 100),
+}
+
+# How often (in seconds) the EMISSION_FACTORS_FILE setting is checked for changes
+RELOAD_CHECK_INTERVAL = 30
+
+
+class CategoricalTable:
+    """An enum-coded factor table: answers map to codes, codes index the factors."""
+
+    __slots__ = ('default_answer', 'codes', 'values', 'array', 'unknown_code')
+
+    def __init__(self, factors: dict, default_answer: str, fallback=None):
+        if fallback is None:
+            fallback = factors[default_answer]
+        self.default_answer = default_answer
+        self.codes = MappingProxyType({answer: code for code, answer in enumerate(factors)})
+        # The last slot holds the factor for answers that are not in the table
+        self.unknown_code = len(factors)
+        self.values = tuple(factors.values()) + (fallback,)
+        self.array = np.array(self.values, dtype=float)
+        self.array.flags.writeable = False
+
+    def code(self, answer) -> int:
+        """Returns the slot of an answer (unknown answers map to the fallback slot)."""
+        return self.codes.get(answer, self.unknown_code)
+
+    def lookup(self, data: dict, key: str):
+        """Returns the factor for the survey's answer to `key`."""
+        return self.values[self.codes.get(data.get(key, self.default_answer), self.unknown_code)]
+
+    def encode(self, surveys: list, key: str) -> np.ndarray:
+        """Returns the codes of every survey's answer to `key`."""
+        codes, unknown_code, default_answer = self.codes, self.unknown_code, self.default_answer
+        return np.array([codes.get(data.get(key, default_answer), unknown_code) for data in surveys], dtype=np.intp)
+
+
+class FactorTables:
+    """Immutable, compiled form of a CONFIG factor set."""
+
+    def __init__(self, config: dict):
+        self.version = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+        self.categorical = MappingProxyType({
+            name: CategoricalTable(config[section][table], default_answer, fallback)
+            for name, (section, table, default_answer, fallback) in CATEGORICAL_TABLES.items()
+        })
+        # Scalar factors and constants share one flat namespace
+        scalars = {key: value for key, value in config["factors"].items() if not isinstance(value, dict)}
+        scalars.update(config["constants"])
+        self.scalars = MappingProxyType(scalars)
+
+    def __getitem__(self, name: str) -> CategoricalTable:
+        return self.categorical[name]
+
+    def __repr__(self):
+        return f"<FactorTables version={self.version}>"
+
+
+_lock = threading.Lock()
+_active_tables = FactorTables(CONFIG)
+_file_state = {'checked_at': None, 'mtime': None}
+
+
+def _merge_config(base: dict, overrides: dict) -> dict:
+    """Returns base with overrides applied recursively (tables are merged, not replaced)."""
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_factor_tables(overrides: dict = None) -> FactorTables:
+    """
+    Compiles CONFIG (with optional overrides in the same shape) and makes it the
+    active factor set. Returns the new tables.
+    """
+    global _active_tables
+    tables = FactorTables(_merge_config(CONFIG, overrides or {}))
+    with _lock:
+        if tables.version != _active_tables.version:
+            logger.info(f"Emission factor tables reloaded: {_active_tables.version} -> {tables.version}")
+        _active_tables = tables
+    return tables
+
+
+def _reload_from_file():
+    """Reloads the tables when the EMISSION_FACTORS_FILE setting points to a changed file."""
+    path = getattr(settings, 'EMISSION_FACTORS_FILE', '') if settings.configured else ''
+    now = time.monotonic()
+    checked_at = _file_state['checked_at']
+    if not path or (checked_at is not None and now - checked_at < RELOAD_CHECK_INTERVAL):
+        return
+    _file_state['checked_at'] = now
+
+    try:
+        mtime = os.path.getmtime(path)
+        if mtime == _file_state['mtime']:
+            return
+        with open(path) as f:
+            overrides = json.load(f)
+        load_factor_tables(overrides)
+        _file_state['mtime'] = mtime
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"Failed to load emission factors from {path}: {e}")
+
+
+def get_factor_tables() -> FactorTables:
+    """Returns the active factor tables, picking up a changed factor file first."""
+    _reload_from_file()
+    return _active_tables
@@ -4,15 +4,118 @@ This module handles sending push notifications using Firebase Admin SDK.
 """
 
 import firebase_admin
-from firebase_admin import credentials, messaging
+from firebase_admin import credentials, exceptions, messaging
 from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 import logging
-from typing import List, Dict, Optional
+import random
+import threading
+import time
+from typing import Callable, List, Dict, Optional
 import json
 
 logger = logging.getLogger(__name__)
 
 
+# Maximum number of messages FCM accepts in one send_each / multicast call
+MULTICAST_LIMIT = 500
+# Maximum number of tokens in one topic subscribe / unsubscribe call
+TOPIC_MANAGEMENT_LIMIT = 1000
+
+NOTIFICATION_TTL = 3600  # seconds
+NOTIFICATION_TAG = 'daily-reminder'
+
+
+class MessageTemplate:
+    """
+    Prototype for reminder messages. The platform configs (icon, badge, tag, TTL,
+    actions) never change, so they are built once and shared by every message;
+    only the recipient, title, body and data are set per message. Title and body
+    go in the top-level notification, which FCM applies on every platform.
+    """
+    
+    def __init__(self, webpush: Optional[messaging.WebpushConfig] = None,
+                 android: Optional[messaging.AndroidConfig] = None,
+                 apns: Optional[messaging.APNSConfig] = None):
+        self.webpush = webpush
+        self.android = android
+        self.apns = apns
+    
+    def _fields(self, title: str, body: str, data: Optional[Dict]) -> Dict:
+        return {
+            'notification': messaging.Notification(title=title, body=body),
+            'data': data or {},
+            'webpush': self.webpush,
+            'android': self.android,
+            'apns': self.apns,
+        }
+    
+    def message(self, token: str, title: str, body: str, data: Optional[Dict] = None) -> messaging.Message:
+        return messaging.Message(token=token, **self._fields(title, body, data))
+    
+    def topic_message(self, topic: str, title: str, body: str, data: Optional[Dict] = None) -> messaging.Message:
+        return messaging.Message(topic=topic, **self._fields(title, body, data))
+    
+    def multicast(self, tokens: List[str], title: str, body: str,
+                  data: Optional[Dict] = None) -> messaging.MulticastMessage:
+        return messaging.MulticastMessage(tokens=tokens, **self._fields(title, body, data))
+
+
+_OPEN_APP_ACTION = messaging.WebpushNotificationAction(action='open_app', title='Open EcoTrack')
+
+_WEBPUSH_CONFIG = messaging.WebpushConfig(
+    notification=messaging.WebpushNotification(
+        icon='/static/icons/ecotrack_logo.png',
+        badge='/static/icons/favicon-32x32.png',
+        tag=NOTIFICATION_TAG,
+        actions=[_OPEN_APP_ACTION],
+    ),
+    headers={
+        'TTL': str(NOTIFICATION_TTL)  # Time to live in seconds
+    }
+)
+
+_ANDROID_CONFIG = messaging.AndroidConfig(
+    ttl=NOTIFICATION_TTL,
+    priority='high',
+    notification=messaging.AndroidNotification(tag=NOTIFICATION_TAG),
+)
+
+_APNS_CONFIG = messaging.APNSConfig(
+    headers={'apns-priority': '10'},
+    payload=messaging.APNSPayload(aps=messaging.Aps(sound='default', thread_id=NOTIFICATION_TAG)),
+)
+
+# Prebuilt templates per PushSubscription.device_type
+TEMPLATES = {
+    'web': MessageTemplate(webpush=_WEBPUSH_CONFIG),
+    'android': MessageTemplate(android=_ANDROID_CONFIG),
+    'ios': MessageTemplate(apns=_APNS_CONFIG),
+}
+
+# Topics reach every platform; web topic notifications have no action buttons
+TOPIC_TEMPLATE = MessageTemplate(
+    webpush=messaging.WebpushConfig(
+        notification=messaging.WebpushNotification(
+            icon='/static/icons/ecotrack_logo.png',
+            badge='/static/icons/favicon-32x32.png',
+            tag=NOTIFICATION_TAG,
+        ),
+        headers={
+            'TTL': str(NOTIFICATION_TTL)
+        }
+    ),
+    android=_ANDROID_CONFIG,
+    apns=_APNS_CONFIG,
+)
+
+
+def get_template(device_type: Optional[str]) -> MessageTemplate:
+    """Return the prebuilt template for a device type (web for unknown types)."""
+    return TEMPLATES.get((device_type or 'web').lower(), TEMPLATES['web'])
+
+
 class FCMService:
     """Firebase Cloud Messaging service for sending push notifications."""
     
@@ -31,8 +134,15 @@ class FCMService:
                 logger.error(f"Failed to initialize Firebase Admin SDK: {e}")
                 raise
     
+    @staticmethod
+    def build_message(token: str, title: str, body: str, data: Optional[Dict] = None,
+                      device_type: Optional[str] = 'web') -> messaging.Message:
+        """Build the FCM message for one reminder notification from the device's template."""
+        return get_template(device_type).message(token, title, body, data)
+    
     @classmethod
-    def send_notification(cls, token: str, title: str, body: str, data: Optional[Dict] = None) -> bool:
+    def send_notification(cls, token: str, title: str, body: str, data: Optional[Dict] = None,
+                          device_type: Optional[str] = 'web') -> bool:
         """
         Send a single FCM notification.
         
@@ -41,6 +151,7 @@ class FCMService:
             title: Notification title
             body: Notification body
             data: Optional data payload
+            device_type: 'web', 'android' or 'ios', selects the platform template
         
         Returns:
             bool: True if sent successfully, False otherwise
@@ -53,40 +164,8 @@ class FCMService:
                 logger.error("Empty or invalid FCM token provided")
                 return False
             
-            # Create notification
-            notification = messaging.Notification(
-                title=title,
-                body=body
-            )
-            
-            # Create data payload if provided
-            data_payload = data if data else {}
-            
-            # Create message
-            message = messaging.Message(
-                notification=notification,
-                data=data_payload,
-                token=token,
-                # Web-specific configuration
-                webpush=messaging.WebpushConfig(
-                    notification=messaging.WebpushNotification(
-                        title=title,
-                        body=body,
-                        icon='/static/icons/ecotrack_logo.png',
-                        badge='/static/icons/favicon-32x32.png',
-                        tag='daily-reminder',
-                        actions=[
-                            messaging.WebpushNotificationAction(
-                                action='open_app',
-                                title='Open EcoTrack'
-                            )
-                        ]
-                    ),
-                    headers={
-                        'TTL': '3600'  # Time to live in seconds
-                    }
-                )
-            )
+            # Create message from the prebuilt template
+            message = get_template(device_type).message(token, title, body, data)
             
             # Send message
             response = messaging.send(message)
@@ -113,7 +192,8 @@ class FCMService:
             return False
     
     @classmethod
-    def send_multicast(cls, tokens: List[str], title: str, body: str, data: Optional[Dict] = None) -> Dict:
+    def send_multicast(cls, tokens: List[str], title: str, body: str, data: Optional[Dict] = None,
+                       device_type: Optional[str] = 'web') -> Dict:
         """
         Send FCM notification to multiple tokens.
         
@@ -122,72 +202,92 @@ class FCMService:
             title: Notification title
             body: Notification body
             data: Optional data payload
+            device_type: 'web', 'android' or 'ios', selects the platform template
         
         Returns:
-            dict: Results with success_count, failure_count, and failed_tokens
+            dict: Results with success_count, failure_count, failed_tokens and
+                  errors (token -> exception for every failed token)
         """
         cls.initialize()
         
         if not tokens:
-            return {'success_count': 0, 'failure_count': 0, 'failed_tokens': []}
+            return {'success_count': 0, 'failure_count': 0, 'failed_tokens': [], 'errors': {}}
         
-        try:
-            # Create notification
-            notification = messaging.Notification(
-                title=title,
-                body=body
-            )
-            
-            # Create data payload if provided
-            data_payload = data if data else {}
-            
-            # Create multicast message
-            message = messaging.MulticastMessage(
-                notification=notification,
-                data=data_payload,
-                tokens=tokens,
-                webpush=messaging.WebpushConfig(
-                    notification=messaging.WebpushNotification(
-                        title=title,
-                        body=body,
-                        icon='/static/icons/ecotrack_logo.png',
-                        badge='/static/icons/favicon-32x32.png',
-                        tag='daily-reminder',
-                        actions=[
-                            messaging.WebpushNotificationAction(
-                                action='open_app',
-                                title='Open EcoTrack'
-                            )
-                        ]
-                    ),
-                    headers={
-                        'TTL': '3600'
-                    }
-                )
-            )
-            
-            # Send multicast message
-            response = messaging.send_multicast(message)
+        template = get_template(device_type)
+        
+        result = {'success_count': 0, 'failure_count': 0, 'failed_tokens': [], 'errors': {}}
+        for start in range(0, len(tokens), MULTICAST_LIMIT):
+            chunk = tokens[start:start + MULTICAST_LIMIT]
+            try:
+                # Create multicast message from the prebuilt template
+                message = template.multicast(chunk, title, body, data)
+                
+                # Send multicast message (send_each_for_multicast uses the HTTP v1 API,
+                # unlike send_multicast which relies on the deprecated /batch endpoint)
+                response = messaging.send_each_for_multicast(message)
+            except Exception as e:
+                logger.error(f"Failed to send multicast FCM notification: {e}")
+                result['failure_count'] += len(chunk)
+                result['failed_tokens'].extend(chunk)
+                result['errors'].update({token: e for token in chunk})
+                continue
             
             # Process response
-            failed_tokens = []
-            for i, resp in enumerate(response.responses):
+            result['success_count'] += response.success_count
+            result['failure_count'] += response.failure_count
+            for token, resp in zip(chunk, response.responses):
                 if not resp.success:
-                    failed_tokens.append(tokens[i])
-                    logger.warning(f"Failed to send to token {tokens[i][:20]}...: {resp.exception}")
-            
-            result = {
-                'success_count': response.success_count,
-                'failure_count': response.failure_count,
-                'failed_tokens': failed_tokens
-            }
+                    result['failed_tokens'].append(token)
+                    result['errors'][token] = resp.exception
+                    logger.warning(f"Failed to send to token {token[:20]}...: {resp.exception}")
+        
+        logger.info(f"Multicast FCM sent. Success: {result['success_count']}, Failed: {result['failure_count']}")
+        return result
+    
+    @classmethod
+    def send_each(cls, notifications: List[Dict]) -> Dict:
+        """
+        Send individual FCM notifications in batches of up to MULTICAST_LIMIT messages per call.
+        
+        Args:
+            notifications: List of dicts with 'token', 'title', 'body' and optional 'data'
+                           and 'device_type'
+        
+        Returns:
+            dict: Results with success_count, failure_count, failed_tokens and
+                  errors (token -> exception for every failed token)
+        """
+        cls.initialize()
+        
+        result = {'success_count': 0, 'failure_count': 0, 'failed_tokens': [], 'errors': {}}
+        for start in range(0, len(notifications), MULTICAST_LIMIT):
+            chunk = notifications[start:start + MULTICAST_LIMIT]
+            tokens = [item['token'] for item in chunk]
+            messages = [
+                cls.build_message(item['token'], item['title'], item['body'], item.get('data'),
+                                  item.get('device_type'))
+                for item in chunk
+            ]
             
-            logger.info(f"Multicast FCM sent. Success: {result['success_count']}, Failed: {result['failure_count']}")
-            return result
+            try:
+                response = messaging.send_each(messages)
+            except Exception as e:
+                logger.error(f"Failed to send FCM batch of {len(chunk)} notifications: {type(e).__name__} - {e}")
+                result['failure_count'] += len(chunk)
+                result['failed_tokens'].extend(tokens)
+                result['errors'].update({token: e for token in tokens})
+                continue
             
-        except Exception as e:
-            logger.error(f"Failed to send multicast FCM notification: {e}")
-            return {'success_count': 0, 'failure_count': len(tokens), 'failed_tokens': tokens}
+            result['success_count'] += response.success_count
+            result['failure_count'] += response.failure_count
+            for token, resp in zip(tokens, response.responses):
+                if not resp.success:
+                    result['failed_tokens'].append(token)
+                    result['errors'][token] = resp.exception
+                    logger.warning(f"Failed to send to token {token[:20]}...: {resp.exception}")
+        
+        logger.info(f"Batched FCM sent. Success: {result['success_count']}, Failed: {result['failure_count']}")
+        return result
     
     @classmethod
     def send_to_topic(cls, topic: str, title: str, body: str, data: Optional[Dict] = None) -> bool:
@@ -206,33 +306,8 @@ class FCMService:
         cls.initialize()
         
         try:
-            # Create notification
-            notification = messaging.Notification(
-                title=title,
-                body=body
-            )
-            
-            # Create data payload if provided
-            data_payload = data if data else {}
-            
-            # Create message
-            message = messaging.Message(
-                notification=notification,
-                data=data_payload,
-                topic=topic,
-                webpush=messaging.WebpushConfig(
-                    notification=messaging.WebpushNotification(
-                        title=title,
-                        body=body,
-                        icon='/static/icons/ecotrack_logo.png',
-                        badge='/static/icons/favicon-32x32.png',
-                        tag='daily-reminder'
-                    ),
-                    headers={
-                        'TTL': '3600'
-                    }
-                )
-            )
+            # Create message from the prebuilt template
+            message = TOPIC_TEMPLATE.topic_message(topic, title, body, data)
             
             # Send message
             response = messaging.send(message)
@@ -243,6 +318,43 @@ class FCMService:
             logger.error(f"Failed to send FCM topic notification: {e}")
             return False
     
+    @classmethod
+    def _manage_topic(cls, operation: Callable, tokens: List[str], topic: str) -> Dict:
+        cls.initialize()
+        
+        result = {'success_count': 0, 'failure_count': 0, 'errors': {}}
+        tokens = [token for token in tokens if token]
+        for start in range(0, len(tokens), TOPIC_MANAGEMENT_LIMIT):
+            chunk = tokens[start:start + TOPIC_MANAGEMENT_LIMIT]
+            try:
+                response = operation(chunk, topic)
+            except Exception as e:
+                logger.error(f"FCM topic update for {topic} failed for {len(chunk)} tokens: {type(e).__name__} - {e}")
+                result['failure_count'] += len(chunk)
+                result['errors'].update({token: str(e) for token in chunk})
+                continue
+            
+            result['success_count'] += response.success_count
+            result['failure_count'] += response.failure_count
+            for error in response.errors:
+                result['errors'][chunk[error.index]] = error.reason
+        return result
+    
+    @classmethod
+    def subscribe_to_topic(cls, tokens: List[str], topic: str) -> Dict:
+        """
+        Subscribe tokens to a topic, up to TOPIC_MANAGEMENT_LIMIT tokens per call.
+        
+        Returns:
+            dict: success_count, failure_count and errors (token -> reason)
+        """
+        return cls._manage_topic(messaging.subscribe_to_topic, tokens, topic)
+    
+    @classmethod
+    def unsubscribe_from_topic(cls, tokens: List[str], topic: str) -> Dict:
+        """Unsubscribe tokens from a topic; same batching and result as subscribe_to_topic."""
+        return cls._manage_topic(messaging.unsubscribe_from_topic, tokens, topic)
+    
     @classmethod
     def validate_token(cls, token: str) -> bool:
         """
@@ -270,4 +382,210 @@ class FCMService:
             return False
         except Exception as e:
             logger.error(f"validate_token: Exception during token validation: {type(e).__name__} - {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    # Errors meaning the token will never work again
+    DEAD_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+    
+    @classmethod
+    def is_dead_token_error(cls, error: Optional[Exception], dry_run: bool = False) -> bool:
+        """
+        Tell whether a send error means the token is dead. For dry-run validation of a
+        bare data message an invalid-argument error can only be caused by the token.
+        """
+        if dry_run and isinstance(error, exceptions.InvalidArgumentError):
+            return True
+        return isinstance(error, cls.DEAD_TOKEN_ERRORS)
+    
+    @classmethod
+    def validate_tokens(cls, tokens: List[str]) -> Dict[str, List[str]]:
+        """
+        Validate FCM tokens with dry-run multicast sends, MULTICAST_LIMIT tokens per call.
+        
+        Args:
+            tokens: FCM registration tokens
+        
+        Returns:
+            dict: 'valid' and 'invalid' tokens, and 'unknown' tokens whose check failed
+                  for another reason (network, quota) and should be retried later
+        """
+        cls.initialize()
+        
+        result = {'valid': [], 'invalid': [], 'unknown': []}
+        for start in range(0, len(tokens), MULTICAST_LIMIT):
+            chunk = tokens[start:start + MULTICAST_LIMIT]
+            try:
+                response = messaging.send_each_for_multicast(
+                    messaging.MulticastMessage(data={'test': 'true'}, tokens=chunk),
+                    dry_run=True,
+                )
+            except Exception as e:
+                logger.error(f"validate_tokens: batch of {len(chunk)} tokens failed: {type(e).__name__} - {e}")
+                result['unknown'].extend(chunk)
+                continue
+            
+            for token, resp in zip(chunk, response.responses):
+                if resp.success:
+                    result['valid'].append(token)
+                elif cls.is_dead_token_error(resp.exception, dry_run=True):
+                    result['invalid'].append(token)
+                else:
+                    result['unknown'].append(token)
+        
+        logger.info(
+            f"Validated {len(tokens)} FCM tokens. Valid: {len(result['valid'])}, "
+            f"Invalid: {len(result['invalid'])}, Unknown: {len(result['unknown'])}"
+        )
+        return result
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` sends per second with bursts of up to `capacity`."""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a send is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class FirebaseTransport:
+    """Sends one message through the Firebase Admin SDK."""
+    
+    def send(self, message: messaging.Message, dry_run: bool = False) -> str:
+        FCMService.initialize()
+        return messaging.send(message, dry_run=dry_run)
+
+
+class StubTransport:
+    """
+    Offline transport for load tests: waits `latency` seconds per send and fails a
+    `failure_rate` fraction of sends with the exception built by `error_factory`.
+    """
+    
+    def __init__(self, latency: float = 0.05, failure_rate: float = 0.0,
+                 error_factory: Optional[Callable[[], Exception]] = None, seed: Optional[int] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.error_factory = error_factory or (lambda: exceptions.UnavailableError('stub transport failure'))
+        self.sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    def send(self, message: messaging.Message, dry_run: bool = False) -> str:
+        time.sleep(self.latency)
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+            if not failed:
+                self.sent += 1
+                message_id = self.sent
+        if failed:
+            raise self.error_factory()
+        return f'projects/stub/messages/{message_id}'
+
+
+@dataclass
+class SendReport:
+    """Aggregated outcome of a concurrent send."""
+    success_count: int = 0
+    failure_count: int = 0
+    retry_count: int = 0
+    elapsed: float = 0.0
+    # token -> exception for every token that finally failed
+    errors: Dict[str, Exception] = field(default_factory=dict)
+    
+    @property
+    def failed_tokens(self) -> List[str]:
+        return list(self.errors)
+    
+    @property
+    def throughput(self) -> float:
+        total = self.success_count + self.failure_count
+        return total / self.elapsed if self.elapsed else 0.0
+
+
+class ConcurrentFCMSender:
+    """
+    Sends individual FCM messages from a bounded thread pool, rate limited by a
+    token bucket, retrying quota (429) and server (5xx) errors with jittered
+    exponential backoff.
+    """
+    
+    RETRYABLE_ERRORS = (
+        messaging.QuotaExceededError,
+        exceptions.ResourceExhaustedError,
+        exceptions.UnavailableError,
+        exceptions.InternalError,
+        exceptions.DeadlineExceededError,
+    )
+    
+    def __init__(self, transport=None, max_workers: Optional[int] = None, rate: Optional[float] = None,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 10.0):
+        self.transport = transport or FirebaseTransport()
+        self.max_workers = max_workers or getattr(settings, 'FCM_MAX_WORKERS', 16)
+        self.bucket = TokenBucket(rate or getattr(settings, 'FCM_RATE_LIMIT', 10000))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+    
+    def _send_one(self, item: Dict, dry_run: bool):
+        """Send one notification. Returns (exception or None, number of retries)."""
+        message = FCMService.build_message(item['token'], item['title'], item['body'], item.get('data'),
+                                           item.get('device_type'))
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                self.transport.send(message, dry_run=dry_run)
+                return None, attempt
+            except self.RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    return e, attempt
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+            except Exception as e:
+                return e, attempt
+    
+    def send(self, notifications: List[Dict], dry_run: bool = False) -> SendReport:
+        """
+        Send notifications concurrently.
+        
+        Args:
+            notifications: List of dicts with 'token', 'title', 'body' and optional 'data'
+                           and 'device_type'
+            dry_run: Validate the messages with FCM without delivering them
+        
+        Returns:
+            SendReport: Aggregated counts, retries and per-token errors
+        """
+        report = SendReport()
+        started = time.monotonic()
+        if notifications:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(notifications))) as executor:
+                results = executor.map(lambda item: self._send_one(item, dry_run), notifications)
+                for item, (error, retries) in zip(notifications, results):
+                    report.retry_count += retries
+                    if error is None:
+                        report.success_count += 1
+                    else:
+                        report.failure_count += 1
+                        report.errors[item['token']] = error
+                        logger.warning(f"Failed to send to token {item['token'][:20]}...: {type(error).__name__} - {error}")
+        report.elapsed = time.monotonic() - started
+        logger.info(
+            f"Concurrent FCM sent. Success: {report.success_count}, Failed: {report.failure_count}, "
+            f"Retries: {report.retry_count}, {report.throughput:.0f} msg/s"
+        )
+        return report
@@ -0,0 +1,215 @@
+"""
+Carbon footprint history.
+Every footprint computed for a user is stored as a FootprintMeasurement row, and
+the user's weekly and monthly FootprintRollup rows are updated in the same
+transaction, so trend charts read a handful of pre-aggregated rows instead of
+the raw history, whatever range they cover.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date as date_type, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .models import FootprintMeasurement, FootprintRollup, User
+
+logger = logging.getLogger(__name__)
+
+PERIODS = (FootprintRollup.WEEK, FootprintRollup.MONTH)
+
+
+def period_start(day: date_type, period: str) -> date_type:
+    """Monday of the day's week, or the first day of its month."""
+    if period == FootprintRollup.WEEK:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _add_to_rollup(user_id: int, period: str, day: date_type, value: float):
+    rollups = FootprintRollup.objects.filter(user_id=user_id, period=period, start=period_start(day, period))
+    # The latest measurement of a period is the one with the latest date (ties go to the newest row)
+    last_value = value if day >= _latest_date(user_id, period, day) else F('last_value')
+    changes = {
+        'count': F('count') + 1,
+        'total': F('total') + value,
+        'minimum': Least('minimum', value),
+        'maximum': Greatest('maximum', value),
+        'last_value': last_value,
+    }
+    if rollups.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            FootprintRollup.objects.create(
+                user_id=user_id, period=period, start=period_start(day, period),
+                count=1, total=value, minimum=value, maximum=value, last_value=value,
+            )
+    except IntegrityError:
+        # Created concurrently by another insert for the same period
+        rollups.update(**changes)
+
+
+def _latest_date(user_id: int, period: str, day: date_type) -> date_type:
+    start = period_start(day, period)
+    latest = FootprintMeasurement.objects.filter(
+        user_id=user_id, date__gte=start, date__lt=_period_end(start, period),
+    ).order_by('-date').values_list('date', flat=True).first()
+    return latest or day
+
+
+def _period_end(start: date_type, period: str) -> date_type:
+    if period == FootprintRollup.WEEK:
+        return start + timedelta(days=7)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def record_footprint(user, value: float, day: Optional[date_type] = None) -> FootprintMeasurement:
+    """Store a new footprint reading for a user and fold it into their weekly and monthly rollups."""
+    day = day or timezone.localdate()
+    with transaction.atomic():
+        measurement = FootprintMeasurement.objects.create(user_id=user.id, date=day, value=value)
+        for period in PERIODS:
+            _add_to_rollup(user.id, period, day, value)
+        User.touch_data([user.id])
+    return measurement
+
+
+def _aggregate(rows, periods=PERIODS, starts=None) -> Dict[tuple, FootprintRollup]:
+    """
+    Fold (user_id, date, value) rows, in date order, into unsaved rollups keyed by
+    (user_id, period, start). Periods starting before starts[period] are skipped.
+    """
+    aggregated = {}
+    for user_id, day, value in rows:
+        for period in periods:
+            key = (user_id, period, period_start(day, period))
+            if starts and key[2] < starts[period]:
+                continue
+            rollup = aggregated.get(key)
+            if rollup is None:
+                aggregated[key] = FootprintRollup(
+                    user_id=user_id, period=period, start=key[2],
+                    count=1, total=value, minimum=value, maximum=value, last_value=value,
+                )
+                continue
+            rollup.count += 1
+            rollup.total += value
+            rollup.minimum = min(rollup.minimum, value)
+            rollup.maximum = max(rollup.maximum, value)
+            rollup.last_value = value
+    return aggregated
+
+
+def rebuild_rollups(user_ids: Iterable[int], since: Optional[date_type] = None):
+    """
+    Recompute the rollups of the given users from their measurements (all of them,
+    or only the periods from `since` on). Used when measurements are changed in bulk.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    measurements = FootprintMeasurement.objects.filter(user_id__in=user_ids)
+    rollups = FootprintRollup.objects.filter(user_id__in=user_ids)
+    # Rebuild whole periods: from the start of the week / month containing `since`
+    starts = {period: period_start(since, period) for period in PERIODS} if since else {}
+    if since:
+        measurements = measurements.filter(date__gte=min(starts.values()))
+        rollups = rollups.filter(
+            Q(period=FootprintRollup.WEEK, start__gte=starts[FootprintRollup.WEEK])
+            | Q(period=FootprintRollup.MONTH, start__gte=starts[FootprintRollup.MONTH])
+        )
+
+    rows = measurements.order_by('date', 'id').values_list('user_id', 'date', 'value').iterator()
+    aggregated = _aggregate(rows, starts=starts)
+
+    with transaction.atomic():
+        rollups.delete()
+        FootprintRollup.objects.bulk_create(aggregated.values(), batch_size=1000)
+
+
+def rebuild_periods(periods: Iterable[Tuple[int, str, date_type]]):
+    """
+    Recompute individual rollups, given as (user_id, period, start). Used when a few
+    measurements of many users changed, so only their own weeks and months are read.
+    """
+    users_by_period = defaultdict(set)
+    for user_id, period, start in periods:
+        users_by_period[(period, start)].add(user_id)
+
+    with transaction.atomic():
+        for (period, start), user_ids in users_by_period.items():
+            rows = FootprintMeasurement.objects.filter(
+                user_id__in=user_ids, date__gte=start, date__lt=_period_end(start, period),
+            ).order_by('date', 'id').values_list('user_id', 'date', 'value')
+            FootprintRollup.objects.filter(user_id__in=user_ids, period=period, start=start).delete()
+            FootprintRollup.objects.bulk_create(_aggregate(rows, periods=(period,)).values(), batch_size=1000)
+
+
+def replace_latest_footprints(values: Dict[int, float]) -> int:
+    """
+    Replace the latest measurement of each user (user_id -> new value), e.g. after the
+    emission factors changed; users without any measurement get a first one. Returns
+    the number of users whose history changed (an unchanged value is left alone).
+    """
+    if not values:
+        return 0
+    # One indexed lookup per user for the id of their latest row (ties go to the newest row)
+    latest_id = FootprintMeasurement.objects.filter(user_id=OuterRef('pk')).order_by('-date', '-id').values('id')[:1]
+    latest_ids = User.objects.filter(id__in=values).annotate(latest_id=Subquery(latest_id)).values_list(
+        'latest_id', flat=True
+    )
+    latest = {
+        measurement.user_id: measurement
+        for measurement in FootprintMeasurement.objects.filter(id__in=[pk for pk in latest_ids if pk is not None])
+    }
+
+    today = timezone.localdate()
+    replaced = [measurement for user_id, measurement in latest.items() if measurement.value != values[user_id]]
+    added = [FootprintMeasurement(user_id=user_id, date=today, value=value)
+             for user_id, value in values.items() if user_id not in latest]
+    if not replaced and not added:
+        return 0
+
+    with transaction.atomic():
+        for measurement in replaced:
+            measurement.value = values[measurement.user_id]
+        FootprintMeasurement.objects.bulk_update(replaced, ['value'], batch_size=1000)
+        FootprintMeasurement.objects.bulk_create(added, batch_size=1000)
+        # Only the week and month of each replaced (or added) measurement changed
+        rebuild_periods(
+            (measurement.user_id, period, period_start(measurement.date, period))
+            for measurement in replaced + added for period in PERIODS
+        )
+        User.touch_data([measurement.user_id for measurement in replaced + added])
+    return len(replaced) + len(added)
+
+
+def weekly_series(user, weeks: int = 8, today: Optional[date_type] = None) -> List[float]:
+    """
+    The user's footprint at the end of each of the last `weeks` weeks (oldest first),
+    read from the weekly rollups. Weeks without a measurement carry the previous value;
+    weeks before the first measurement repeat it. Empty if the user has none.
+    """
+    today = today or timezone.localdate()
+    current = period_start(today, FootprintRollup.WEEK)
+    first = current - timedelta(weeks=weeks - 1)
+    rows = list(
+        FootprintRollup.objects.filter(user_id=user.id, period=FootprintRollup.WEEK, start__lte=current)
+        .order_by('-start').values_list('start', 'last_value')[:weeks]
+    )
+    if not rows:
+        return []
+
+    by_week = dict(rows)
+    # Value in effect before the window: the latest row older than it (or the oldest one fetched)
+    value = next((value for start, value in rows if start < first), rows[-1][1])
+    series = []
+    for i in range(weeks):
+        value = by_week.get(first + timedelta(weeks=i), value)
+        series.append(value)
+    return series
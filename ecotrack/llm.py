@@ -0,0 +1,242 @@
+"""
+Shared Gemini service for EcoTrack.
+One process-wide LLMService owns a single google-genai client (so HTTP connections
+are pooled and reused) and wraps every call with a concurrency cap, a timeout,
+retries with jittered exponential backoff and a circuit breaker. When Gemini is
+saturated or failing, calls fail fast with LLMUnavailable or return the caller's
+canned fallback. A FakeLLMBackend can be configured for tests and offline runs.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Callable, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# Marker for "no fallback given" (None is a valid fallback value)
+_NO_FALLBACK = object()
+
+
+class LLMUnavailable(Exception):
+    """Raised when Gemini cannot be used right now (circuit open, saturated or failing)."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Gemini circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+
+class GeminiBackend:
+    """google-genai backend sharing one client (and its connection pool) per process."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Created on first use, so a missing API key surfaces as a failed request
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+                    from google.genai import types
+
+                    self._client = genai.Client(
+                        api_key=getattr(settings, 'GEMINI_API_KEY', None) or None,
+                        http_options=types.HttpOptions(timeout=int(self.timeout * 1000)),
+                    )
+        return self._client
+
+    def generate(self, prompt: str, model: str) -> str:
+        return self.client.models.generate_content(model=model, contents=prompt).text
+
+    async def agenerate(self, prompt: str, model: str) -> str:
+        response = await self.client.aio.models.generate_content(model=model, contents=prompt)
+        return response.text
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        from google.genai import errors
+        import httpx
+
+        if isinstance(error, errors.APIError):
+            return error.code == 429 or (error.code or 0) >= 500
+        return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+class FakeLLMBackend:
+    """
+    Local backend for tests and offline runs. Returns `responder(prompt)` (or a fixed
+    response), optionally after a delay, or raises `error`; every prompt is recorded.
+    """
+
+    def __init__(self, response: str = "[]", responder: Optional[Callable[[str], str]] = None,
+                 error: Optional[Exception] = None, latency: float = 0.0):
+        self.response = response
+        self.responder = responder
+        self.error = error
+        self.latency = latency
+        self.prompts: List[str] = []
+
+    def _respond(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        if self.error is not None:
+            raise self.error
+        return self.responder(prompt) if self.responder else self.response
+
+    def generate(self, prompt: str, model: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(prompt)
+
+    async def agenerate(self, prompt: str, model: str) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(prompt)
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        return isinstance(error, (TimeoutError, ConnectionError))
+
+
+class LLMService:
+    """Rate-limited, retrying, circuit-broken access to an LLM backend."""
+
+    def __init__(self, backend, max_concurrency: int = 8, queue_timeout: float = 5.0, max_retries: int = 2,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, breaker: Optional[CircuitBreaker] = None):
+        self.backend = backend
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _give_up(self, fallback, reason: str):
+        if fallback is _NO_FALLBACK:
+            raise LLMUnavailable(reason)
+        logger.warning(f"Using fallback LLM response: {reason}")
+        return fallback
+
+    def generate(self, prompt: str, model: str = DEFAULT_MODEL, fallback=_NO_FALLBACK) -> str:
+        """Generate text for prompt. Returns `fallback` (or raises LLMUnavailable) if Gemini is unavailable."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            return self._give_up(fallback, "too many concurrent requests")
+
+        try:
+            if not self.breaker.allow():
+                return self._give_up(fallback, "circuit open")
+            for attempt in range(self.max_retries + 1):
+                try:
+                    text = self.backend.generate(prompt, model)
+                    self.breaker.record_success()
+                    return text
+                except Exception as e:
+                    if attempt == self.max_retries or not self.backend.is_retryable(e):
+                        self.breaker.record_failure()
+                        logger.error(f"LLM request failed: {type(e).__name__} - {e}")
+                        return self._give_up(fallback, f"{type(e).__name__}: {e}")
+                    time.sleep(self._backoff(attempt))
+        finally:
+            self._slots.release()
+
+    async def agenerate(self, prompt: str, model: str = DEFAULT_MODEL, fallback=_NO_FALLBACK) -> str:
+        """asyncio version of generate; shares the concurrency cap with synchronous callers."""
+        if not await asyncio.to_thread(self._slots.acquire, True, self.queue_timeout):
+            return self._give_up(fallback, "too many concurrent requests")
+
+        try:
+            if not self.breaker.allow():
+                return self._give_up(fallback, "circuit open")
+            for attempt in range(self.max_retries + 1):
+                try:
+                    text = await self.backend.agenerate(prompt, model)
+                    self.breaker.record_success()
+                    return text
+                except Exception as e:
+                    if attempt == self.max_retries or not self.backend.is_retryable(e):
+                        self.breaker.record_failure()
+                        logger.error(f"LLM request failed: {type(e).__name__} - {e}")
+                        return self._give_up(fallback, f"{type(e).__name__}: {e}")
+                    await asyncio.sleep(self._backoff(attempt))
+        finally:
+            self._slots.release()
+
+
+_service = None
+_service_lock = threading.RLock()
+
+
+def configure_llm(backend=None, **options) -> LLMService:
+    """
+    Replace the process-wide service, e.g. configure_llm(FakeLLMBackend(...)) in tests.
+    Without a backend, one is built from settings.GEMINI_BACKEND ('gemini' or 'fake').
+    """
+    global _service
+    if backend is None:
+        if getattr(settings, 'GEMINI_BACKEND', 'gemini') == 'fake':
+            backend = FakeLLMBackend()
+        else:
+            backend = GeminiBackend(timeout=getattr(settings, 'GEMINI_TIMEOUT', 30))
+
+    options.setdefault('max_concurrency', getattr(settings, 'GEMINI_MAX_CONCURRENCY', 8))
+    options.setdefault('max_retries', getattr(settings, 'GEMINI_MAX_RETRIES', 2))
+    with _service_lock:
+        _service = LLMService(backend, **options)
+    return _service
+
+
+def get_llm() -> LLMService:
+    """Return the process-wide LLM service, creating it on first use."""
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                return configure_llm()
+    return _service
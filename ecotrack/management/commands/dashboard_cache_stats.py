@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ecotrack import dashboard_cache
+
+
+class Command(BaseCommand):
+    help = 'Show the hit rate of the get_user_data snapshot cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after showing them',
+        )
+
+    def handle(self, *args, **options):
+        if not dashboard_cache.is_shared():
+            # The counters would be this process's own, always zero
+            raise CommandError(
+                f"The '{settings.DASHBOARD_CACHE_ALIAS}' cache is local to each process, so the web "
+                f"processes' counters cannot be read from here. Set DASHBOARD_CACHE_BACKEND to a shared "
+                f"backend (e.g. Redis)."
+            )
+
+        stats = dashboard_cache.stats()
+        if options['reset']:
+            dashboard_cache.reset_stats()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nSummary:'
+                f'\n- Hits: {stats["hits"]}'
+                f'\n- Misses: {stats["misses"]}'
+                f'\n- Hit rate: {stats["hit_rate"]:.1%}'
+                f'\n- Invalidations: {stats["invalidations"]}'
+            )
+        )
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from ecotrack.llm import LLMUnavailable
+from ecotrack.notification_copy import add_to_pool, generate_copy_batch, retire_old_copy
+import time
+
+
+class Command(BaseCommand):
+    help = ('Fill the notification message pool with fresh pre-generated reminders, so the '
+            'dispatchers need no Gemini call at send time. Run nightly (e.g. from Task Scheduler or cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=300,
+            help='Number of new messages to generate; older messages beyond this pool size are retired',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of messages requested per Gemini call',
+        )
+        parser.add_argument(
+            '--max-calls',
+            type=int,
+            default=None,
+            help='Maximum Gemini calls (default: twice the calls needed, to make up for duplicates)',
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=0.0,
+            help='Seconds to wait between Gemini calls to stay within the API quota',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Generate messages and show them without storing them',
+        )
+
+    def handle(self, *args, **options):
+        size = max(1, options['size'])
+        batch_size = max(1, options['batch_size'])
+        max_calls = options['max_calls'] or 2 * -(-size // batch_size)
+        dry_run = options['dry_run']
+
+        added = 0
+        calls = 0
+        failed = 0
+        while added < size and calls < max_calls:
+            calls += 1
+            try:
+                messages = generate_copy_batch(min(batch_size, size - added))
+            except (LLMUnavailable, ValueError) as ex:
+                self.stdout.write(self.style.ERROR(f'Failed to generate messages: {ex}'))
+                failed += 1
+                if isinstance(ex, LLMUnavailable):
+                    break
+                continue
+
+            if dry_run:
+                for message in messages:
+                    self.stdout.write(f'Message: {message}')
+                added += len(messages)
+            else:
+                added += add_to_pool(messages)
+            if options['delay']:
+                time.sleep(options['delay'])
+
+        retired = 0
+        if not dry_run and added:
+            retired = retire_old_copy(keep=size)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nSummary:'
+                f'\n- Added: {added} messages'
+                f'\n- Retired: {retired} messages'
+                f'\n- Gemini calls: {calls} ({failed} failed)'
+            )
+        )
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from ecotrack.models import Habit
+from ecotrack.ai_cache import get_cached, is_shared, needs_refresh, store
+from ecotrack.views import generate_questions, questions_cache_key
+import time
+from itertools import groupby
+from operator import itemgetter
+
+
+class Command(BaseCommand):
+    help = ('Pre-generate check-in questions for every habit set that has none cached (new or changed '
+            'habits), so get_questions is served from the cache. Run nightly (e.g. from Task Scheduler or cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--include-stale',
+            action='store_true',
+            help='Also regenerate question sets that are cached but past AI_QUESTIONS_TTL',
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=0.0,
+            help='Seconds to wait between Gemini calls to stay within the API quota',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many question sets would be generated without calling Gemini',
+        )
+
+    def handle(self, *args, **options):
+        if not is_shared():
+            # The questions would only land in this process's memory and be gone when it exits
+            raise CommandError(
+                f"The '{settings.AI_CACHE_ALIAS}' cache is local to each process, so the web processes "
+                f"would never see the generated questions. Set AI_CACHE_BACKEND to a shared backend "
+                f"(e.g. file-based or Redis)."
+            )
+        include_stale = options['include_stale']
+        dry_run = options['dry_run']
+
+        # Users with the same habits share one question set
+        pending = {}
+        rows = Habit.objects.order_by('user_id', 'id').values_list('user_id', 'id', 'text')
+        for _, user_rows in groupby(rows.iterator(chunk_size=2000), key=itemgetter(0)):
+            habits = [{'id': str(habit_id), 'text': text} for _, habit_id, text in user_rows]
+            key = questions_cache_key(habits)
+            if key in pending:
+                continue
+            # Questions depend only on the habits, so a set only needs generating when it is new
+            if get_cached(key) is None or (include_stale and needs_refresh(key)):
+                pending[key] = habits
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Found {len(pending)} habit sets whose questions need generating')
+        )
+        if dry_run:
+            return
+
+        generated = 0
+        failed = 0
+        for key, habits in pending.items():
+            try:
+                store(key, generate_questions(habits),
+                      ttl=settings.AI_QUESTIONS_TTL, stale_ttl=settings.AI_QUESTIONS_STALE_TTL)
+                generated += 1
+            except Exception as ex:
+                self.stdout.write(self.style.ERROR(f'Failed to generate questions for {key}: {ex}'))
+                failed += 1
+            if options['delay']:
+                time.sleep(options['delay'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nSummary:'
+                f'\n- Generated: {generated} question sets'
+                f'\n- Failed: {failed}'
+            )
+        )
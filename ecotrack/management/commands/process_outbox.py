@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from ecotrack.firebase_service import FCMService, MULTICAST_LIMIT
+from ecotrack import outbox
+import time
+
+
+class Command(BaseCommand):
+    help = ('Deliver queued reminder notifications from the outbox. Any number of these workers can run '
+            'on any number of machines; each reminder is claimed by one worker at a time.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker-id',
+            default=outbox.default_worker_id(),
+            help='Name recorded on claimed rows (default: host:pid)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Number of reminders claimed and sent at a time (default: settings.FCM_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new reminders instead of exiting when the outbox is drained',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls of an empty outbox with --loop',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            FCMService.initialize()
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Failed to initialize Firebase FCM service: {e}')
+            )
+            return
+
+        batch_size = max(1, min(options['batch_size'] or outbox.default_batch_size(), MULTICAST_LIMIT))
+        totals = {'sent': 0, 'failed': 0, 'retry': 0}
+        try:
+            while True:
+                results = outbox.process(options['worker_id'], batch_size=batch_size)
+                for key, rows in results.items():
+                    totals[key] += len(rows)
+                if any(results.values()):
+                    self.stdout.write(
+                        f'Sent {len(results["sent"])}, failed {len(results["failed"])}, '
+                        f'retrying {len(results["retry"])}'
+                    )
+                if not options['loop']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('\nWorker stopped.')
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nSummary:'
+                f'\n- Sent: {totals["sent"]} notifications'
+                f'\n- Failed: {totals["failed"]} notifications'
+                f'\n- Retrying later: {totals["retry"]} notifications'
+            )
+        )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from ecotrack import outbox
+
+
+class Command(BaseCommand):
+    help = ('Delete sent and failed reminders from the notification outbox once they are older than the '
+            'retention period. Run periodically (e.g. daily from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Keep reminders scheduled within this many days (default: settings.OUTBOX_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows deleted per query',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('--days must not be negative')
+
+        deleted = outbox.purge(options['days'], batch_size=max(1, options['batch_size']))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nSummary:'
+                f'\n- Deleted: {deleted} outbox rows'
+            )
+        )
@@ -0,0 +1,245 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import transaction
+from ecotrack.models import User
+from ecotrack.utils import (calculate_personal_carbon_footprint, calculate_personal_monthly_co2e_batch,
+                            calculate_initial_sustainability_score)
+from ecotrack.emission_factors import get_factor_tables
+from ecotrack.footprints import replace_latest_footprints
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import django
+import json
+import os
+import time
+
+
+def _init_worker():
+    """Make sure worker processes have Django (and the factor settings) loaded."""
+    django.setup()
+
+
+def _compute_batch(surveys, include_scores):
+    """
+    Computes footprints (and optionally initial scores) for a batch of surveys.
+    If the batch fails, its surveys are computed one by one instead; the positions
+    of the surveys that still fail are returned so they can be skipped.
+    """
+    try:
+        footprints = calculate_personal_monthly_co2e_batch(surveys)
+        scores = None
+        if include_scores:
+            scores = [calculate_initial_sustainability_score(survey)['initial_sustainability_score']
+                      for survey in surveys]
+        return footprints, scores, []
+    except Exception:
+        pass
+
+    footprints = []
+    scores = [] if include_scores else None
+    failed = []
+    for i, survey in enumerate(surveys):
+        try:
+            footprint = calculate_personal_carbon_footprint(survey)['summary']['personal_monthly_co2e_kg']
+            score = (calculate_initial_sustainability_score(survey)['initial_sustainability_score']
+                     if include_scores else None)
+        except Exception:
+            footprint = score = None
+            failed.append(i)
+        footprints.append(footprint)
+        if include_scores:
+            scores.append(score)
+    return footprints, scores, failed
+
+
+class Command(BaseCommand):
+    help = 'Recompute carbon footprints and sustainability scores of all users from their saved survey'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of users computed and written per batch',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (1 computes in this process)',
+        )
+        parser.add_argument(
+            '--no-scores',
+            action='store_true',
+            help='Only recompute footprints and keep the current sustainability scores',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=str(settings.BASE_DIR / '.recompute_footprints.json'),
+            help='File recording the last written user id',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue after the user id recorded in the checkpoint file',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute everything but do not write to the database',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        workers = max(1, options['workers'])
+        include_scores = not options['no_scores']
+        checkpoint_path = options['checkpoint']
+        dry_run = options['dry_run']
+        self.factor_version = get_factor_tables().version
+
+        if dry_run:
+            self.stdout.write(
+                self.style.SUCCESS('DRY RUN MODE - No users will be updated')
+            )
+
+        last_id = self.load_checkpoint(checkpoint_path) if options['resume'] else 0
+
+        users = User.objects.filter(survey_answered=True, id__gt=last_id).order_by('id')
+        total = users.count()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Recomputing {total} users with factor set {self.factor_version} '
+                f'({workers} worker(s), batches of {batch_size})'
+                + (f', resuming after user id {last_id}' if last_id else '')
+            )
+        )
+        if not total:
+            return
+
+        fields = ['carbon_footprint']
+        if include_scores:
+            fields.append('sustainability_score')
+
+        self.processed = 0
+        self.failed_ids = []
+        self.started = time.monotonic()
+        user_stream = users.only('id', 'user_data').iterator(chunk_size=batch_size)
+
+        if workers == 1:
+            for batch in self.batches(user_stream, batch_size):
+                result = _compute_batch([user.user_data or {} for user in batch], include_scores)
+                self.write_batch(batch, result, fields, checkpoint_path, total, dry_run)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+                # Keep a bounded number of batches in flight and write them back in order
+                in_flight = deque()
+                for batch in self.batches(user_stream, batch_size):
+                    surveys = [user.user_data or {} for user in batch]
+                    in_flight.append((batch, executor.submit(_compute_batch, surveys, include_scores)))
+                    if len(in_flight) >= workers * 2:
+                        batch, future = in_flight.popleft()
+                        self.write_batch(batch, self.batch_result(batch, future, include_scores),
+                                         fields, checkpoint_path, total, dry_run)
+                while in_flight:
+                    batch, future = in_flight.popleft()
+                    self.write_batch(batch, self.batch_result(batch, future, include_scores),
+                                     fields, checkpoint_path, total, dry_run)
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nSummary:'
+                f'\n- Recomputed: {self.processed - len(self.failed_ids)} users'
+                f'\n- Skipped (could not compute): {len(self.failed_ids)} users'
+                f'\n- Elapsed: {elapsed:.1f}s'
+                f'\n- Throughput: {self.processed / elapsed if elapsed else 0:.0f} users/s'
+            )
+        )
+        if self.failed_ids:
+            shown = ', '.join(str(user_id) for user_id in self.failed_ids[:50])
+            more = f' and {len(self.failed_ids) - 50} more' if len(self.failed_ids) > 50 else ''
+            self.stdout.write(self.style.WARNING(f'Skipped user ids: {shown}{more}'))
+        if not dry_run and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    @staticmethod
+    def batches(iterable, size):
+        batch = []
+        for item in iterable:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def batch_result(self, batch, future, include_scores):
+        """The worker's result for a batch, or the batch computed here if the worker failed."""
+        try:
+            return future.result()
+        except Exception as e:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Worker failed on users {batch[0].id}-{batch[-1].id} ({type(e).__name__}: {e}), '
+                    f'computing them here'
+                )
+            )
+            return _compute_batch([user.user_data or {} for user in batch], include_scores)
+
+    def write_batch(self, batch, result, fields, checkpoint_path, total, dry_run):
+        footprints, scores, failed = result
+        if failed:
+            failed_ids = [batch[i].id for i in failed]
+            self.failed_ids.extend(failed_ids)
+            self.stdout.write(
+                self.style.WARNING(f'Skipping {len(failed_ids)} user(s) with unusable surveys: {failed_ids}')
+            )
+        failed = set(failed)
+        updated = []
+        for i, user in enumerate(batch):
+            if i in failed:
+                continue
+            user.carbon_footprint = footprints[i]
+            if scores is not None:
+                user.sustainability_score = scores[i]
+            updated.append(user)
+
+        if not dry_run:
+            with transaction.atomic():
+                User.objects.bulk_update(updated, fields)
+                # bulk_update skips User.save, so bump data_version (ETags, dashboard cache) here
+                User.touch_data([user.id for user in updated])
+                # The recomputed value replaces the measurement taken from the same survey
+                replace_latest_footprints({user.id: user.carbon_footprint for user in updated})
+            self.save_checkpoint(checkpoint_path, batch[-1].id)
+
+        self.processed += len(batch)
+        elapsed = time.monotonic() - self.started
+        rate = self.processed / elapsed if elapsed else 0
+        remaining = (total - self.processed) / rate if rate else 0
+        self.stdout.write(
+            f'{self.processed}/{total} users ({self.processed / total:.0%}) - '
+            f'{rate:.0f} users/s - ETA {remaining:.0f}s'
+        )
+
+    def load_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            self.stdout.write(self.style.WARNING(f'No checkpoint found at {path}, starting from the beginning'))
+            return 0
+
+        if checkpoint.get('factor_version') != self.factor_version:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Checkpoint was written for factor set {checkpoint.get("factor_version")}, '
+                    f'starting from the beginning'
+                )
+            )
+            return 0
+        return int(checkpoint.get('last_id', 0))
+
+    def save_checkpoint(self, path, last_id):
+        with open(path, 'w') as f:
+            json.dump({'last_id': last_id, 'factor_version': self.factor_version}, f)
@@ -1,15 +1,23 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.utils import timezone as django_timezone
 from ecotrack.models import PushSubscription
-from ecotrack.firebase_service import FCMService
+from ecotrack.firebase_service import ConcurrentFCMSender, FCMService
+from ecotrack.pipeline import Source, Stage, run_pipeline
+from ecotrack.token_hygiene import record_send_failures
 import json
+import queue
+import threading
 from datetime import datetime, timezone
 import pytz
-from google import genai
+from ecotrack.notification_copy import (
+    COPY_BATCH_SIZE, fallback_message, generate_notification_copy, load_copy_pool, pick_copy,
+)
 
 
 class Command(BaseCommand):
-    help = 'Send daily push notifications to users using Firebase FCM'
+    help = ('Send daily push notifications to users using Firebase FCM, directly rather than through the '
+            'outbox (notification_scheduler.py and cron_dispatch use the outbox); for manual runs only')
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -17,15 +25,59 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be sent without actually sending notifications',
         )
+        parser.add_argument(
+            '--copy-batch-size',
+            type=int,
+            default=COPY_BATCH_SIZE,
+            help='Number of users whose messages are generated in one Gemini call',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.FCM_MAX_WORKERS,
+            help='Number of concurrent FCM requests per batch',
+        )
+        parser.add_argument(
+            '--time',
+            help='Send the notifications scheduled for this HH:MM instead of the current minute (catch-up)',
+        )
+        parser.add_argument(
+            '--date',
+            help='Date (YYYY-MM-DD) the --time slot belongs to, used for the already-sent check (default: today)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of subscriptions passed between pipeline stages at a time',
+        )
+        parser.add_argument(
+            '--copy-workers',
+            type=int,
+            default=2,
+            help='Number of batches whose messages are prepared concurrently',
+        )
+        parser.add_argument(
+            '--send-workers',
+            type=int,
+            default=2,
+            help='Number of batches sent concurrently',
+        )
+        parser.add_argument(
+            '--queue-size',
+            type=int,
+            default=4,
+            help='Maximum number of batches waiting between two stages',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
-        
+
         if dry_run:
             self.stdout.write(
                 self.style.SUCCESS('DRY RUN MODE - No notifications will be sent')
             )
-        
+
         # Initialize Firebase FCM service
         try:
             FCMService.initialize()
@@ -34,157 +86,202 @@ class Command(BaseCommand):
                 self.style.ERROR(f'Failed to initialize Firebase FCM service: {e}')
             )
             return
-        
-        # Get current time in the server timezone
+
+        # Get current time in the server timezone (or the requested slot)
         tz = pytz.timezone(settings.TIME_ZONE)
-        current_time = datetime.now(tz).time()
-        
-        # Find all active subscriptions that should receive notifications now
-        current_hour = current_time.hour
-        current_minute = current_time.minute
-        
-        # Get subscriptions that match the current hour and minute exactly and have valid FCM tokens
+        now = datetime.now(tz)
+        try:
+            current_time = datetime.strptime(options['time'], '%H:%M').time() if options['time'] else now.time()
+            today_date = datetime.strptime(options['date'], '%Y-%m-%d').date() if options['date'] else now.date()
+        except ValueError as e:
+            self.stdout.write(self.style.ERROR(f'Invalid --time/--date: {e}'))
+            return
+        current_time = current_time.replace(second=0, microsecond=0)
+
+        self.options = options
+        self.dry_run = dry_run
+        self.today_date = today_date
+        self.sent_count = 0
+        self.failed_count = 0
+        self.retry_count = 0
+        self.counts_lock = threading.Lock()
+
+        # Messages come from the pre-generated pool; only if it is empty are personalized
+        # messages generated with Gemini AI, a batch of users per call
+        self.pool = load_copy_pool()
+        if not self.pool:
+            self.stdout.write(
+                self.style.WARNING('Notification message pool is empty (run fill_notification_copy)')
+            )
+        self.sender = ConcurrentFCMSender(max_workers=options['workers'])
+
+        # Get active subscriptions scheduled for the current minute that have valid FCM tokens
+        # and were not already sent today for this time (one range scan on pushsub_dispatch_idx)
         subscriptions = PushSubscription.objects.filter(
+            notification_minute_of_day=PushSubscription.minute_of_day(current_time),
             is_active=True,
-            notification_time__hour=current_hour,
-            notification_time__minute=current_minute
         ).exclude(
             fcm_token__isnull=True
         ).exclude(
             fcm_token__exact=''
-        )
-        
-        if not subscriptions.exists():
+        ).exclude(
+            last_sent_date=today_date,
+            last_sent_time=current_time,
+        ).select_related('user')
+
+        # Streaming pipeline: fetch -> copy -> send -> persist, with bounded queues in between
+        batch_size = max(1, options['batch_size'])
+        fetched, prepared, sent = (queue.Queue(maxsize=max(1, options['queue_size'])) for _ in range(3))
+        stages = [
+            Source('fetch', lambda: self.batches(subscriptions.iterator(chunk_size=batch_size), batch_size),
+                   fetched),
+            Stage('copy', self.prepare_batch, fetched, prepared, workers=options['copy_workers'],
+                  on_error=self.batch_failed),
+            Stage('send', self.send_batch, prepared, sent, workers=options['send_workers'],
+                  on_error=lambda batch, e: self.batch_failed([subscription for subscription, _ in batch], e)),
+            Stage('persist', self.persist_batch, sent, workers=1),
+        ]
+        elapsed = run_pipeline(stages)
+
+        if not self.sent_count and not self.failed_count:
             self.stdout.write(
                 self.style.WARNING(
                     f'No active subscriptions found for current time: {current_time.strftime("%H:%M")}'
                 )
             )
             return
-        
+
+        # Summary
         self.stdout.write(
             self.style.SUCCESS(
-                f'Found {subscriptions.count()} subscriptions to process at {current_time.strftime("%H:%M")}'
+                f'\nSummary:'
+                f'\n- Sent: {self.sent_count} FCM notifications'
+                f'\n- Failed: {self.failed_count} notifications'
+                f'\n- Total processed: {self.sent_count + self.failed_count}'
+                f'\n- Retries: {self.retry_count}'
+                f'\n- Elapsed: {elapsed:.2f}s'
+                + ''.join(
+                    f'\n- Stage {stage.name}: {stage.items} batches, {stage.busy:.2f}s busy '
+                    f'({stage.workers} worker(s))' + (f', {stage.errors} failed' if stage.errors else '')
+                    for stage in stages
+                )
             )
         )
-        
-        sent_count = 0
-        failed_count = 0
-        
-        for subscription in subscriptions:
-            try:
-                user = subscription.user
-                # Check if already sent today for this scheduled time
-                today_date = datetime.now(tz).date()
-                if (
-                    subscription.last_sent_date == today_date
-                    and subscription.last_sent_time == subscription.notification_time
-                ):
-                    # Skip as it's already sent today for this time
-                    continue
-                
-                # Create personalized notification message using Gemini AI
-                client = genai.Client()
-
-                prompt = f"""
-                    Generate 1 single short, catchy, and engaging notification message strictly to encourage users to fill out the EcoTrack check-in form.
-                    EcoTrack is an app that helps users track their sustainability habits and promotes eco-friendly behavior. It includes features like:
-                    - Daily surveys to track eco actions 🌱
-                    - Personalized sustainability score 📊
-                    - AI chatbot to guide users 🤖
-                    - Personalized suggestions for greener living 💡
-                    - Achievements for completing surveys and taking eco-friendly actions 🎁
-                    - Daily streaks kept alive by submitting check-in everyday
-
-                    Ensure the notifications are:
-                    - under 60 characters
-                    - Friendly, heartwarming, motivating, and aligned with EcoTrack's eco-conscious mission
-                    - Include clear call-to-actions like "Share your thoughts", "fill now", "complete now"
-                    - Include relevant emojis for engagement
-                    - Highlight rewards or benefits if possible
-                    Give the message a human touch, with some warmth, inviting gesture and showing that you care for the user.
-                    The user's username is {user.username}, in case you need it.
-                """
-
-                try:
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        contents=prompt,
-                    ).text
-                except:
-                    response = f"Hey {user.username}!, time to track your footprints 🌱"
-                
-                if dry_run:
-                    self.stdout.write(
-                        f'Would send FCM notification to: {user.username} at {subscription.notification_time}'
-                    )
-                    self.stdout.write(f'Message: {response}')
-                    sent_count += 1
-                    continue
-                
-                # Check if FCM token exists
-                fcm_token = subscription.get_fcm_token()
-                if not fcm_token or not fcm_token.strip():
-                    self.stdout.write(
-                        self.style.WARNING(f'Skipping {user.username} - no FCM token (user needs to resubscribe)')
-                    )
-                    # Mark subscription as inactive since it has no token
-                    subscription.is_active = False
-                    subscription.save()
-                    continue
-                
-                # Send FCM notification
-                success = FCMService.send_notification(
-                    token=fcm_token,
-                    title='Daily Check-in Reminder',
-                    body=response,
-                    data={
-                        'url': '/',
-                        'timestamp': str(datetime.now()),
-                        'type': 'daily_reminder',
-                        'user_id': str(user.id)
-                    }
+
+    @staticmethod
+    def batches(iterable, size):
+        batch = []
+        for item in iterable:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def count(self, sent=0, failed=0, retries=0):
+        with self.counts_lock:
+            self.sent_count += sent
+            self.failed_count += failed
+            self.retry_count += retries
+
+    def batch_failed(self, batch, error):
+        for subscription in batch:
+            self.stdout.write(
+                self.style.ERROR(
+                    f'Unexpected error sending notification to user {subscription.user.username}: {str(error)}'
                 )
-                
-                if success:
-                    self.stdout.write(
-                        self.style.SUCCESS(f'Sent FCM notification to: {user.username}')
-                    )
-                    # Update last sent markers
-                    subscription.last_sent_date = today_date
-                    subscription.last_sent_time = subscription.notification_time
-                    subscription.save(update_fields=["last_sent_date", "last_sent_time", "updated_at"])
-                    sent_count += 1
-                else:
-                    self.stdout.write(
-                        self.style.ERROR(f'Failed to send FCM notification to: {user.username}')
-                    )
-                    failed_count += 1
-                    
-                    # Check if token is invalid and deactivate subscription
-                    if not FCMService.validate_token(subscription.get_fcm_token()):
-                        subscription.is_active = False
-                        subscription.save()
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'Deactivated invalid FCM token for user: {user.username}'
-                            )
-                        )
-                
-            except Exception as ex:
+            )
+        self.count(failed=len(batch))
+
+    def prepare_batch(self, batch):
+        """Copy stage: pick (or generate) the message of every subscription in the batch."""
+        messages = {}
+        if not self.pool:
+            messages = generate_notification_copy(
+                [subscription.user.username for subscription in batch],
+                batch_size=self.options['copy_batch_size'],
+            )
+
+        outgoing = []
+        for subscription in batch:
+            user = subscription.user
+            if self.pool:
+                response = pick_copy(subscription, self.pool)
+            else:
+                response = messages.get(user.username) or fallback_message(user.username)
+
+            if self.dry_run:
+                self.stdout.write(
+                    f'Would send FCM notification to: {user.username} at {subscription.notification_time}'
+                    f'\nMessage: {response}'
+                )
+                self.count(sent=1)
+                continue
+
+            outgoing.append((subscription, {
+                'token': subscription.get_fcm_token(),
+                'title': 'Daily Check-in Reminder',
+                'body': response,
+                'data': {
+                    'url': '/',
+                    'timestamp': str(datetime.now()),
+                    'type': 'daily_reminder',
+                    'user_id': str(user.id)
+                },
+                'device_type': subscription.device_type,
+            }))
+        return outgoing or None
+
+    def send_batch(self, outgoing):
+        """Send stage: send the batch's notifications concurrently."""
+        report = self.sender.send([notification for _, notification in outgoing])
+        self.count(retries=report.retry_count)
+        return outgoing, report
+
+    def persist_batch(self, result):
+        """Persistence stage: mark delivered subscriptions and record failed tokens, one query each."""
+        outgoing, report = result
+        delivered = []
+        for subscription, notification in outgoing:
+            user = subscription.user
+            if notification['token'] not in report.errors:
                 self.stdout.write(
-                    self.style.ERROR(
-                        f'Unexpected error sending notification to user {subscription.user.username}: {str(ex)}'
+                    self.style.SUCCESS(f'Sent FCM notification to: {user.username}')
+                )
+                # Update last sent markers
+                subscription.last_sent_date = self.today_date
+                subscription.last_sent_time = subscription.notification_time
+                subscription.updated_at = django_timezone.now()  # bulk_update skips auto_now
+                delivered.append(subscription)
+                continue
+
+            self.stdout.write(
+                self.style.ERROR(f'Failed to send FCM notification to: {user.username}')
+            )
+            self.count(failed=1)
+
+        # Deactivate subscriptions FCM reported as unregistered, flag the rest for validate_fcm_tokens
+        try:
+            failures = record_send_failures([subscription for subscription, _ in outgoing], report.errors)
+            for subscription in failures['deactivated']:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'Deactivated invalid FCM token for user: {subscription.user.username}'
                     )
                 )
-                failed_count += 1
-        
-        # Summary
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'\nSummary:'
-                f'\n- Sent: {sent_count} FCM notifications'
-                f'\n- Failed: {failed_count} notifications'
-                f'\n- Total processed: {sent_count + failed_count}'
+        except Exception as ex:
+            self.stdout.write(
+                self.style.ERROR(f'Failed to record failed FCM tokens: {str(ex)}')
+            )
+
+        try:
+            PushSubscription.objects.bulk_update(
+                delivered, ["last_sent_date", "last_sent_time", "copy_cursor", "updated_at"]
+            )
+        except Exception as ex:
+            # The notifications went out, but they may be sent again at the next run for this time
+            self.stdout.write(
+                self.style.ERROR(f'Failed to record {len(delivered)} sent notifications: {str(ex)}')
             )
-        )
\ No newline at end of file
+        self.count(sent=len(delivered))
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ecotrack.firebase_service import FCMService, TOPIC_MANAGEMENT_LIMIT
+from ecotrack.notification_topics import sync_topics
+
+
+class Command(BaseCommand):
+    help = ('Subscribe every deliverable FCM token to the reminder-HHMM topic of its notification time '
+            '(and remove the others from their topics), for FCM_DISPATCH_MODE = "topic". Run it periodically '
+            'in topic mode to apply new subscriptions, time changes and unsubscribes, and once with --force '
+            'before switching to topic mode.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TOPIC_MANAGEMENT_LIMIT,
+            help='Number of subscriptions handled per batch',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Sync even though FCM_DISPATCH_MODE is not "topic"',
+        )
+
+    def handle(self, *args, **options):
+        mode = getattr(settings, 'FCM_DISPATCH_MODE', 'batch')
+        if mode != 'topic' and not options['force']:
+            self.stdout.write(
+                self.style.WARNING(f'FCM_DISPATCH_MODE is "{mode}", topics are not used; nothing to do (see --force)')
+            )
+            return
+
+        try:
+            FCMService.initialize()
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Failed to initialize Firebase FCM service: {e}')
+            )
+            return
+
+        totals = sync_topics(batch_size=max(1, min(options['batch_size'], TOPIC_MANAGEMENT_LIMIT)))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nSummary:'
+                f'\n- Moved to their reminder topic: {totals["moved"]} subscriptions'
+                f'\n- Removed from topics: {totals["removed"]} subscriptions'
+                f'\n- Failed: {totals["failed"]} subscriptions (sent per token until the next run)'
+            )
+        )
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from ecotrack.models import PushSubscription
+from ecotrack.firebase_service import FCMService, MULTICAST_LIMIT
+from ecotrack.token_hygiene import validate_subscriptions
+
+
+class Command(BaseCommand):
+    help = ('Validate suspect FCM tokens (new subscriptions and tokens whose sends failed) in dry-run '
+            'batches and deactivate dead subscriptions. Run periodically (e.g. hourly from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Validate the tokens of all active subscriptions, not only suspect ones',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MULTICAST_LIMIT,
+            help='Number of subscriptions validated and updated per batch',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            FCMService.initialize()
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'Failed to initialize Firebase FCM service: {e}')
+            )
+            return
+
+        subscriptions = PushSubscription.objects.filter(is_active=True)
+        if not options['all']:
+            subscriptions = subscriptions.filter(token_suspect=True)
+        subscriptions = subscriptions.only('id', 'fcm_token').order_by('id')
+
+        batch_size = max(1, min(options['batch_size'], MULTICAST_LIMIT))
+        totals = {'valid': 0, 'deactivated': 0, 'unknown': 0}
+        last_id = 0
+        while True:
+            # Keyset pagination, since validated rows drop out of the suspect filter
+            batch = list(subscriptions.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for key, value in validate_subscriptions(batch).items():
+                totals[key] += value
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\nSummary:'
+                f'\n- Valid: {totals["valid"]} tokens'
+                f'\n- Deactivated: {totals["deactivated"]} subscriptions'
+                f'\n- Could not check: {totals["unknown"]} tokens (still suspect)'
+            )
+        )
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+def fill_minute_of_day(apps, schema_editor):
+    PushSubscription = apps.get_model('ecotrack', 'PushSubscription')
+    subscriptions = list(PushSubscription.objects.only('id', 'notification_time'))
+    for subscription in subscriptions:
+        subscription.notification_minute_of_day = (
+            subscription.notification_time.hour * 60 + subscription.notification_time.minute
+        )
+    PushSubscription.objects.bulk_update(subscriptions, ['notification_minute_of_day'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecotrack', '0025_notificationcopy_pushsubscription_copy_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='notification_minute_of_day',
+            field=models.PositiveSmallIntegerField(default=540),
+        ),
+        migrations.RunPython(fill_minute_of_day, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pushsubscription',
+            index=models.Index(
+                fields=['notification_minute_of_day', 'is_active', 'last_sent_date'],
+                name='pushsub_dispatch_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecotrack', '0026_pushsubscription_notification_minute_of_day'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='token_suspect',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
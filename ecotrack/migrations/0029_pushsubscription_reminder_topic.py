@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecotrack', '0028_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='reminder_topic',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
@@ -0,0 +1,68 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_habits_to_table(apps, schema_editor):
+    User = apps.get_model('ecotrack', 'User')
+    Habit = apps.get_model('ecotrack', 'Habit')
+    habits = []
+    # values_list reads the JSON column directly (the model's `habits` name is also the new reverse relation)
+    for user_id, items in User.objects.values_list('id', 'habits').iterator(chunk_size=2000):
+        for item in items or []:
+            text = item.get('text') if isinstance(item, dict) else None
+            if text and str(text).strip():
+                habits.append(Habit(user_id=user_id, text=str(text).strip()))
+    Habit.objects.bulk_create(habits, batch_size=1000)
+
+
+def copy_habits_to_json(apps, schema_editor):
+    User = apps.get_model('ecotrack', 'User')
+    Habit = apps.get_model('ecotrack', 'Habit')
+    by_user = {}
+    for habit_id, user_id, text in Habit.objects.order_by('id').values_list('id', 'user_id', 'text'):
+        by_user.setdefault(user_id, []).append({'id': str(habit_id), 'text': text})
+    for user_id, items in by_user.items():
+        User.objects.filter(id=user_id).update(habits=items)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecotrack', '0029_pushsubscription_reminder_topic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Habit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='habits', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HabitCheckIn',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('completed', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkins', to='ecotrack.habit')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('habit', 'date'), name='habit_checkin_unique_day')],
+            },
+        ),
+        migrations.RunPython(copy_habits_to_table, copy_habits_to_json),
+        migrations.RemoveField(
+            model_name='user',
+            name='habits',
+        ),
+    ]
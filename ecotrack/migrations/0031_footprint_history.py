@@ -0,0 +1,91 @@
+import django.db.models.deletion
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def import_footprint_lists(apps, schema_editor):
+    User = apps.get_model('ecotrack', 'User')
+    FootprintMeasurement = apps.get_model('ecotrack', 'FootprintMeasurement')
+    FootprintRollup = apps.get_model('ecotrack', 'FootprintRollup')
+    # The old lists have no dates; the dashboard showed them as the last 8 weeks, so date them that way
+    today = timezone.localdate()
+    measurements, rollups = [], {}
+    users = User.objects.values_list('id', 'last_8_footprint_measurements').iterator(chunk_size=2000)
+    for user_id, values in users:
+        values = [float(value) for value in values or [] if isinstance(value, (int, float))]
+        for i, value in enumerate(values):
+            day = today - timedelta(weeks=len(values) - 1 - i)
+            measurements.append(FootprintMeasurement(user_id=user_id, date=day, value=value))
+            for period, start in (('week', day - timedelta(days=day.weekday())), ('month', day.replace(day=1))):
+                rollup = rollups.get((user_id, period, start))
+                if rollup is None:
+                    rollups[(user_id, period, start)] = FootprintRollup(
+                        user_id=user_id, period=period, start=start,
+                        count=1, total=value, minimum=value, maximum=value, last_value=value,
+                    )
+                    continue
+                rollup.count += 1
+                rollup.total += value
+                rollup.minimum = min(rollup.minimum, value)
+                rollup.maximum = max(rollup.maximum, value)
+                rollup.last_value = value
+    FootprintMeasurement.objects.bulk_create(measurements, batch_size=1000)
+    FootprintRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+
+
+def export_footprint_lists(apps, schema_editor):
+    User = apps.get_model('ecotrack', 'User')
+    FootprintMeasurement = apps.get_model('ecotrack', 'FootprintMeasurement')
+    by_user = {}
+    for user_id, value in FootprintMeasurement.objects.order_by('date', 'id').values_list('user_id', 'value'):
+        by_user.setdefault(user_id, []).append(value)
+    for user_id, values in by_user.items():
+        User.objects.filter(id=user_id).update(last_8_footprint_measurements=values[-8:])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecotrack', '0030_habit_habitcheckin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FootprintMeasurement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('value', models.FloatField()),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='footprint_measurements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date', 'id'],
+                'indexes': [models.Index(fields=['user', 'date'], name='footprint_user_date_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FootprintRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('start', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('minimum', models.FloatField()),
+                ('maximum', models.FloatField()),
+                ('last_value', models.FloatField()),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='footprint_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', 'period', 'start'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'period', 'start'), name='footprint_rollup_unique_period')],
+            },
+        ),
+        migrations.RunPython(import_footprint_lists, export_footprint_lists),
+        migrations.RemoveField(
+            model_name='user',
+            name='last_8_footprint_measurements',
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+def record_topic_tokens(apps, schema_editor):
+    PushSubscription = apps.get_model('ecotrack', 'PushSubscription')
+    # Tokens were subscribed to their topic when reminder_topic was set
+    PushSubscription.objects.exclude(reminder_topic='').update(topic_token=models.F('fcm_token'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecotrack', '0032_user_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pushsubscription',
+            name='topic_token',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(record_topic_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecotrack', '0033_pushsubscription_topic_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicBroadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=32)),
+                ('scheduled_for', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('topic', 'scheduled_for'), name='broadcast_unique_slot')],
+            },
+        ),
+    ]
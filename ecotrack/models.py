@@ -1,6 +1,9 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+from . import dashboard_cache
 from datetime import datetime, timedelta
+import copy
 import json
 
 
@@ -8,18 +11,94 @@ def get_default_dict():
     return {}
 
 
-class User(AbstractUser):
+class DirtyFieldsMixin:
+    """
+    Remembers field values as loaded, so save() without update_fields on an existing
+    row only writes the fields that changed and skips the query when none did (no
+    save signals are sent then). JSON values are remembered serialized, so in-place
+    edits such as user.achievements.append(...) count as changes; other values are
+    immutable and kept as they are. Deferred loads (.only() / .defer()) are not
+    tracked: their save() writes the loaded fields, as Django does.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._saved_values = None if self.get_deferred_fields() else {}
+        self._reset_dirty_state()
+
+    @staticmethod
+    def _saved_form(field, value):
+        if isinstance(field, models.JSONField):
+            try:
+                return json.dumps(value, cls=field.encoder, sort_keys=True)
+            except (TypeError, ValueError):
+                return copy.deepcopy(value)
+        return value
+
+    def _reset_dirty_state(self, fields=None):
+        """Take the current values of `fields` (attnames, default all loaded fields) as the saved state."""
+        if self._saved_values is None:
+            return
+        if fields is None:
+            self._saved_values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (fields is None or field.attname in fields):
+                self._saved_values[field.attname] = self._saved_form(field, self.__dict__[field.attname])
+
+    def get_dirty_fields(self):
+        """Names of the loaded fields whose value differs from the saved state (all of them if untracked)."""
+        saved = self._saved_values
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+            and (saved is None or field.attname not in saved
+                 or self._saved_form(field, self.__dict__[field.attname]) != saved[field.attname])
+        ]
+
+    def save(self, *args, **kwargs):
+        if (not args and not self._state.adding and self.pk is not None and self._saved_values is not None
+                and kwargs.get('update_fields') is None and not kwargs.get('force_insert')):
+            dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            kwargs['update_fields'] = dirty
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._reset_dirty_state(
+            None if update_fields is None else {self._meta.get_field(name).attname for name in update_fields}
+        )
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        fields = kwargs.get('fields', args[1] if len(args) > 1 else None)
+        if fields is None and self._saved_values is None and not self.get_deferred_fields():
+            # Fully loaded now, track it from here on
+            self._saved_values = {}
+        self._reset_dirty_state(
+            None if fields is None else {self._meta.get_field(name).attname for name in fields}
+        )
+
+
+class User(DirtyFieldsMixin, AbstractUser):
     days_since_last_survey = models.PositiveIntegerField(default=0)
     streak = models.PositiveIntegerField(default=0)
     sustainability_score = models.PositiveIntegerField(default=0)
     carbon_footprint = models.JSONField(default=list, blank=True)
-    habits = models.JSONField(default=list, blank=True)
     user_data = models.JSONField(default=get_default_dict, blank=True)
     survey_answered = models.BooleanField(default=False)
     achievements = models.JSONField(default=list, blank=True)
     last_checkin = models.DateField(null=True, blank=True, default=datetime.now() - timedelta(days=1))
     habits_today = models.PositiveIntegerField(default=0)
-    last_8_footprint_measurements = models.JSONField(default=list, blank=True)
+    # Bumped whenever data served by get_user_data changes; its ETag / Last-Modified validators
+    data_version = models.PositiveIntegerField(default=0)
+    data_updated_at = models.DateTimeField(default=timezone.now)
+
+    # User fields served by get_user_data
+    DASHBOARD_FIELDS = {
+        'username', 'streak', 'carbon_footprint', 'sustainability_score', 'last_checkin', 'habits_today',
+        'achievements',
+    }
 
     # By inheriting from AbstractUser, you get these fields automatically:
     # username
@@ -38,6 +117,143 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        changed = set(update_fields) if update_fields is not None else set(self.get_dirty_fields())
+        if not self._state.adding and changed & self.DASHBOARD_FIELDS:
+            self.data_version += 1
+            self.data_updated_at = timezone.now()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'data_version', 'data_updated_at'}
+            dashboard_cache.invalidate([self.pk])
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def touch_data(cls, user_ids):
+        """Mark the dashboard data of users as changed (after writes to their habits, footprints, ...)"""
+        user_ids = list(user_ids)
+        cls.objects.filter(id__in=user_ids).update(
+            data_version=models.F('data_version') + 1, data_updated_at=timezone.now(),
+        )
+        dashboard_cache.invalidate(user_ids)
+
+    def habits_completed_today(self, today=None):
+        """habits_today counts only on the day of the last check-in, so it resets at midnight without a write"""
+        # Same clock submit_questionnaire stamps last_checkin with
+        today = today or datetime.now().date()
+        last_checkin = self.last_checkin
+        if isinstance(last_checkin, datetime):
+            last_checkin = last_checkin.date()
+        return self.habits_today if last_checkin == today else 0
+
+    def habit_list(self):
+        """Return the user's habits as [{'id': ..., 'text': ...}], the shape the frontend and AI prompts use"""
+        return [{'id': str(habit_id), 'text': text} for habit_id, text in self.habits.values_list('id', 'text')]
+
+
+class Habit(models.Model):
+    """A habit a user is building, checked off day by day through HabitCheckIn"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='habits')
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.text}"
+
+    def current_streak(self, today):
+        """Number of consecutive completed days ending today (or yesterday, if today is not checked in yet)"""
+        dates = self.checkins.filter(completed=True, date__lte=today).values_list('date', flat=True)
+        streak = 0
+        expected = today
+        for date in dates.order_by('-date').iterator():
+            if streak == 0 and date == today - timedelta(days=1):
+                expected = date  # not checked in today yet
+            if date != expected:
+                break
+            streak += 1
+            expected = date - timedelta(days=1)
+        return streak
+
+    def completion_rate(self, today, days=30):
+        """Share of the last `days` days (today included) the habit was completed"""
+        completed = self.checkins.filter(
+            completed=True, date__gt=today - timedelta(days=days), date__lte=today,
+        ).count()
+        return completed / days if days else 0.0
+
+
+class HabitCheckIn(models.Model):
+    """Whether a habit was completed on a given day"""
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='checkins')
+    date = models.DateField()
+    completed = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            # One row per habit and day; also serves per-habit history range scans
+            models.UniqueConstraint(fields=['habit', 'date'], name='habit_checkin_unique_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.habit} - {self.date}"
+
+
+class FootprintMeasurement(models.Model):
+    """One carbon footprint reading (kg CO2e per month) of a user; the raw time series behind FootprintRollup"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='footprint_measurements', db_index=False)
+    date = models.DateField()
+    value = models.FloatField()
+
+    class Meta:
+        ordering = ['date', 'id']
+        indexes = [
+            # Range scans of one user's history; also serves the user FK
+            models.Index(fields=['user', 'date'], name='footprint_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date}: {self.value}"
+
+
+class FootprintRollup(models.Model):
+    """Weekly or monthly aggregate of a user's footprint measurements, kept up to date on insert"""
+    WEEK = 'week'
+    MONTH = 'month'
+    PERIOD_CHOICES = [
+        (WEEK, 'Week'),
+        (MONTH, 'Month'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='footprint_rollups', db_index=False)
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    # Monday of the week / first day of the month
+    start = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0)
+    minimum = models.FloatField()
+    maximum = models.FloatField()
+    # Value of the latest measurement in the period
+    last_value = models.FloatField()
+
+    class Meta:
+        ordering = ['user', 'period', 'start']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'period', 'start'], name='footprint_rollup_unique_period'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.period} of {self.start}"
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0.0
+
 
 class PushSubscription(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='push_subscription')
@@ -49,16 +265,53 @@ class PushSubscription(models.Model):
     # Device/platform information for better targeting
     device_type = models.CharField(max_length=50, default='web', blank=True, null=True)  # 'web', 'android', 'ios'
     notification_time = models.TimeField(default=datetime.strptime('09:00', '%H:%M').time())  # Default to 9:00 AM
+    # notification_time as minutes since midnight, kept in sync by save() so dispatch can use an index
+    notification_minute_of_day = models.PositiveSmallIntegerField(default=9 * 60)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     # De-duplication tracking to avoid multiple sends in the same day for the same scheduled time
     last_sent_date = models.DateField(null=True, blank=True)
     last_sent_time = models.TimeField(null=True, blank=True)
+    # Set when the FCM token needs checking (new token, or a send failed for an unclear reason);
+    # cleared by the validate_fcm_tokens job
+    token_suspect = models.BooleanField(default=False, db_index=True)
+    # Position in the NotificationCopy rotation, advanced on every successful send
+    copy_cursor = models.PositiveIntegerField(default=0)
+    # FCM topic the token is subscribed to (reminder-HHMM, see notification_topics), '' if none
+    reminder_topic = models.CharField(max_length=32, blank=True, default='')
+    # The token that was subscribed to reminder_topic; differs from fcm_token after a token refresh
+    topic_token = models.TextField(blank=True, default='')
+    
+    class Meta:
+        indexes = [
+            # Minute-tick dispatch: WHERE notification_minute_of_day = ? AND is_active AND last_sent_date ...
+            models.Index(
+                fields=['notification_minute_of_day', 'is_active', 'last_sent_date'],
+                name='pushsub_dispatch_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - Push Subscription"
     
+    @staticmethod
+    def minute_of_day(value):
+        """Return minutes since midnight for a time (or 'HH:MM' string)"""
+        if isinstance(value, str):
+            value = datetime.strptime(value[:5], '%H:%M').time()
+        return value.hour * 60 + value.minute
+    
+    def save(self, *args, **kwargs):
+        self.notification_minute_of_day = self.minute_of_day(self.notification_time)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # updated_at (auto_now) is what the scheduler polls without a shared change feed
+            kwargs['update_fields'] = {*update_fields, 'updated_at'}
+            if 'notification_time' in update_fields:
+                kwargs['update_fields'].add('notification_minute_of_day')
+        super().save(*args, **kwargs)
+    
     def get_subscription_info(self):
         """Return subscription info in the format expected by pywebpush"""
         return {
@@ -79,6 +332,72 @@ class PushSubscription(models.Model):
         return bool(token and token.strip())
 
 
+class NotificationOutbox(models.Model):
+    """One scheduled reminder for one subscription, claimed and delivered by outbox workers"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subscription = models.ForeignKey(PushSubscription, on_delete=models.CASCADE, related_name='outbox')
+    # The minute this reminder was scheduled for; one row per subscription and minute
+    scheduled_for = models.DateTimeField()
+    title = models.CharField(max_length=200)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Worker claim: rows in 'sending' whose lease has expired are claimed again
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['subscription', 'scheduled_for'], name='outbox_unique_slot'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'lease_expires_at'], name='outbox_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subscription.user.username} @ {self.scheduled_for} ({self.status})"
+
+
+class TopicBroadcast(models.Model):
+    """Claim on one minute's topic broadcast, so concurrent dispatchers send it once"""
+    topic = models.CharField(max_length=32)
+    scheduled_for = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['topic', 'scheduled_for'], name='broadcast_unique_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} @ {self.scheduled_for}"
+
+
+class NotificationCopy(models.Model):
+    """Pre-generated reminder message, rotated through by the notification dispatchers"""
+    text = models.CharField(max_length=200)
+    # Hash of the normalized text, so near-identical messages are stored once
+    text_hash = models.CharField(max_length=64, unique=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return self.text
+
+
 class Community(models.Model):
     """Model representing an eco-friendly community"""
     name = models.CharField(max_length=100, unique=True)
@@ -0,0 +1,203 @@
+"""
+Notification copy for EcoTrack reminders.
+A nightly job fills the NotificationCopy pool with pre-generated, deduplicated
+messages that the dispatchers rotate through per user, so sending needs no LLM
+call. When the pool is empty, personalised messages can instead be requested from
+Gemini in one prompt per batch of users (a JSON object keyed by username); users
+whose message is missing or unusable get the canned fallback message.
+"""
+
+import hashlib
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+
+from .llm import LLMUnavailable, get_llm
+from .models import NotificationCopy
+
+logger = logging.getLogger(__name__)
+
+COPY_BATCH_SIZE = 50
+MAX_MESSAGE_LENGTH = 120
+
+PROMPT_TEMPLATE = """
+    Generate one short, catchy, and engaging notification message for EACH of the users listed below, strictly to encourage them to fill out the EcoTrack check-in form.
+    EcoTrack is an app that helps users track their sustainability habits and promotes eco-friendly behavior. It includes features like:
+    - Daily surveys to track eco actions 🌱
+    - Personalized sustainability score 📊
+    - AI chatbot to guide users 🤖
+    - Personalized suggestions for greener living 💡
+    - Achievements for completing surveys and taking eco-friendly actions 🎁
+    - Daily streaks kept alive by submitting check-in everyday
+
+    Ensure the notifications are:
+    - under 60 characters
+    - Friendly, heartwarming, motivating, and aligned with EcoTrack's eco-conscious mission
+    - Include clear call-to-actions like "Share your thoughts", "fill now", "complete now"
+    - Include relevant emojis for engagement
+    - Highlight rewards or benefits if possible
+    - Different from each other
+    Give each message a human touch, with some warmth, inviting gesture and showing that you care for the user.
+    You may use the username in the message.
+
+    Usernames:
+    {usernames}
+
+    Return ONLY a JSON object mapping every username to its message, e.g.
+    {{"alice": "Hey Alice! 🌱 Your check-in is waiting, fill now!"}}
+"""
+
+
+POOL_PROMPT_TEMPLATE = """
+    Generate {count} different short, catchy, and engaging notification messages strictly to encourage users to fill out the EcoTrack check-in form.
+    EcoTrack is an app that helps users track their sustainability habits and promotes eco-friendly behavior. It includes features like:
+    - Daily surveys to track eco actions 🌱
+    - Personalized sustainability score 📊
+    - AI chatbot to guide users 🤖
+    - Personalized suggestions for greener living 💡
+    - Achievements for completing surveys and taking eco-friendly actions 🎁
+    - Daily streaks kept alive by submitting check-in everyday
+
+    Ensure the notifications are:
+    - under 60 characters
+    - Friendly, heartwarming, motivating, and aligned with EcoTrack's eco-conscious mission
+    - Include clear call-to-actions like "Share your thoughts", "fill now", "complete now"
+    - Include relevant emojis for engagement
+    - Highlight rewards or benefits if possible
+    - Clearly different from each other in wording and angle
+    Give each message a human touch, with some warmth, inviting gesture and showing that you care for the user.
+    Where you want to address the user by name, write {{username}} and it will be replaced.
+
+    Return ONLY a JSON array of strings.
+"""
+
+
+def fallback_message(username: str) -> str:
+    return f"Hey {username}!, time to track your footprints 🌱"
+
+
+def _load_json(text: str):
+    """Parse model output as JSON, tolerating a surrounding markdown code fence."""
+    return json.loads(re.sub(r"^```(?:json)?|```$", "", (text or "").strip()).strip())
+
+
+def _parse_messages(text: str) -> dict:
+    """Parse the model output into {username: message}, tolerating list output."""
+    data = _load_json(text)
+    if isinstance(data, list):
+        # [{"username": ..., "message": ...}, ...]
+        return {
+            str(item.get("username")): item.get("message")
+            for item in data
+            if isinstance(item, dict) and "username" in item
+        }
+    if not isinstance(data, dict):
+        raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+    return data
+
+
+def _usable(message) -> bool:
+    return isinstance(message, str) and 0 < len(message.strip()) <= MAX_MESSAGE_LENGTH
+
+
+def _generate_batch(usernames: List[str]) -> Dict[str, str]:
+    prompt = PROMPT_TEMPLATE.format(usernames="\n".join(f"- {username}" for username in usernames))
+    try:
+        messages = _parse_messages(get_llm().generate(prompt))
+    except LLMUnavailable as e:
+        logger.warning(f"Using fallback notification copy for {len(usernames)} users: {e}")
+        messages = {}
+    except ValueError as e:
+        logger.error(f"Could not parse notification copy for {len(usernames)} users: {e}")
+        messages = {}
+
+    copy = {}
+    for username in usernames:
+        message = messages.get(username)
+        copy[username] = message.strip() if _usable(message) else fallback_message(username)
+    return copy
+
+
+def generate_notification_copy(usernames: Iterable[str], batch_size: int = COPY_BATCH_SIZE) -> Dict[str, str]:
+    """
+    Return {username: message} for every username.
+
+    Usernames are split into batches of `batch_size`, each generated with a single
+    LLM call; batches run concurrently up to the LLM service's concurrency cap.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    batches = [usernames[i:i + batch_size] for i in range(0, len(usernames), batch_size)]
+    if not batches:
+        return {}
+
+    workers = min(len(batches), getattr(settings, 'GEMINI_MAX_CONCURRENCY', 8))
+    copy = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch_copy in executor.map(_generate_batch, batches):
+            copy.update(batch_copy)
+    return copy
+
+
+def _normalize_copy(text: str) -> str:
+    """Lowercase, drop emojis/punctuation and collapse whitespace, so trivial variants compare equal."""
+    return " ".join(re.sub(r"[^a-z0-9{}\s]", " ", text.lower()).split())
+
+
+def copy_hash(text: str) -> str:
+    return hashlib.sha256(_normalize_copy(text).encode()).hexdigest()
+
+
+def generate_copy_batch(count: int) -> List[str]:
+    """Ask Gemini for `count` generic reminder messages; unusable entries are dropped."""
+    messages = _load_json(get_llm().generate(POOL_PROMPT_TEMPLATE.format(count=count)))
+    if not isinstance(messages, list):
+        raise ValueError(f"expected a JSON array, got {type(messages).__name__}")
+    return [message.strip() for message in messages if _usable(message)]
+
+
+def add_to_pool(messages: Iterable[str]) -> int:
+    """Store new messages in the pool, skipping duplicates. Returns the number added."""
+    new = {}
+    for message in messages:
+        new.setdefault(copy_hash(message), message)
+    # Messages seen before (including retired ones) are not stored again
+    existing = set(NotificationCopy.objects.filter(text_hash__in=new).values_list('text_hash', flat=True))
+    NotificationCopy.objects.bulk_create(
+        [NotificationCopy(text=text, text_hash=key) for key, text in new.items() if key not in existing],
+        ignore_conflicts=True,
+    )
+    return len(new) - len(existing)
+
+
+def retire_old_copy(keep: int) -> int:
+    """Deactivate all but the newest `keep` active messages. Returns the number retired."""
+    keep_ids = list(
+        NotificationCopy.objects.filter(is_active=True).order_by('-id').values_list('id', flat=True)[:keep]
+    )
+    return NotificationCopy.objects.filter(is_active=True).exclude(id__in=keep_ids).update(is_active=False)
+
+
+def load_copy_pool() -> List[str]:
+    """Return the active messages in rotation order."""
+    return list(NotificationCopy.objects.filter(is_active=True).order_by('id').values_list('text', flat=True))
+
+
+def pick_copy(subscription, pool: List[str]) -> str:
+    """
+    Return the next pooled message for a subscription and advance its cursor.
+
+    Each user walks the pool round-robin from an offset based on their id, so a
+    user only sees a message again after going through the whole pool and users
+    scheduled for the same minute get different messages. The caller persists
+    `copy_cursor` together with the send markers once the message is sent.
+    """
+    username = subscription.user.username
+    if not pool:
+        return fallback_message(username)
+    text = pool[(subscription.user_id + subscription.copy_cursor) % len(pool)]
+    subscription.copy_cursor += 1
+    return text.replace("{username}", username)
@@ -0,0 +1,180 @@
+"""
+Time-slot FCM topics for broadcast reminders.
+The token of every deliverable subscription is subscribed to the topic of its
+reminder minute (e.g. reminder-0900), and PushSubscription.reminder_topic records
+which topic that is (and topic_token which token). With FCM_DISPATCH_MODE =
+'topic', cron_dispatch sends a minute's reminder to the topic in one call, however
+many subscribers the slot has; each broadcast is claimed with a TopicBroadcast
+row first, so dispatchers running concurrently send it once. Requests that change
+a subscription's token, time or state move its membership right away (move_topic);
+if that fails the subscription no longer matches its recorded topic, is reached per
+token through the outbox meanwhile, and is moved by the next sync_reminder_topics
+run with one call per topic and batch.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .firebase_service import FCMService, TOPIC_MANAGEMENT_LIMIT
+from .models import PushSubscription, TopicBroadcast
+from .notification_copy import load_copy_pool
+from .notification_wheel import is_deliverable
+from .outbox import REMINDER_TITLE, enqueue_slot
+
+logger = logging.getLogger(__name__)
+
+TOPIC_PREFIX = 'reminder-'
+# Used when every pooled message is personalised ({username})
+BROADCAST_FALLBACK = "Time to track your footprints 🌱 Your check-in is waiting!"
+
+
+def reminder_topic(value) -> str:
+    """Topic of a reminder time (time, 'HH:MM' or minute of day), e.g. 'reminder-0900'."""
+    minute = value if isinstance(value, int) else PushSubscription.minute_of_day(value)
+    return f'{TOPIC_PREFIX}{minute // 60:02d}{minute % 60:02d}'
+
+
+def expected_topic(subscription) -> str:
+    return reminder_topic(subscription.notification_time) if is_deliverable(subscription) else ''
+
+
+def move_topic(subscription) -> bool:
+    """
+    Move one subscription's token to the topic of its current reminder time (or out
+    of its topic if it is no longer deliverable), after a request changed it. Does
+    nothing unless FCM_DISPATCH_MODE is 'topic'. Returns False if an FCM call
+    failed; the rest is then left to sync_reminder_topics.
+    """
+    if getattr(settings, 'FCM_DISPATCH_MODE', 'batch') != 'topic':
+        return True
+    token = subscription.get_fcm_token()
+    target = expected_topic(subscription)
+    if subscription.reminder_topic == target and (not target or subscription.topic_token == token):
+        return True
+
+    moved = True
+    if subscription.reminder_topic and subscription.topic_token:
+        if FCMService.unsubscribe_from_topic([subscription.topic_token], subscription.reminder_topic)['errors']:
+            # Still a member of the old topic; keep the record so the next sync retries
+            logger.warning(f"Could not remove subscription {subscription.id} from {subscription.reminder_topic}")
+            return False
+    subscription.reminder_topic = subscription.topic_token = ''
+    if target:
+        if FCMService.subscribe_to_topic([token], target)['errors']:
+            logger.warning(f"Could not add subscription {subscription.id} to {target}")
+            moved = False
+        else:
+            subscription.reminder_topic, subscription.topic_token = target, token
+
+    PushSubscription.objects.filter(id=subscription.id).update(
+        reminder_topic=subscription.reminder_topic, topic_token=subscription.topic_token,
+    )
+    return moved
+
+
+def sync_topics(batch_size: int = TOPIC_MANAGEMENT_LIMIT) -> Dict[str, int]:
+    """
+    Bring the topic membership of all subscriptions in line with their reminder time,
+    with one subscribe / unsubscribe call per topic and batch. Returns counts.
+    """
+    totals = {'moved': 0, 'removed': 0, 'failed': 0}
+    subscriptions = PushSubscription.objects.only(
+        'id', 'fcm_token', 'notification_time', 'is_active', 'reminder_topic', 'topic_token'
+    ).order_by('id')
+
+    last_id = 0
+    while True:
+        batch = list(subscriptions.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        leaving, joining = defaultdict(list), defaultdict(list)
+        changed = []
+        for subscription in batch:
+            token = subscription.get_fcm_token()
+            target = expected_topic(subscription)
+            if subscription.reminder_topic == target and (not target or subscription.topic_token == token):
+                continue
+            if subscription.reminder_topic and subscription.topic_token:
+                leaving[subscription.reminder_topic].append(subscription.topic_token)
+            if target:
+                joining[target].append(subscription)
+            subscription.reminder_topic = target
+            subscription.topic_token = token if target else ''
+            changed.append(subscription)
+
+        for topic, tokens in leaving.items():
+            FCMService.unsubscribe_from_topic(tokens, topic)
+        for topic, members in joining.items():
+            errors = FCMService.subscribe_to_topic([member.get_fcm_token() for member in members], topic)['errors']
+            for member in members:
+                if member.get_fcm_token() in errors:
+                    # Reached per token through the outbox until the next sync
+                    member.reminder_topic = member.topic_token = ''
+                    totals['failed'] += 1
+
+        PushSubscription.objects.bulk_update(changed, ['reminder_topic', 'topic_token'])
+        for subscription in changed:
+            if subscription.reminder_topic:
+                totals['moved'] += 1
+            elif not expected_topic(subscription):
+                totals['removed'] += 1
+    return totals
+
+
+def broadcast_copy(slot: datetime, pool: List[str]) -> str:
+    """A message without personalisation for a slot, rotating through the pool by day and minute."""
+    generic = [text for text in pool if '{username}' not in text]
+    if not generic:
+        return BROADCAST_FALLBACK
+    local = timezone.localtime(slot)
+    return generic[(local.toordinal() * 1440 + PushSubscription.minute_of_day(local.time())) % len(generic)]
+
+
+def broadcast_slot(slot: datetime) -> int:
+    """
+    Send the reminder of `slot` to its topic in one call and mark the topic's due
+    subscriptions as sent. Returns how many subscriptions that covered. The slot is
+    claimed first; if another dispatcher already claimed it, nothing is sent and 0
+    is returned. If the send fails, the due subscriptions are queued in the
+    per-token outbox instead and 0 is returned.
+    """
+    slot = slot.replace(second=0, microsecond=0)
+    local = timezone.localtime(slot)
+    slot_time = local.time()
+    topic = reminder_topic(slot_time)
+    due = PushSubscription.objects.filter(
+        notification_minute_of_day=PushSubscription.minute_of_day(slot_time),
+        is_active=True,
+        reminder_topic=topic,
+        # A refreshed token is not in the topic until the next sync
+        topic_token=F('fcm_token'),
+    ).exclude(
+        last_sent_date=local.date(),
+        last_sent_time=slot_time,
+    )
+    if not due.exists():
+        return 0
+    try:
+        with transaction.atomic():
+            TopicBroadcast.objects.create(topic=topic, scheduled_for=slot)
+    except IntegrityError:
+        logger.info(f"Broadcast {local:%Y-%m-%d %H:%M} to {topic} already claimed")
+        return 0
+
+    body = broadcast_copy(slot, load_copy_pool())
+    if not FCMService.send_to_topic(topic, REMINDER_TITLE, body, {'type': 'daily_reminder'}):
+        logger.warning(f"Broadcast to {topic} failed, queueing its {local:%H:%M} reminders per token")
+        enqueue_slot(slot)
+        return 0
+    covered = due.update(last_sent_date=local.date(), last_sent_time=slot_time, updated_at=timezone.now())
+    logger.info(f"Broadcast {local:%Y-%m-%d %H:%M} reminder to {topic} ({covered} subscriptions)")
+    return covered
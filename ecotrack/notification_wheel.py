@@ -0,0 +1,135 @@
+"""
+In-memory schedule of push notification subscriptions for the scheduler daemon.
+TimeWheel keeps every deliverable subscription in one of 1440 per-minute slots, so
+the daemon only touches the database for minutes that have something to send.
+Saves and deletes of subscriptions are published to a change feed in the Django
+cache (see ecotrack/signals.py) that the daemon applies before firing each slot.
+The feed only reaches the daemon through a shared cache backend; with a
+process-local one the daemon polls the database for recently updated
+subscriptions instead (changed_since).
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import PushSubscription
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+
+FEED_SEQ_KEY = 'notification_wheel:seq'
+FEED_ENTRY_KEY = 'notification_wheel:change:{}'
+FEED_TTL = 24 * 60 * 60
+# Overlap of consecutive database polls, so a save committed after its updated_at is not missed
+POLL_OVERLAP = timedelta(minutes=1)
+
+
+def get_feed_cache():
+    """Return the cache backend carrying the schedule change feed."""
+    return caches[getattr(settings, 'NOTIFICATION_WHEEL_CACHE_ALIAS', 'default')]
+
+
+def feed_is_shared() -> bool:
+    """Whether changes published by other processes can reach this one through the feed cache."""
+    return not isinstance(get_feed_cache(), (LocMemCache, DummyCache))
+
+
+def is_deliverable(subscription) -> bool:
+    return subscription.is_active and subscription.has_valid_fcm_token()
+
+
+def publish_change(subscription_id: int, minute: Optional[int]):
+    """Record that a subscription moved to `minute` (None: no longer deliverable)."""
+    cache = get_feed_cache()
+    cache.add(FEED_SEQ_KEY, 0, timeout=None)
+    seq = cache.incr(FEED_SEQ_KEY)
+    cache.set(FEED_ENTRY_KEY.format(seq), (subscription_id, minute), timeout=FEED_TTL)
+
+
+def current_feed_seq() -> int:
+    return get_feed_cache().get(FEED_SEQ_KEY, 0)
+
+
+def read_changes(after: int) -> Tuple[int, Optional[List[Tuple[int, Optional[int]]]]]:
+    """
+    Return (latest sequence number, changes published after `after`).
+    Changes are None if some entries are missing (expired, evicted, or the feed
+    was reset), in which case the caller must reload the whole schedule.
+    """
+    cache = get_feed_cache()
+    seq = cache.get(FEED_SEQ_KEY, 0)
+    if seq == after:
+        return seq, []
+    if seq < after:
+        return seq, None
+
+    keys = [FEED_ENTRY_KEY.format(n) for n in range(after + 1, seq + 1)]
+    entries = cache.get_many(keys)
+    if len(entries) != len(keys):
+        return seq, None
+    return seq, [entries[key] for key in keys]
+
+
+def changed_since(since: datetime) -> List[Tuple[int, Optional[int]]]:
+    """
+    Schedule changes read from the database: (id, minute or None) for every
+    subscription updated since `since` (minus POLL_OVERLAP). Deleted subscriptions
+    are not seen and stay in the wheel until the next reload; their slot then
+    simply finds nothing to send.
+    """
+    rows = PushSubscription.objects.filter(updated_at__gte=since - POLL_OVERLAP).values_list(
+        'id', 'notification_minute_of_day', 'is_active', 'fcm_token'
+    )
+    return [
+        (subscription_id, minute if is_active and token and token.strip() else None)
+        for subscription_id, minute, is_active, token in rows.iterator(chunk_size=5000)
+    ]
+
+
+class TimeWheel:
+    """1440 per-minute slots of subscription ids, with an id -> slot index for moves."""
+
+    def __init__(self):
+        self.slots: List[Set[int]] = [set() for _ in range(MINUTES_PER_DAY)]
+        self._slot_of: Dict[int, int] = {}
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def place(self, subscription_id: int, minute: Optional[int]):
+        """Put a subscription in the slot for `minute`, or drop it if minute is None."""
+        old = self._slot_of.pop(subscription_id, None)
+        if old is not None:
+            self.slots[old].discard(subscription_id)
+        if minute is not None:
+            minute %= MINUTES_PER_DAY
+            self.slots[minute].add(subscription_id)
+            self._slot_of[subscription_id] = minute
+
+    def slot(self, minute: int) -> Set[int]:
+        return self.slots[minute % MINUTES_PER_DAY]
+
+    def load(self):
+        """Rebuild the wheel from the database."""
+        for slot in self.slots:
+            slot.clear()
+        self._slot_of.clear()
+        rows = PushSubscription.objects.filter(is_active=True).exclude(
+            fcm_token__isnull=True
+        ).exclude(
+            fcm_token__exact=''
+        ).values_list('id', 'notification_minute_of_day')
+        for subscription_id, minute in rows.iterator(chunk_size=5000):
+            self.place(subscription_id, minute)
+        logger.info(f"Loaded {len(self)} subscriptions into the notification time wheel")
+
+    def apply(self, changes: List[Tuple[int, Optional[int]]]):
+        for subscription_id, minute in changes:
+            self.place(subscription_id, minute)
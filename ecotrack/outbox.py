@@ -0,0 +1,310 @@
+"""
+Durable outbox for reminder notifications.
+The scheduler enqueues one NotificationOutbox row per subscription and minute
+(enqueueing the same minute twice is a no-op), and any number of worker
+processes claim pending rows, send them and record the outcome per row. Claims
+use SELECT ... FOR UPDATE SKIP LOCKED where the database supports it, and a
+conditional UPDATE with a lease otherwise (SQLite); rows of a worker that died
+mid-send are claimed again once their lease expires.
+
+Each enqueued minute doubles as a dispatch job: its id is the slot
+(slot_job_id), and its progress is read from the rows themselves, so any web
+process can report on a job another one started.
+"""
+
+import logging
+import os
+import socket
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .firebase_service import ConcurrentFCMSender, FCMService, MULTICAST_LIMIT
+from .models import NotificationOutbox, PushSubscription, TopicBroadcast
+from .notification_copy import load_copy_pool, pick_copy
+from .token_hygiene import record_send_failures
+
+logger = logging.getLogger(__name__)
+
+REMINDER_TITLE = 'EcoTrack Reminder'
+JOB_ID_FORMAT = '%Y%m%d%H%M'
+
+# Background delivery for cron_dispatch; one worker, since each run drains the whole outbox
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='outbox')
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def default_batch_size() -> int:
+    """Rows claimed and sent at a time: settings.FCM_BATCH_SIZE, capped at one FCM batch call."""
+    return max(1, min(getattr(settings, 'FCM_BATCH_SIZE', MULTICAST_LIMIT), MULTICAST_LIMIT))
+
+
+def enqueue_slot(slot: datetime, skip_topic: str = '') -> int:
+    """
+    Enqueue reminders for every subscription due at `slot` (a minute-aligned aware
+    datetime). Subscriptions that already have a row for this slot are skipped, so
+    concurrent or repeated calls enqueue each reminder once. Members of `skip_topic`
+    are left to its topic broadcast. Returns the number added.
+    """
+    slot = slot.replace(second=0, microsecond=0)
+    local = timezone.localtime(slot)
+    slot_time = local.time()
+    subscriptions = PushSubscription.objects.filter(
+        notification_minute_of_day=PushSubscription.minute_of_day(slot_time),
+        is_active=True,
+    ).exclude(
+        fcm_token__isnull=True
+    ).exclude(
+        fcm_token__exact=''
+    ).exclude(
+        last_sent_date=local.date(),
+        last_sent_time=slot_time,
+    ).exclude(
+        outbox__scheduled_for=slot
+    ).select_related('user')
+    if skip_topic:
+        subscriptions = subscriptions.exclude(reminder_topic=skip_topic, topic_token=F('fcm_token'))
+
+    subscriptions = list(subscriptions)
+    if not subscriptions:
+        return 0
+
+    # Messages come from the pre-generated pool (no LLM call at send time)
+    pool = load_copy_pool()
+    rows = [
+        NotificationOutbox(
+            subscription=subscription,
+            scheduled_for=slot,
+            title=REMINDER_TITLE,
+            body=pick_copy(subscription, pool),
+            data={'type': 'daily_reminder'},
+        )
+        for subscription in subscriptions
+    ]
+    with transaction.atomic():
+        NotificationOutbox.objects.bulk_create(rows, ignore_conflicts=True, batch_size=1000)
+        PushSubscription.objects.bulk_update(subscriptions, ['copy_cursor'], batch_size=1000)
+    logger.info(f"Enqueued {len(rows)} reminders for {local:%Y-%m-%d %H:%M}")
+    return len(rows)
+
+
+def _claimable(now):
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 3)
+    # For pending rows lease_expires_at holds the earliest retry time
+    return NotificationOutbox.objects.filter(
+        Q(status='pending', lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now),
+        status__in=['pending', 'sending'],
+        attempts__lt=max_attempts,
+    )
+
+
+def has_due() -> bool:
+    """Whether any row can be claimed now: new reminders, retries whose delay has passed or expired leases."""
+    return _claimable(timezone.now()).exists()
+
+
+def claim(worker_id: str, limit: int = None, lease_seconds: int = None) -> List[NotificationOutbox]:
+    """Claim up to `limit` rows for this worker and return them (with subscription and user loaded)."""
+    now = timezone.now()
+    limit = limit or default_batch_size()
+    lease_seconds = lease_seconds or getattr(settings, 'OUTBOX_LEASE_SECONDS', 120)
+    # Unique per claim, so a worker only ever finishes rows from its own current lease
+    lease_owner = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+    claim_fields = {
+        'status': 'sending',
+        'lease_owner': lease_owner,
+        'lease_expires_at': now + timedelta(seconds=lease_seconds),
+        'attempts': F('attempts') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                _claimable(now).select_for_update(skip_locked=True).order_by('id').values_list('id', flat=True)[:limit]
+            )
+            NotificationOutbox.objects.filter(id__in=ids).update(**claim_fields)
+    else:
+        # No row locks (SQLite): re-check the claim condition in the UPDATE itself, so rows
+        # another worker claimed in between are skipped
+        ids = list(_claimable(now).order_by('id').values_list('id', flat=True)[:limit])
+        _claimable(now).filter(id__in=ids).update(**claim_fields)
+
+    return list(
+        NotificationOutbox.objects.filter(lease_owner=lease_owner, status='sending')
+        .select_related('subscription__user')
+        .order_by('id')
+    )
+
+
+def _send(rows: List[NotificationOutbox]) -> Dict[str, Exception]:
+    notifications = [
+        {'token': row.subscription.get_fcm_token(), 'title': row.title, 'body': row.body,
+         'data': row.data, 'device_type': row.subscription.device_type}
+        for row in rows
+    ]
+    if getattr(settings, 'FCM_DISPATCH_MODE', 'batch') == 'single':
+        # Per-token requests for environments where FCM batch sending is blocked
+        return ConcurrentFCMSender().send(notifications).errors
+    return FCMService.send_each(notifications)['errors']
+
+
+def deliver(rows: List[NotificationOutbox]) -> Dict[str, List[NotificationOutbox]]:
+    """
+    Send claimed rows and record the outcome of each: 'sent', 'failed' (dead token or
+    out of attempts) or 'pending' again, to be retried after OUTBOX_RETRY_DELAY seconds.
+    Delivered subscriptions also get their last-sent markers. Only rows still held by
+    this claim are updated.
+    """
+    result = {'sent': [], 'failed': [], 'retry': []}
+    if not rows:
+        return result
+
+    errors = _send(rows)
+    now = timezone.now()
+    retry_at = now + timedelta(seconds=getattr(settings, 'OUTBOX_RETRY_DELAY', 60))
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 3)
+    for row in rows:
+        error = errors.get(row.subscription.get_fcm_token())
+        if error is None:
+            result['sent'].append(row)
+            continue
+        row.last_error = f'{type(error).__name__}: {error}'
+        if FCMService.is_dead_token_error(error) or row.attempts >= max_attempts:
+            row.status, row.lease_expires_at = 'failed', None
+            result['failed'].append(row)
+        else:
+            row.status, row.lease_expires_at = 'pending', retry_at
+            result['retry'].append(row)
+
+    lease_owner = rows[0].lease_owner
+    with transaction.atomic():
+        NotificationOutbox.objects.filter(
+            id__in=[row.id for row in result['sent']], lease_owner=lease_owner,
+        ).update(status='sent', sent_at=now, last_error='', lease_expires_at=None)
+        for row in result['failed'] + result['retry']:
+            NotificationOutbox.objects.filter(id=row.id, lease_owner=lease_owner).update(
+                status=row.status, last_error=row.last_error, lease_expires_at=row.lease_expires_at,
+            )
+
+        delivered = []
+        for row in result['sent']:
+            subscription = row.subscription
+            local = timezone.localtime(row.scheduled_for)
+            subscription.last_sent_date = local.date()
+            subscription.last_sent_time = local.time()
+            subscription.updated_at = now  # bulk_update skips auto_now
+            delivered.append(subscription)
+        PushSubscription.objects.bulk_update(delivered, ['last_sent_date', 'last_sent_time', 'updated_at'])
+
+    # Unregistered tokens are deactivated, other failures checked later by validate_fcm_tokens
+    record_send_failures([row.subscription for row in rows], errors)
+    return result
+
+
+def process(worker_id: str = None, batch_size: int = None, max_batches: int = None) -> Dict[str, list]:
+    """Claim and deliver batches until nothing is claimable (or max_batches). Returns all outcomes."""
+    worker_id = worker_id or default_worker_id()
+    batch_size = batch_size or default_batch_size()
+    # Rows whose last attempt died with its worker and have no attempts left
+    NotificationOutbox.objects.filter(
+        status='sending', lease_expires_at__lt=timezone.now(),
+        attempts__gte=getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 3),
+    ).update(status='failed', last_error='Lease expired on the last attempt', lease_expires_at=None)
+
+    totals = {'sent': [], 'failed': [], 'retry': []}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = claim(worker_id, limit=batch_size)
+        if not rows:
+            break
+        batches += 1
+        for key, value in deliver(rows).items():
+            totals[key].extend(value)
+    return totals
+
+
+def purge(days: int = None, batch_size: int = 1000) -> int:
+    """
+    Delete sent and failed rows scheduled more than `days` (default
+    settings.OUTBOX_RETENTION_DAYS) days ago, `batch_size` at a time so no single
+    DELETE holds the table for long, along with topic broadcast claims of the same
+    age. Returns the number of outbox rows deleted.
+    """
+    days = getattr(settings, 'OUTBOX_RETENTION_DAYS', 14) if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    finished = NotificationOutbox.objects.filter(status__in=['sent', 'failed'], scheduled_for__lt=cutoff)
+    deleted = 0
+    while True:
+        ids = list(finished.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        deleted += NotificationOutbox.objects.filter(id__in=ids).delete()[0]
+    TopicBroadcast.objects.filter(scheduled_for__lt=cutoff).delete()
+    if deleted:
+        logger.info(f"Purged {deleted} outbox rows older than {days} days")
+    return deleted
+
+
+def _run(func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        logger.error(f"Background {func.__name__} failed: {type(e).__name__} - {e}")
+    finally:
+        # The executor thread gets its own database connection; don't leak it
+        connections.close_all()
+
+
+def run_in_background(func, *args):
+    """
+    Run func(*args) on this process's background thread and return immediately.
+    Jobs run one at a time, in the order they were submitted.
+    """
+    return _executor.submit(_run, func, *args)
+
+
+def _process_and_log():
+    results = process()
+    logger.info(
+        f"Background delivery finished: {len(results['sent'])} sent, "
+        f"{len(results['failed'])} failed, {len(results['retry'])} to retry"
+    )
+
+
+def deliver_in_background():
+    """Deliver the outbox on this process's background thread and return immediately."""
+    return run_in_background(_process_and_log)
+
+
+def slot_job_id(slot: datetime) -> str:
+    return timezone.localtime(slot).strftime(JOB_ID_FORMAT)
+
+
+def job_slot(job_id: str) -> datetime:
+    """The slot a job id refers to. Raises ValueError for malformed ids."""
+    return timezone.make_aware(datetime.strptime(job_id, JOB_ID_FORMAT))
+
+
+def job_progress(job_id: str) -> Dict[str, int]:
+    """Row counts of a dispatch job by outcome; 'in_flight' are queued or being sent."""
+    counts = dict(
+        NotificationOutbox.objects.filter(scheduled_for=job_slot(job_id))
+        .order_by()
+        .values_list('status')
+        .annotate(count=Count('id'))
+    )
+    return {
+        'total': sum(counts.values()),
+        'sent': counts.get('sent', 0),
+        'failed': counts.get('failed', 0),
+        'in_flight': counts.get('pending', 0) + counts.get('sending', 0),
+    }
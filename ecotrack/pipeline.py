@@ -0,0 +1,138 @@
+"""
+Small thread-based streaming pipeline used by the notification dispatch commands.
+Stages are connected by bounded queues, so a slow stage applies back-pressure
+instead of letting work pile up, and each stage runs its own number of worker
+threads so slow stages overlap instead of adding up. Every stage records how
+many items it handled and how long its workers were busy.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker passed down the queues
+DONE = object()
+
+
+class Stage:
+    """
+    `workers` threads applying `func` to every item of `inbox` and putting the
+    non-None results on `outbox`. An exception fails only the item being handled
+    (reported to `on_error`, if given).
+    """
+
+    def __init__(self, name: str, func: Callable, inbox: queue.Queue, outbox: Optional[queue.Queue] = None,
+                 workers: int = 1, on_error: Optional[Callable] = None):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = max(1, workers)
+        self.on_error = on_error
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        self._running = self.workers
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'{self.name}-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        try:
+            while True:
+                item = self.inbox.get()
+                if item is DONE:
+                    # Let the other workers of this stage see the end of the stream too
+                    self.inbox.put(DONE)
+                    break
+
+                started = time.monotonic()
+                try:
+                    result = self.func(item)
+                except Exception as e:
+                    result = None
+                    with self._lock:
+                        self.errors += 1
+                    logger.error(f"Pipeline stage {self.name} failed: {type(e).__name__} - {e}")
+                    if self.on_error is not None:
+                        self.on_error(item, e)
+                with self._lock:
+                    self.items += 1
+                    self.busy += time.monotonic() - started
+
+                if result is not None and self.outbox is not None:
+                    self.outbox.put(result)
+        finally:
+            # Worker threads get their own database connections; don't leak them
+            connections.close_all()
+            with self._lock:
+                self._running -= 1
+                last = self._running == 0
+            if last and self.outbox is not None:
+                self.outbox.put(DONE)
+
+
+class Source:
+    """Thread feeding the items of `iterable` into `outbox`, timing only the time spent producing them."""
+
+    def __init__(self, name: str, iterable: Callable[[], Iterable], outbox: queue.Queue):
+        self.name = name
+        self.iterable = iterable
+        self.outbox = outbox
+        self.workers = 1
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def join(self):
+        self._thread.join()
+
+    def _run(self):
+        try:
+            iterator = iter(self.iterable())
+            while True:
+                started = time.monotonic()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    self.busy += time.monotonic() - started
+                self.items += 1
+                self.outbox.put(item)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Pipeline source {self.name} failed: {type(e).__name__} - {e}")
+        finally:
+            connections.close_all()
+            self.outbox.put(DONE)
+
+
+def run_pipeline(stages):
+    """Start all stages (source first), wait for the stream to drain and return the elapsed time."""
+    started = time.monotonic()
+    for stage in stages:
+        stage.start()
+    for stage in stages:
+        stage.join()
+    return time.monotonic() - started
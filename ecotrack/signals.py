@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PushSubscription
+from .notification_wheel import is_deliverable, publish_change
+
+# Fields that decide whether and when a subscription is scheduled
+SCHEDULE_FIELDS = {'notification_time', 'notification_minute_of_day', 'is_active', 'fcm_token'}
+
+
+@receiver(post_save, sender=PushSubscription)
+def publish_subscription_schedule(sender, instance, update_fields=None, **kwargs):
+    """Tell the scheduler daemon's time wheel about schedule changes (not send-marker saves)."""
+    if update_fields is not None and not SCHEDULE_FIELDS.intersection(update_fields):
+        return
+    publish_change(instance.id, instance.notification_minute_of_day if is_deliverable(instance) else None)
+
+
+@receiver(post_delete, sender=PushSubscription)
+def unpublish_subscription_schedule(sender, instance, **kwargs):
+    publish_change(instance.id, None)
@@ -19,12 +19,10 @@ class EcoTrackAPI {
         let userdata;
 
         await fetch("get_user_data", {
-            method: 'POST',
+            method: 'GET',
             headers: {
                 'Content-Type': 'application/json',
-                'X-CSRFToken': getCsrfToken(),
             },
-            body: {}
         })
             .then(response => {
                 if (!response.ok) {
@@ -947,12 +947,10 @@ function isDateToday(inputDate) {
 
 async function toggleCheckinForm() {
     let checked_in_today = await fetch("get_user_data", {
-        method: 'POST',
+        method: 'GET',
         headers: {
             'Content-Type': 'application/json',
-            'X-CSRFToken': getCsrfToken(),
         },
-        body: {}
     })
         .then(response => {
             if (!response.ok) {
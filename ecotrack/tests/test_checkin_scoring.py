@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..ai_cache import get_ai_cache
+from ..checkin_scoring import annotate_questions, classify_answer, score_answers
+from ..llm import LLMUnavailable
+
+
+class CheckinScoringTests(SimpleTestCase):
+
+    def setUp(self):
+        get_ai_cache().clear()
+
+    def test_yes_no_answers(self):
+        self.assertEqual(classify_answer("Did you use public transport today?", "Yes 🚌"), 1)
+        self.assertEqual(classify_answer("Did you use public transport today?", "No"), 0)
+
+    def test_negative_questions_are_inverted(self):
+        self.assertEqual(classify_answer("Did you eat meat today?", "Yes"), 0)
+        self.assertEqual(classify_answer("Did you drive to work today?", "No"), 1)
+        self.assertEqual(classify_answer("Did you eat meat today?", "Sometimes"), 0)
+
+    def test_negations_and_helpful_choices_are_not_negative(self):
+        self.assertEqual(classify_answer("Did you avoid single-use plastic today?", "Yes"), 1)
+        self.assertEqual(classify_answer("Did you compost food waste today?", "Yes"), 1)
+        self.assertEqual(classify_answer("Did you recycle today?", "Partially"), 1)
+
+    def test_option_values(self):
+        question = "How did you get to work today?"
+        self.assertEqual(classify_answer(question, "Walk/Cycle"), 1)
+        self.assertEqual(classify_answer(question, "Car (single)"), 0)
+        self.assertIsNone(classify_answer(question, "It depends"))
+        self.assertIsNone(classify_answer(question, "🤷"))
+
+    def test_stored_verdicts_take_precedence(self):
+        questions = annotate_questions([{"question": "Did you eat meat today?",
+                                         "options": [{"value": "Yes"}, {"value": "No"}]}])
+        self.assertEqual([option["helpful"] for option in questions[0]["options"]], [0, 1])
+        questions[0]["options"][0]["helpful"] = 1
+        self.assertEqual(score_answers({"Did you eat meat today?": "Yes"}, questions), 1)
+
+    def test_only_unknown_answers_are_judged_and_cached(self):
+        judge = mock.Mock(return_value=[1])
+        answers = {"Did you use public transport today?": "Yes", "What did you do?": "Planted a tree"}
+        self.assertEqual(score_answers(answers, judge=judge), 2)
+        judge.assert_called_once_with([("What did you do?", "Planted a tree")])
+        self.assertEqual(score_answers(answers, judge=judge), 2)
+        self.assertEqual(judge.call_count, 1)
+
+    def test_judge_failure_scores_zero(self):
+        judge = mock.Mock(side_effect=LLMUnavailable("circuit open"))
+        self.assertEqual(score_answers({"What did you do?": "Planted a tree"}, judge=judge), 0)
@@ -0,0 +1,69 @@
+from datetime import datetime, time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import outbox
+from ..models import NotificationOutbox, PushSubscription, User
+
+
+@override_settings(CRON_SECRET='secret', FCM_DISPATCH_MODE='batch', OUTBOX_INLINE_DELIVERY=True)
+class CronDispatchTests(TestCase):
+
+    def setUp(self):
+        for i in range(2):
+            PushSubscription.objects.create(
+                user=User.objects.create(username=f'cron{i}'), endpoint='e', p256dh_key='k', auth_key='a',
+                fcm_token=f'token-{i}', notification_time=time(9, 0),
+            )
+        self.now = timezone.make_aware(datetime(2026, 1, 5, 9, 0, 30))
+        patcher = mock.patch('django.utils.timezone.now', return_value=self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Delivery runs on a background thread in production; here it is only recorded
+        patcher = mock.patch.object(outbox, 'deliver_in_background')
+        self.deliver = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def dispatch(self, token='secret'):
+        return self.client.get(reverse('cron_dispatch'), {'token': token})
+
+    def status(self, job_id, token='secret'):
+        return self.client.get(reverse('cron_dispatch_status', args=[job_id]), {'token': token})
+
+    def test_requires_the_secret(self):
+        self.assertEqual(self.dispatch(token='wrong').status_code, 401)
+        self.assertEqual(self.status('202601050900', token='wrong').status_code, 401)
+
+    def test_queues_the_minute_and_returns_a_job(self):
+        response = self.dispatch()
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual((body['job_id'], body['total_candidates'], body['time']), ('202601050900', 2, '09:00'))
+        self.assertEqual(body['status_url'], reverse('cron_dispatch_status', args=['202601050900']))
+        self.assertEqual(NotificationOutbox.objects.filter(status='pending').count(), 2)
+        self.deliver.assert_called_once()
+
+        # A repeated call for the same minute queues nothing new
+        self.assertEqual(self.dispatch().json()['total_candidates'], 0)
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+
+    @override_settings(OUTBOX_INLINE_DELIVERY=False)
+    def test_leaves_delivery_to_workers(self):
+        self.assertEqual(self.dispatch().status_code, 202)
+        self.deliver.assert_not_called()
+
+    def test_status_reports_progress(self):
+        job_id = self.dispatch().json()['job_id']
+        body = self.status(job_id).json()
+        self.assertEqual((body['total'], body['in_flight'], body['done']), (2, 2, False))
+
+        NotificationOutbox.objects.filter(subscription__fcm_token='token-0').update(status='sent')
+        NotificationOutbox.objects.filter(subscription__fcm_token='token-1').update(status='failed')
+        body = self.status(job_id).json()
+        self.assertEqual((body['sent'], body['failed'], body['in_flight'], body['done']), (1, 1, 0, True))
+
+    def test_status_of_an_invalid_job(self):
+        self.assertEqual(self.status('not-a-job').status_code, 400)
@@ -0,0 +1,52 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import User
+
+
+class DirtyFieldsTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('dirty', 'dirty@example.com', 'pw')
+        self.user = User.objects.get(pk=user.pk)
+
+    def updates(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+
+    def test_unchanged_save_writes_nothing(self):
+        with self.assertNumQueries(0):
+            self.user.save()
+
+    def test_only_changed_fields_are_written(self):
+        self.user.achievements.append('first_checkin')
+        [sql] = self.updates(self.user.save)
+        self.assertIn('"achievements"', sql)
+        self.assertNotIn('"user_data"', sql)
+        self.assertNotIn('"password"', sql)
+        self.assertEqual(self.updates(self.user.save), [])
+
+    def test_dashboard_changes_bump_data_version(self):
+        version = self.user.data_version
+        self.user.streak = 3
+        self.user.save()
+        self.user.user_data = {'answer': 1}
+        self.user.save()
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.data_version, self.user.streak), (version + 1, 3))
+
+    def test_update_fields_bump_data_version(self):
+        version = self.user.data_version
+        self.user.habits_today = 2
+        self.user.save(update_fields=['habits_today'])
+        self.assertEqual(User.objects.get(pk=self.user.pk).data_version, version + 1)
+
+    def test_deferred_loads_save_their_loaded_fields(self):
+        user = User.objects.only('id', 'user_data').get(pk=self.user.pk)
+        user.user_data = {'answer': 2}
+        [sql] = self.updates(user.save)
+        self.assertIn('"user_data"', sql)
+        self.assertNotIn('"password"', sql)
+        self.assertEqual(User.objects.get(pk=self.user.pk).user_data, {'answer': 2})
@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from .. import emission_factors
+from ..emission_factors import CONFIG, FactorTables, get_factor_tables, load_factor_tables
+from ..utils import calculate_personal_carbon_footprint
+from .test_footprint_batch import BASE_SURVEY
+
+
+def monthly_footprint(survey):
+    return calculate_personal_carbon_footprint(survey)['summary']['personal_monthly_co2e_kg']
+
+
+class FactorTablesTests(SimpleTestCase):
+
+    def setUp(self):
+        # Back to the built-in factor set whatever a test loaded
+        self.addCleanup(load_factor_tables)
+
+    def test_unknown_answers_use_the_fallback_factor(self):
+        flights = get_factor_tables()['flight']
+        self.assertEqual(flights.lookup({'flight': 'Long-haul (>6h)'}, 'flight'), 8000)
+        self.assertEqual(flights.lookup({'flight': 'By rocket'}, 'flight'), 2000)
+        self.assertEqual(flights.lookup({}, 'flight'), 1100)
+        self.assertEqual(list(flights.encode([{'flight': 'By rocket'}, {}], 'flight')),
+                         [flights.unknown_code, flights.code('Short-haul (<3h)')])
+
+    def test_overrides_are_merged_into_the_defaults(self):
+        tables = load_factor_tables({'factors': {'EF_ELECTRICITY': {'No': 0.9}}})
+        self.assertIs(get_factor_tables(), tables)
+        self.assertEqual(tables['electricity'].lookup({'grid': 'No'}, 'grid'), 0.9)
+        self.assertEqual(tables['electricity'].lookup({'grid': 'Yes'}, 'grid'), 0.05)
+        self.assertNotEqual(tables.version, FactorTables(CONFIG).version)
+
+    def test_hot_reload_from_the_factor_file(self):
+        before = monthly_footprint(BASE_SURVEY)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'factors.json')
+            with open(path, 'w') as f:
+                json.dump({'factors': {'EF_ELECTRICITY': {'No': 0.95}}}, f)
+
+            with override_settings(EMISSION_FACTORS_FILE=path), \
+                    mock.patch.dict(emission_factors._file_state, {'checked_at': None, 'mtime': None}), \
+                    mock.patch.object(emission_factors, 'RELOAD_CHECK_INTERVAL', 0):
+                self.assertGreater(monthly_footprint(BASE_SURVEY), before)
+                version = get_factor_tables().version
+
+                # A broken file keeps the current tables
+                with open(path, 'w') as f:
+                    f.write('{not json')
+                os.utime(path, (0, 0))
+                with self.assertLogs('ecotrack.emission_factors', 'ERROR'):
+                    self.assertEqual(get_factor_tables().version, version)
+
+    def test_file_is_not_checked_between_intervals(self):
+        with override_settings(EMISSION_FACTORS_FILE='/nonexistent/factors.json'), \
+                mock.patch.dict(emission_factors._file_state, {'checked_at': None, 'mtime': None}), \
+                mock.patch.object(emission_factors.os.path, 'getmtime', side_effect=OSError) as getmtime, \
+                self.assertLogs('ecotrack.emission_factors', 'ERROR'):
+            get_factor_tables()
+            get_factor_tables()
+        self.assertEqual(getmtime.call_count, 1)
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import Counter
+
+from django.test import SimpleTestCase
+from firebase_admin import exceptions, messaging
+
+from ..firebase_service import ConcurrentFCMSender, StubTransport, TokenBucket
+
+
+def notifications(count):
+    return [{'token': f'token-{i}', 'title': 'Reminder', 'body': 'Check in', 'data': {'type': 'daily_reminder'}}
+            for i in range(count)]
+
+
+class FlakyTransport:
+    """Fails the first `failures` sends of every token with a retryable error, tracking concurrency."""
+
+    def __init__(self, failures=0, latency=0.0):
+        self.failures = failures
+        self.latency = latency
+        self.attempts = Counter()
+        self.in_flight = self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def send(self, message, dry_run=False):
+        with self._lock:
+            self.attempts[message.token] += 1
+            attempt = self.attempts[message.token]
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        if attempt <= self.failures:
+            raise exceptions.UnavailableError('try again')
+        return f'projects/test/messages/{message.token}'
+
+
+class ConcurrentFCMSenderTests(SimpleTestCase):
+
+    def sender(self, transport, **options):
+        options.setdefault('backoff_base', 0)
+        return ConcurrentFCMSender(transport, **options)
+
+    def test_sends_every_notification(self):
+        transport = StubTransport(latency=0)
+        report = self.sender(transport).send(notifications(20))
+        self.assertEqual((report.success_count, report.failure_count, report.retry_count), (20, 0, 0))
+        self.assertEqual(transport.sent, 20)
+
+    def test_retryable_errors_are_retried(self):
+        transport = FlakyTransport(failures=2)
+        report = self.sender(transport, max_retries=3).send(notifications(5))
+        self.assertEqual((report.success_count, report.retry_count), (5, 10))
+        self.assertEqual(set(transport.attempts.values()), {3})
+
+    def test_gives_up_after_max_retries(self):
+        with self.assertLogs('ecotrack.firebase_service', 'WARNING'):
+            report = self.sender(StubTransport(latency=0, failure_rate=1), max_retries=2).send(notifications(3))
+        self.assertEqual((report.failure_count, report.retry_count), (3, 6))
+        self.assertEqual(sorted(report.failed_tokens), ['token-0', 'token-1', 'token-2'])
+        self.assertIsInstance(report.errors['token-0'], exceptions.UnavailableError)
+
+    def test_other_errors_are_not_retried(self):
+        transport = StubTransport(latency=0, failure_rate=1, error_factory=lambda: messaging.UnregisteredError('gone'))
+        with self.assertLogs('ecotrack.firebase_service', 'WARNING'):
+            report = self.sender(transport).send(notifications(3))
+        self.assertEqual((report.failure_count, report.retry_count), (3, 0))
+        self.assertIsInstance(report.errors['token-1'], messaging.UnregisteredError)
+
+    def test_pool_size_bounds_concurrency(self):
+        transport = FlakyTransport(latency=0.01)
+        self.sender(transport, max_workers=3).send(notifications(12))
+        self.assertLessEqual(transport.max_in_flight, 3)
+        self.assertGreater(transport.max_in_flight, 1)
+
+    def test_empty_batch(self):
+        report = self.sender(StubTransport(latency=0)).send([])
+        self.assertEqual((report.success_count, report.failure_count, report.throughput), (0, 0, 0.0))
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def test_bursts_up_to_capacity_then_waits(self):
+        bucket = TokenBucket(rate=100, capacity=5)
+        started = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - started, 0.05)
+        for _ in range(5):
+            bucket.acquire()
+        # Five more sends at 100 per second
+        self.assertGreaterEqual(time.monotonic() - started, 0.045)
@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase
+
+from ..utils import (calculate_personal_carbon_footprint, calculate_personal_carbon_footprint_batch,
+                     calculate_personal_monthly_co2e_batch)
+
+
+BASE_SURVEY = {
+    "how_many_people_are_in_your_household": 3,
+    "how_much_electricity_does_your_household_use_per_month": 450,
+    "is_your_electricity_from_renewable_sources": "No",
+    "what_is_your_primary_heating_source": "Electricity",
+    "what_percentage_of_your_monthly_electricity_consumption_do_you_think_is_used_for_heating": 20,
+    "how_many_vehicles_are_in_your_household": 1,
+    "vehicle_1_type": "Petrol",
+    "vehicle_1_mileage": 12000,
+    "how_much_distance_do_you_commute_in_public_transport_per_week_on_average": 40,
+    "how_many_flights_have_you_taken_in_the_past_year": 1,
+    "flight_1_type": "Short-haul",
+    "how_much_water_does_your_household_use_per_month_in_litres": 9000,
+    "do_you_offset_your_carbon_emissions": "No",
+}
+
+
+class FootprintBatchTests(SimpleTestCase):
+    """The batch engine must give exactly what the scalar function gives, for any stored answer."""
+
+    NUMERIC_KEYS = [
+        "how_many_people_are_in_your_household",
+        "how_much_electricity_does_your_household_use_per_month",
+        "how_many_vehicles_are_in_your_household",
+        "vehicle_1_mileage",
+        "how_many_flights_have_you_taken_in_the_past_year",
+        "how_much_water_does_your_household_use_per_month_in_litres",
+    ]
+    ODD_VALUES = [None, '', 'lots', [3], {'value': 3}, '7', 2.5]
+
+    def assert_batch_matches_scalar(self, surveys):
+        expected = [calculate_personal_carbon_footprint(survey) for survey in surveys]
+        self.assertEqual(calculate_personal_carbon_footprint_batch(surveys), expected)
+        self.assertEqual(calculate_personal_monthly_co2e_batch(surveys),
+                         [result['summary']['personal_monthly_co2e_kg'] for result in expected])
+
+    def test_odd_values_in_a_batch_of_valid_surveys(self):
+        for key in self.NUMERIC_KEYS:
+            for value in self.ODD_VALUES:
+                with self.subTest(key=key, value=value):
+                    self.assert_batch_matches_scalar([BASE_SURVEY, {**BASE_SURVEY, key: value}, BASE_SURVEY])
+
+    def test_odd_values_alone(self):
+        for key in self.NUMERIC_KEYS:
+            for value in self.ODD_VALUES:
+                with self.subTest(key=key, value=value):
+                    self.assert_batch_matches_scalar([{**BASE_SURVEY, key: value}])
+
+    def test_missing_answers(self):
+        self.assert_batch_matches_scalar([{}, {"how_many_vehicles_are_in_your_household": 2}, BASE_SURVEY])
@@ -0,0 +1,66 @@
+from datetime import date
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..footprints import rebuild_periods, record_footprint, replace_latest_footprints, weekly_series
+from ..models import FootprintMeasurement, FootprintRollup, User
+
+MONDAY = date(2026, 1, 5)
+
+
+class FootprintHistoryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='history')
+
+    def rollup(self, period, start, user=None):
+        return FootprintRollup.objects.get(user=user or self.user, period=period, start=start)
+
+    def summary(self, rollup):
+        return rollup.count, rollup.total, rollup.minimum, rollup.maximum, rollup.last_value
+
+    def test_readings_are_folded_into_rollups(self):
+        record_footprint(self.user, 300, date(2026, 1, 6))
+        record_footprint(self.user, 280, date(2026, 1, 8))
+        # A late reading for an earlier day does not become the period's latest value
+        record_footprint(self.user, 320, date(2026, 1, 7))
+        self.assertEqual(self.summary(self.rollup(FootprintRollup.WEEK, MONDAY)), (3, 900, 280, 320, 280))
+        self.assertEqual(self.summary(self.rollup(FootprintRollup.MONTH, date(2026, 1, 1))), (3, 900, 280, 320, 280))
+
+    def test_replace_latest_footprints(self):
+        record_footprint(self.user, 300, MONDAY)
+        record_footprint(self.user, 250, date(2026, 1, 12))
+        newcomer = User.objects.create(username='newcomer')
+
+        self.assertEqual(replace_latest_footprints({self.user.id: 200, newcomer.id: 150}), 2)
+        self.assertEqual(list(FootprintMeasurement.objects.filter(user=self.user).values_list('value', flat=True)),
+                         [300, 200])
+        self.assertEqual(self.rollup(FootprintRollup.WEEK, MONDAY).last_value, 300)
+        self.assertEqual(self.rollup(FootprintRollup.WEEK, date(2026, 1, 12)).last_value, 200)
+        self.assertEqual(self.summary(self.rollup(FootprintRollup.MONTH, date(2026, 1, 1))), (2, 500, 200, 300, 200))
+        self.assertEqual(FootprintMeasurement.objects.get(user=newcomer).date, timezone.localdate())
+
+        # Unchanged values leave the history (and the users' data_version) alone
+        version = User.objects.get(id=self.user.id).data_version
+        self.assertEqual(replace_latest_footprints({self.user.id: 200, newcomer.id: 150}), 0)
+        self.assertEqual(User.objects.get(id=self.user.id).data_version, version)
+
+    def test_rebuild_periods_reads_only_the_given_periods(self):
+        record_footprint(self.user, 300, MONDAY)
+        FootprintMeasurement.objects.filter(user=self.user).update(value=100)
+        rebuild_periods([(self.user.id, FootprintRollup.WEEK, MONDAY)])
+        self.assertEqual(self.summary(self.rollup(FootprintRollup.WEEK, MONDAY)), (1, 100, 100, 100, 100))
+        self.assertEqual(self.rollup(FootprintRollup.MONTH, date(2026, 1, 1)).last_value, 300)
+
+    def test_weekly_series_carries_values_forward(self):
+        today = date(2026, 1, 28)
+        self.assertEqual(weekly_series(self.user, weeks=4, today=today), [])
+
+        record_footprint(self.user, 300, date(2026, 1, 14))
+        # Weeks before the first reading repeat it
+        self.assertEqual(weekly_series(self.user, weeks=4, today=today), [300, 300, 300, 300])
+
+        record_footprint(self.user, 400, date(2025, 12, 30))
+        record_footprint(self.user, 250, date(2026, 1, 27))
+        self.assertEqual(weekly_series(self.user, weeks=4, today=today), [400, 300, 300, 250])
@@ -0,0 +1,74 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from .. import llm
+from ..llm import CircuitBreaker, FakeLLMBackend, LLMService, LLMUnavailable
+
+
+class LLMServiceTests(SimpleTestCase):
+
+    def service(self, backend, **options):
+        options.setdefault('backoff_base', 0)
+        return LLMService(backend, **options)
+
+    def flaky(self, failures, error=TimeoutError):
+        """A responder that raises `error` for the first `failures` prompts."""
+        calls = []
+
+        def respond(prompt):
+            calls.append(prompt)
+            if len(calls) <= failures:
+                raise error('try again')
+            return 'ok'
+        return respond
+
+    def test_retries_retryable_errors(self):
+        backend = FakeLLMBackend(responder=self.flaky(2))
+        self.assertEqual(self.service(backend, max_retries=2).generate('prompt'), 'ok')
+        self.assertEqual(len(backend.prompts), 3)
+
+    def test_gives_up_after_max_retries(self):
+        backend = FakeLLMBackend(error=TimeoutError('slow'))
+        with self.assertRaises(LLMUnavailable):
+            self.service(backend, max_retries=2).generate('prompt')
+        self.assertEqual(len(backend.prompts), 3)
+
+    def test_does_not_retry_other_errors(self):
+        backend = FakeLLMBackend(error=ValueError('bad request'))
+        self.assertEqual(self.service(backend).generate('prompt', fallback='canned'), 'canned')
+        self.assertEqual(len(backend.prompts), 1)
+
+    def test_fallback_may_be_none(self):
+        backend = FakeLLMBackend(error=ValueError('bad request'))
+        self.assertIsNone(self.service(backend).generate('prompt', fallback=None))
+
+    def test_open_breaker_fails_fast(self):
+        backend = FakeLLMBackend(error=ValueError('down'))
+        service = self.service(backend, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        for _ in range(2):
+            service.generate('prompt', fallback='canned')
+        self.assertEqual(service.generate('prompt', fallback='canned'), 'canned')
+        with self.assertRaises(LLMUnavailable):
+            service.generate('prompt')
+        self.assertEqual(len(backend.prompts), 2)
+
+    def test_half_open_breaker_closes_after_a_successful_trial(self):
+        backend = FakeLLMBackend(error=ValueError('down'))
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        service = self.service(backend, breaker=breaker)
+        service.generate('prompt', fallback=None)
+        backend.error = None
+        backend.response = 'back'
+        self.assertEqual(service.generate('prompt'), 'back')
+        self.assertIsNone(breaker._opened_at)
+
+    def test_async_generate(self):
+        backend = FakeLLMBackend(responder=self.flaky(1, ConnectionError))
+        self.assertEqual(asyncio.run(self.service(backend).agenerate('prompt')), 'ok')
+        self.assertEqual(len(backend.prompts), 2)
+
+    def test_configure_llm_replaces_the_shared_service(self):
+        self.addCleanup(setattr, llm, '_service', llm._service)
+        llm.configure_llm(FakeLLMBackend(response='fake'))
+        self.assertEqual(llm.get_llm().generate('prompt'), 'fake')
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Runs ecotrack migrations back and forth; the database is migrated to the latest state afterwards."""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('ecotrack', target)])
+        return executor.loader.project_state([('ecotrack', target)]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class HabitMigrationTests(MigrationTestCase):
+    """User.habits JSON to Habit rows (0030), forwards and backwards."""
+
+    def test_habits(self):
+        apps = self.migrate('0029_pushsubscription_reminder_topic')
+        user = apps.get_model('ecotrack', 'User').objects.create(
+            username='habits', habits=[{'id': 'a', 'text': ' Cycle '}, {'id': 'b', 'text': ''}, 'junk'],
+        )
+
+        apps = self.migrate('0030_habit_habitcheckin')
+        habits = apps.get_model('ecotrack', 'Habit').objects.filter(user_id=user.id)
+        self.assertEqual(list(habits.values_list('text', flat=True)), ['Cycle'])
+        habit_id = habits.get().id
+
+        apps = self.migrate('0029_pushsubscription_reminder_topic')
+        self.assertEqual(apps.get_model('ecotrack', 'User').objects.get(id=user.id).habits,
+                         [{'id': str(habit_id), 'text': 'Cycle'}])
+
+
+class FootprintHistoryMigrationTests(MigrationTestCase):
+    """Footprint lists to FootprintMeasurement and FootprintRollup rows (0031), forwards and backwards."""
+
+    def test_footprint_history(self):
+        apps = self.migrate('0030_habit_habitcheckin')
+        user = apps.get_model('ecotrack', 'User').objects.create(
+            username='footprints', last_8_footprint_measurements=[300, 280.5, 'bad', 250],
+        )
+
+        apps = self.migrate('0031_footprint_history')
+        measurements = apps.get_model('ecotrack', 'FootprintMeasurement').objects.filter(user_id=user.id)
+        self.assertEqual(list(measurements.order_by('date').values_list('value', flat=True)), [300, 280.5, 250])
+        dates = list(measurements.order_by('date').values_list('date', flat=True))
+        self.assertEqual(dates[-1], timezone.localdate())
+        self.assertEqual(dates[1] - dates[0], timedelta(weeks=1))
+        weeks = apps.get_model('ecotrack', 'FootprintRollup').objects.filter(user_id=user.id, period='week')
+        self.assertEqual(sorted(weeks.values_list('last_value', flat=True)), [250, 280.5, 300])
+
+        apps = self.migrate('0030_habit_habitcheckin')
+        self.assertEqual(apps.get_model('ecotrack', 'User').objects.get(id=user.id).last_8_footprint_measurements,
+                         [300, 280.5, 250])
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, TestCase
+
+from ..models import NotificationCopy
+from ..notification_copy import add_to_pool, fallback_message, load_copy_pool, pick_copy, retire_old_copy
+
+POOL = ['One {username}', 'Two', 'Three', 'Four']
+
+
+def subscription(user_id, username='sam', copy_cursor=0):
+    return SimpleNamespace(user_id=user_id, user=SimpleNamespace(username=username), copy_cursor=copy_cursor)
+
+
+class PickCopyTests(SimpleTestCase):
+
+    def test_user_sees_the_whole_pool_before_a_repeat(self):
+        sub = subscription(user_id=2)
+        picked = [pick_copy(sub, POOL) for _ in range(len(POOL) * 2)]
+        self.assertEqual(sorted(picked[:len(POOL)]), sorted(['One sam', 'Two', 'Three', 'Four']))
+        self.assertEqual(picked[len(POOL):], picked[:len(POOL)])
+        self.assertEqual(sub.copy_cursor, len(POOL) * 2)
+
+    def test_users_of_the_same_minute_get_different_messages(self):
+        picked = [pick_copy(subscription(user_id), POOL) for user_id in range(len(POOL))]
+        self.assertEqual(len(set(picked)), len(POOL))
+
+    def test_empty_pool_falls_back(self):
+        sub = subscription(user_id=1)
+        self.assertEqual(pick_copy(sub, []), fallback_message('sam'))
+        self.assertEqual(sub.copy_cursor, 0)
+
+
+class CopyPoolTests(TestCase):
+
+    def test_near_duplicates_are_stored_once(self):
+        self.assertEqual(add_to_pool(['Time to check in!', 'time to check in 🌱', 'Log your day']), 2)
+        self.assertEqual(add_to_pool(['Log your day!']), 0)
+        self.assertEqual(NotificationCopy.objects.count(), 2)
+
+    def test_retired_messages_leave_the_rotation(self):
+        add_to_pool(['First', 'Second', 'Third'])
+        self.assertEqual(retire_old_copy(keep=2), 1)
+        self.assertEqual(load_copy_pool(), ['Second', 'Third'])
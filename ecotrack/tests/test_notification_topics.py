@@ -0,0 +1,151 @@
+import json
+from datetime import datetime, time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..firebase_service import FCMService
+from ..models import NotificationOutbox, PushSubscription, TopicBroadcast, User
+from ..notification_topics import broadcast_slot, reminder_topic, sync_topics
+
+NO_ERRORS = {'success_count': 1, 'failure_count': 0, 'errors': {}}
+
+
+class TopicTestCase(TestCase):
+
+    def setUp(self):
+        self.calls = []
+        # Results for the next topic calls, in order; the others succeed
+        self.fcm_errors = []
+        for name in ('subscribe_to_topic', 'unsubscribe_from_topic'):
+            patcher = mock.patch.object(FCMService, name, side_effect=self.recorder(name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def recorder(self, name):
+        def record(tokens, topic):
+            self.calls.append((name, sorted(tokens), topic))
+            return self.fcm_errors.pop(0) if self.fcm_errors else NO_ERRORS
+        return record
+
+    def subscribe(self, username, token, notification_time=time(9, 0), **fields):
+        return PushSubscription.objects.create(
+            user=User.objects.create(username=username), endpoint='e', p256dh_key='k', auth_key='a',
+            fcm_token=token, notification_time=notification_time, **fields,
+        )
+
+
+class SyncTopicsTests(TopicTestCase):
+
+    def test_reminder_topic(self):
+        self.assertEqual(reminder_topic(time(9, 5)), 'reminder-0905')
+        self.assertEqual(reminder_topic('21:30'), 'reminder-2130')
+        self.assertEqual(reminder_topic(0), 'reminder-0000')
+
+    def test_memberships_are_synced_in_bulk(self):
+        joining = [self.subscribe(f'new{i}', f'new-{i}') for i in range(2)]
+        moved = self.subscribe('moved', 'moved', time(10, 0), reminder_topic='reminder-0900', topic_token='moved')
+        refreshed = self.subscribe('refreshed', 'fresh', reminder_topic='reminder-0900', topic_token='stale')
+        inactive = self.subscribe('inactive', 'gone', is_active=False, reminder_topic='reminder-0900',
+                                  topic_token='gone')
+        in_sync = self.subscribe('in-sync', 'same', reminder_topic='reminder-0900', topic_token='same')
+
+        self.assertEqual(sync_topics(batch_size=3), {'moved': 4, 'removed': 1, 'failed': 0})
+        topics = dict(PushSubscription.objects.values_list('id', 'reminder_topic'))
+        self.assertEqual([topics[s.id] for s in joining + [moved, refreshed, inactive, in_sync]],
+                         ['reminder-0900'] * 2 + ['reminder-1000', 'reminder-0900', '', 'reminder-0900'])
+        self.assertEqual(PushSubscription.objects.get(id=refreshed.id).topic_token, 'fresh')
+        # Nothing left to do
+        self.calls.clear()
+        self.assertEqual(sync_topics(), {'moved': 0, 'removed': 0, 'failed': 0})
+        self.assertEqual(self.calls, [])
+
+    def test_failed_subscribe_is_retried_by_the_next_sync(self):
+        subscription = self.subscribe('flaky', 'flaky')
+        self.fcm_errors = [{'success_count': 0, 'failure_count': 1, 'errors': {'flaky': 'internal-error'}}]
+        self.assertEqual(sync_topics()['failed'], 1)
+        self.assertEqual(PushSubscription.objects.get(id=subscription.id).reminder_topic, '')
+        self.assertEqual(sync_topics()['moved'], 1)
+
+
+@override_settings(FCM_DISPATCH_MODE='topic')
+class SubscriptionViewTopicTests(TopicTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('topics', 'topics@example.com', 'pw')
+        self.client.force_login(self.user)
+
+    def post(self, name, body=None):
+        return self.client.post(reverse(name), json.dumps(body or {}), content_type='application/json')
+
+    def membership(self):
+        return PushSubscription.objects.filter(user=self.user).values_list('reminder_topic', 'topic_token').get()
+
+    def test_views_move_the_token_between_topics(self):
+        self.post('subscribe_push', {'fcmToken': 'token-a', 'notificationTime': '09:00'})
+        self.assertEqual(self.membership(), ('reminder-0900', 'token-a'))
+
+        self.calls.clear()
+        self.post('update_notification_time', {'notificationTime': '09:30'})
+        self.assertEqual(self.calls, [('unsubscribe_from_topic', ['token-a'], 'reminder-0900'),
+                                      ('subscribe_to_topic', ['token-a'], 'reminder-0930')])
+
+        self.calls.clear()
+        self.post('subscribe_push', {'fcmToken': 'token-b', 'notificationTime': '09:30'})
+        self.assertEqual(self.calls, [('unsubscribe_from_topic', ['token-a'], 'reminder-0930'),
+                                      ('subscribe_to_topic', ['token-b'], 'reminder-0930')])
+
+        self.calls.clear()
+        self.post('unsubscribe_push')
+        self.assertEqual(self.calls, [('unsubscribe_from_topic', ['token-b'], 'reminder-0930')])
+        self.assertEqual(self.membership(), ('', ''))
+
+    def test_failed_unsubscribe_is_left_to_the_sync(self):
+        self.post('subscribe_push', {'fcmToken': 'token-a', 'notificationTime': '09:00'})
+        self.fcm_errors = [{'success_count': 0, 'failure_count': 1, 'errors': {'token-a': 'internal-error'}}]
+        with self.assertLogs('ecotrack.notification_topics', 'WARNING'):
+            self.post('update_notification_time', {'notificationTime': '09:30'})
+        self.assertEqual(self.membership(), ('reminder-0900', 'token-a'))
+
+    @override_settings(FCM_DISPATCH_MODE='batch')
+    def test_no_topic_calls_outside_topic_mode(self):
+        self.post('subscribe_push', {'fcmToken': 'token-a', 'notificationTime': '09:00'})
+        self.post('update_notification_time', {'notificationTime': '09:30'})
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.membership(), ('', ''))
+
+
+class BroadcastSlotTests(TopicTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.members = [self.subscribe(f'member{i}', f'token-{i}', reminder_topic='reminder-0900',
+                                       topic_token=f'token-{i}') for i in range(2)]
+        self.slot = timezone.make_aware(datetime(2026, 1, 5, 9, 0))
+
+    def test_slot_is_broadcast_once(self):
+        with mock.patch.object(FCMService, 'send_to_topic', return_value=True) as send:
+            self.assertEqual(broadcast_slot(self.slot), 2)
+            PushSubscription.objects.update(last_sent_date=None, last_sent_time=None)
+            # Another dispatcher (or a repeated cron call) finds the slot claimed
+            with self.assertLogs('ecotrack.notification_topics', 'INFO'):
+                self.assertEqual(broadcast_slot(self.slot), 0)
+        send.assert_called_once()
+        self.assertEqual(send.call_args.args[0], 'reminder-0900')
+        self.assertEqual(TopicBroadcast.objects.count(), 1)
+
+    def test_refreshed_tokens_are_not_covered(self):
+        PushSubscription.objects.filter(id=self.members[1].id).update(fcm_token='refreshed')
+        with mock.patch.object(FCMService, 'send_to_topic', return_value=True):
+            self.assertEqual(broadcast_slot(self.slot), 1)
+        self.assertIsNone(PushSubscription.objects.get(id=self.members[1].id).last_sent_date)
+
+    def test_failed_broadcast_falls_back_to_the_outbox(self):
+        with mock.patch.object(FCMService, 'send_to_topic', return_value=False), \
+                self.assertLogs('ecotrack.notification_topics', 'WARNING'):
+            self.assertEqual(broadcast_slot(self.slot), 0)
+        self.assertEqual(NotificationOutbox.objects.filter(scheduled_for=self.slot).count(), 2)
+        self.assertFalse(PushSubscription.objects.filter(last_sent_date__isnull=False).exists())
@@ -0,0 +1,162 @@
+import os
+import tempfile
+from contextlib import redirect_stdout
+from datetime import time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+import notification_scheduler
+
+from .. import outbox
+from ..models import NotificationOutbox, PushSubscription, TopicBroadcast, User
+
+
+@override_settings(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_DELAY=60, OUTBOX_LEASE_SECONDS=120)
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('outbox', 'outbox@example.com', 'pw')
+        self.subscription = PushSubscription.objects.create(
+            user=user, endpoint='e', p256dh_key='k', auth_key='a', fcm_token='token-1', notification_time=time(9, 0),
+        )
+        self.slot = timezone.localtime().replace(hour=9, minute=0, second=0, microsecond=0)
+
+    def expire(self, **filters):
+        NotificationOutbox.objects.filter(**filters).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_enqueue_is_idempotent(self):
+        self.assertEqual(outbox.enqueue_slot(self.slot), 1)
+        self.assertEqual(outbox.enqueue_slot(self.slot), 0)
+        self.assertEqual(outbox.enqueue_slot(self.slot + timedelta(minutes=1)), 0)
+
+    def test_claimed_rows_are_leased(self):
+        outbox.enqueue_slot(self.slot)
+        rows = outbox.claim('worker-1')
+        self.assertEqual([(row.status, row.attempts) for row in rows], [('sending', 1)])
+        self.assertEqual(outbox.claim('worker-2'), [])
+        self.assertFalse(outbox.has_due())
+
+    def test_expired_lease_is_claimed_again(self):
+        outbox.enqueue_slot(self.slot)
+        stale = outbox.claim('worker-1')
+        self.expire()
+        self.assertTrue(outbox.has_due())
+        rows = outbox.claim('worker-2')
+        self.assertEqual(rows[0].attempts, 2)
+
+        # The first worker finishing late must not overwrite the new claim
+        with mock.patch.object(outbox, '_send', return_value={}):
+            outbox.deliver(stale)
+        row = NotificationOutbox.objects.get()
+        self.assertEqual((row.status, row.lease_owner), ('sending', rows[0].lease_owner))
+
+    def test_delivery(self):
+        outbox.enqueue_slot(self.slot)
+        with mock.patch.object(outbox, '_send', return_value={}):
+            result = outbox.process()
+        self.assertEqual(len(result['sent']), 1)
+        self.assertEqual(NotificationOutbox.objects.get().status, 'sent')
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.last_sent_date, self.slot.date())
+        self.assertEqual(outbox.enqueue_slot(self.slot), 0)
+
+    def test_failed_send_is_retried_after_the_delay(self):
+        outbox.enqueue_slot(self.slot)
+        with mock.patch.object(outbox, '_send', return_value={'token-1': Exception('unavailable')}):
+            result = outbox.process()
+        self.assertEqual(len(result['retry']), 1)
+        row = NotificationOutbox.objects.get()
+        self.assertEqual(row.status, 'pending')
+        self.assertGreater(row.lease_expires_at, timezone.now())
+        self.assertFalse(outbox.has_due())
+
+        self.expire()
+        with mock.patch.object(outbox, '_send', return_value={}):
+            self.assertEqual(len(outbox.process()['sent']), 1)
+        self.assertEqual(NotificationOutbox.objects.get().attempts, 2)
+
+    def test_gives_up_after_max_attempts(self):
+        outbox.enqueue_slot(self.slot)
+        with mock.patch.object(outbox, '_send', return_value={'token-1': Exception('unavailable')}):
+            for _ in range(3):
+                outbox.process()
+                self.expire(status='pending')
+        row = NotificationOutbox.objects.get()
+        self.assertEqual((row.status, row.attempts), ('failed', 3))
+        self.assertFalse(outbox.has_due())
+
+    def test_lease_expired_on_last_attempt_fails(self):
+        outbox.enqueue_slot(self.slot)
+        NotificationOutbox.objects.update(status='sending', attempts=3)
+        self.expire()
+        with mock.patch.object(outbox, '_send', return_value={}) as send:
+            outbox.process()
+        send.assert_not_called()
+        self.assertEqual(NotificationOutbox.objects.get().status, 'failed')
+
+    def test_purge_keeps_recent_and_unfinished_rows(self):
+        for days, status in [(30, 'sent'), (31, 'failed'), (32, 'pending'), (0, 'sent')]:
+            NotificationOutbox.objects.create(subscription=self.subscription, title='Reminder', body='Check in',
+                                              scheduled_for=self.slot - timedelta(days=days), status=status)
+        TopicBroadcast.objects.create(topic='reminder-0900', scheduled_for=self.slot - timedelta(days=30))
+        TopicBroadcast.objects.create(topic='reminder-0900', scheduled_for=self.slot)
+
+        self.assertEqual(outbox.purge(days=14, batch_size=1), 2)
+        self.assertEqual(sorted(NotificationOutbox.objects.values_list('status', flat=True)), ['pending', 'sent'])
+        self.assertEqual(list(TopicBroadcast.objects.values_list('scheduled_for', flat=True)), [self.slot])
+
+    @override_settings(OUTBOX_RETENTION_DAYS=0)
+    def test_purge_command_uses_the_retention_setting(self):
+        outbox.enqueue_slot(self.slot - timedelta(days=1))
+        NotificationOutbox.objects.update(status='sent')
+        out = StringIO()
+        call_command('purge_outbox', stdout=out)
+        self.assertIn('Deleted: 1 outbox rows', out.getvalue())
+
+
+@override_settings(FCM_DISPATCH_MODE='batch', OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_DELAY=60)
+class SchedulerDaemonTests(TestCase):
+    """notification_scheduler.py dispatches through the outbox like cron_dispatch."""
+
+    def setUp(self):
+        PushSubscription.objects.create(
+            user=User.objects.create(username='daemon'), endpoint='e', p256dh_key='k', auth_key='a',
+            fcm_token='token-1', notification_time=time(9, 0),
+        )
+        self.slot = timezone.localtime().replace(hour=9, minute=0, second=0, microsecond=0)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.scheduler = notification_scheduler.Scheduler(os.path.join(directory.name, 'state.json'), 60, 180)
+        with redirect_stdout(StringIO()):
+            self.scheduler.reload()
+
+    def run_scheduler(self, method, *args):
+        with redirect_stdout(StringIO()):
+            getattr(self.scheduler, method)(*args)
+
+    def test_slot_is_sent_once(self):
+        with mock.patch.object(outbox, '_send', return_value={}) as send:
+            self.run_scheduler('fire', self.slot)
+            self.run_scheduler('fire', self.slot)
+            self.run_scheduler('fire', self.slot + timedelta(minutes=1))
+        send.assert_called_once()
+        self.assertEqual(NotificationOutbox.objects.get().status, 'sent')
+
+    def test_failed_send_is_retried_when_due(self):
+        with mock.patch.object(outbox, '_send', return_value={'token-1': Exception('unavailable')}):
+            self.run_scheduler('fire', self.slot)
+        self.assertEqual(self.scheduler.retry_at, NotificationOutbox.objects.get().lease_expires_at)
+
+        with mock.patch.object(outbox, '_send', return_value={}) as send:
+            self.run_scheduler('retry_due')
+            send.assert_not_called()
+            NotificationOutbox.objects.update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+            self.scheduler.retry_at = timezone.now() - timedelta(seconds=1)
+            self.run_scheduler('retry_due')
+        send.assert_called_once()
+        self.assertEqual(NotificationOutbox.objects.get().status, 'sent')
+        self.assertIsNone(self.scheduler.retry_at)
@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..emission_factors import get_factor_tables
+from ..footprints import record_footprint
+from ..models import FootprintMeasurement, User
+from ..utils import calculate_initial_sustainability_score, calculate_personal_carbon_footprint
+from .test_footprint_batch import BASE_SURVEY
+
+
+class RecomputeFootprintsTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, 'checkpoint.json')
+        self.users = [
+            User.objects.create(username=f'survey{i}', survey_answered=True, carbon_footprint=0,
+                                user_data={**BASE_SURVEY, 'how_many_people_are_in_your_household': i + 1})
+            for i in range(3)
+        ]
+
+    def recompute(self, **options):
+        out = StringIO()
+        call_command('recompute_footprints', workers=1, batch_size=2, checkpoint=self.checkpoint,
+                     stdout=out, **options)
+        return out.getvalue()
+
+    def test_footprints_and_scores_match_the_scalar_functions(self):
+        skipped = User.objects.create(username='no-survey', user_data=BASE_SURVEY, carbon_footprint=1)
+        self.recompute()
+        for user in self.users:
+            user.refresh_from_db()
+            footprint = calculate_personal_carbon_footprint(user.user_data)['summary']['personal_monthly_co2e_kg']
+            self.assertEqual(user.carbon_footprint, footprint)
+            self.assertEqual(user.sustainability_score,
+                             calculate_initial_sustainability_score(user.user_data)['initial_sustainability_score'])
+        skipped.refresh_from_db()
+        self.assertEqual(skipped.carbon_footprint, 1)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_unusable_surveys_are_skipped_and_reported(self):
+        broken = User.objects.create(username='broken', survey_answered=True, user_data=['not', 'a', 'dict'],
+                                     carbon_footprint=1)
+        out = self.recompute()
+        self.assertIn(f'Skipped user ids: {broken.id}', out)
+        broken.refresh_from_db()
+        self.assertEqual(broken.carbon_footprint, 1)
+        self.assertFalse(User.objects.filter(id__in=[user.id for user in self.users], carbon_footprint=0).exists())
+
+    def test_latest_measurement_is_replaced_and_data_version_bumped(self):
+        user = self.users[0]
+        record_footprint(user, 1.0)
+        User.objects.filter(id=user.id).update(sustainability_score=0)
+        version = User.objects.get(id=user.id).data_version
+
+        self.recompute()
+        user.refresh_from_db()
+        self.assertEqual(list(FootprintMeasurement.objects.filter(user=user).values_list('value', flat=True)),
+                         [user.carbon_footprint])
+        self.assertEqual(FootprintMeasurement.objects.filter(user=self.users[1]).count(), 1)
+        self.assertGreater(user.data_version, version)
+
+        # A second run changes only the scores: the ETag and dashboard snapshot must still change
+        User.objects.filter(id=user.id).update(sustainability_score=0)
+        self.recompute()
+        self.assertGreater(User.objects.get(id=user.id).data_version, user.data_version)
+
+    def test_dry_run_writes_nothing(self):
+        self.recompute(dry_run=True)
+        self.assertFalse(User.objects.exclude(carbon_footprint=0).exists())
+        self.assertFalse(FootprintMeasurement.objects.exists())
+
+    def test_resume_after_checkpoint(self):
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'last_id': self.users[1].id, 'factor_version': get_factor_tables().version}, f)
+        self.recompute(resume=True)
+        self.assertEqual(list(User.objects.exclude(carbon_footprint=0).values_list('id', flat=True)),
+                         [self.users[2].id])
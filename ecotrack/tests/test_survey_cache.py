@@ -0,0 +1,43 @@
+from django.test import SimpleTestCase
+
+from ..emission_factors import load_factor_tables
+from ..utils import SurveyResultCache, calculate_personal_carbon_footprint, memoize_survey, survey_fingerprint
+from .test_footprint_batch import BASE_SURVEY
+
+
+class SurveyCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.addCleanup(load_factor_tables)
+        self.calculate = memoize_survey(calculate_personal_carbon_footprint)
+
+    def test_fingerprint_ignores_key_order(self):
+        reordered = dict(reversed(list(BASE_SURVEY.items())))
+        self.assertEqual(survey_fingerprint(reordered), survey_fingerprint(BASE_SURVEY))
+        self.assertNotEqual(survey_fingerprint({**BASE_SURVEY, 'vehicle_1_mileage': 12001}),
+                            survey_fingerprint(BASE_SURVEY))
+
+    def test_same_survey_is_computed_once(self):
+        first = self.calculate(BASE_SURVEY)
+        self.assertEqual(first, calculate_personal_carbon_footprint(BASE_SURVEY))
+        self.assertEqual(self.calculate(dict(BASE_SURVEY)), first)
+        self.assertEqual((self.calculate.cache_info()['hits'], self.calculate.cache_info()['misses']), (1, 1))
+
+    def test_callers_get_a_copy(self):
+        self.calculate(BASE_SURVEY)['summary']['personal_monthly_co2e_kg'] = -1
+        self.assertGreater(self.calculate(BASE_SURVEY)['summary']['personal_monthly_co2e_kg'], 0)
+
+    def test_new_factor_version_is_not_served_from_the_cache(self):
+        before = self.calculate(BASE_SURVEY)['summary']['personal_monthly_co2e_kg']
+        load_factor_tables({'factors': {'EF_ELECTRICITY': {'No': 0.95}}})
+        self.assertGreater(self.calculate(BASE_SURVEY)['summary']['personal_monthly_co2e_kg'], before)
+        self.assertEqual(self.calculate.cache_info()['misses'], 2)
+
+    def test_cache_is_bounded(self):
+        cache = SurveyResultCache(maxsize=2)
+        for key in 'abc':
+            cache.set(key, key.upper())
+        cache.get('b')
+        cache.set('d', 'D')
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (None, 'B', None))
+        self.assertEqual(cache.info()['size'], 2)
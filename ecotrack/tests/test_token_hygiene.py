@@ -0,0 +1,54 @@
+from datetime import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from firebase_admin import exceptions, messaging
+
+from ..firebase_service import FCMService
+from ..models import PushSubscription, User
+from ..token_hygiene import record_send_failures, validate_subscriptions
+
+
+class TokenHygieneTests(TestCase):
+
+    def setUp(self):
+        self.subscriptions = [
+            PushSubscription.objects.create(
+                user=User.objects.create(username=f'hygiene{i}'),
+                endpoint='e', p256dh_key='k', auth_key='a', fcm_token=f'token-{i}', notification_time=time(9, 0),
+            )
+            for i in range(3)
+        ]
+
+    def states(self):
+        return list(PushSubscription.objects.order_by('id').values_list('is_active', 'token_suspect'))
+
+    def test_send_failures(self):
+        result = record_send_failures(self.subscriptions, {
+            'token-0': messaging.UnregisteredError('gone'),
+            'token-1': exceptions.UnavailableError('try later'),
+        })
+        self.assertEqual([len(result['deactivated']), len(result['suspect'])], [1, 1])
+        self.assertEqual(self.states(), [(False, False), (True, True), (True, False)])
+
+    def test_validation(self):
+        PushSubscription.objects.update(token_suspect=True)
+        PushSubscription.objects.filter(id=self.subscriptions[2].id).update(fcm_token=' ')
+        checked = {'valid': ['token-0'], 'invalid': [], 'unknown': ['token-1']}
+        with mock.patch.object(FCMService, 'validate_tokens', return_value=checked) as validate:
+            result = validate_subscriptions(PushSubscription.objects.order_by('id'))
+        # A blank token is never sent to FCM; it is dead either way
+        validate.assert_called_once_with(['token-0', 'token-1'])
+        self.assertEqual(result, {'valid': 1, 'deactivated': 1, 'unknown': 1})
+        self.assertEqual(self.states(), [(True, False), (True, True), (False, False)])
+
+    def test_command_checks_only_suspect_tokens(self):
+        PushSubscription.objects.filter(id=self.subscriptions[1].id).update(token_suspect=True)
+        checked = {'valid': [], 'invalid': ['token-1'], 'unknown': []}
+        with mock.patch.object(FCMService, 'initialize'), \
+                mock.patch.object(FCMService, 'validate_tokens', return_value=checked) as validate:
+            call_command('validate_fcm_tokens', stdout=StringIO())
+        validate.assert_called_once_with(['token-1'])
+        self.assertEqual(self.states(), [(True, False), (False, False), (True, False)])
@@ -0,0 +1,74 @@
+import json
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import dashboard_cache
+from ..models import User
+
+
+class UserDataTests(TestCase):
+
+    def setUp(self):
+        dashboard_cache.get_dashboard_cache().clear()
+        self.user = User.objects.create_user('dashboard', 'dashboard@example.com', 'pw')
+        self.client.force_login(self.user)
+        self.url = reverse('get_user_data')
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['username'], 'dashboard')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_reads_write_nothing(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        writes = [query['sql'] for query in queries.captured_queries
+                  if query['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))]
+        self.assertEqual(writes, [])
+
+    def test_habits_today_resets_without_a_write(self):
+        User.objects.filter(pk=self.user.pk).update(habits_today=3, last_checkin=timezone.now() - timedelta(days=2))
+        self.assertEqual(self.client.get(self.url).json()['data']['habits_today'], 0)
+        self.assertEqual(User.objects.get(pk=self.user.pk).habits_today, 3)
+
+
+class UserDataCacheTests(TestCase):
+
+    def setUp(self):
+        dashboard_cache.get_dashboard_cache().clear()
+        self.user = User.objects.create_user('dashboard', 'dashboard@example.com', 'pw')
+        self.client.force_login(self.user)
+        self.url = reverse('get_user_data')
+
+    def test_snapshot_is_reused(self):
+        first = self.client.get(self.url).content
+        self.assertEqual(self.client.get(self.url).content, first)
+        self.assertEqual(dashboard_cache.stats()['hits'], 1)
+
+    def test_habit_changes_invalidate(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('save_habit'), json.dumps({'habit_text': 'Cycle to work'}),
+                             content_type='application/json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([habit['text'] for habit in response.json()['data']['habits']], ['Cycle to work'])
+
+    def test_user_saves_invalidate(self):
+        etag = self.client.get(self.url)['ETag']
+        user = User.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.streak = 5
+            user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['streak'], 5)
+        self.assertEqual(dashboard_cache.stats()['invalidations'], 1)
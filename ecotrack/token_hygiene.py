@@ -0,0 +1,94 @@
+"""
+FCM token hygiene for push subscriptions.
+Send results are recorded in bulk: tokens FCM reports as unregistered are
+deactivated right away, other failures only mark the subscription as suspect.
+Suspect (and newly subscribed) tokens are validated later in dry-run multicast
+batches by the validate_fcm_tokens command, instead of one extra network call
+per failed send or per subscribe request.
+"""
+
+import logging
+from typing import Dict, Iterable, List
+
+from django.utils import timezone
+
+from .firebase_service import FCMService
+from .models import PushSubscription
+from .notification_wheel import publish_change
+
+logger = logging.getLogger(__name__)
+
+
+def deactivate_subscriptions(subscription_ids: Iterable[int]) -> int:
+    """Deactivate subscriptions with dead tokens in one UPDATE. Returns the number deactivated."""
+    subscription_ids = list(subscription_ids)
+    if not subscription_ids:
+        return 0
+    count = PushSubscription.objects.filter(id__in=subscription_ids).update(
+        is_active=False, token_suspect=False, updated_at=timezone.now()
+    )
+    # update() sends no signals, so tell the scheduler's time wheel directly
+    for subscription_id in subscription_ids:
+        publish_change(subscription_id, None)
+    logger.info(f"Deactivated {count} push subscriptions with dead FCM tokens")
+    return count
+
+
+def mark_suspect(subscription_ids: Iterable[int]) -> int:
+    subscription_ids = list(subscription_ids)
+    if not subscription_ids:
+        return 0
+    return PushSubscription.objects.filter(id__in=subscription_ids).update(token_suspect=True)
+
+
+def record_send_failures(subscriptions: List, errors: Dict[str, Exception]) -> Dict[str, List]:
+    """
+    Record the failed sends of a batch: subscriptions whose token FCM reported as
+    dead are deactivated, the others are marked suspect for the next validation run.
+
+    Args:
+        subscriptions: The subscriptions the batch was sent to
+        errors: token -> exception for every failed token (as returned by the senders)
+
+    Returns:
+        dict: 'deactivated' and 'suspect' subscriptions
+    """
+    result = {'deactivated': [], 'suspect': []}
+    for subscription in subscriptions:
+        token = subscription.get_fcm_token()
+        if token not in errors:
+            continue
+        if FCMService.is_dead_token_error(errors[token]):
+            subscription.is_active = False
+            result['deactivated'].append(subscription)
+        else:
+            subscription.token_suspect = True
+            result['suspect'].append(subscription)
+
+    deactivate_subscriptions(subscription.id for subscription in result['deactivated'])
+    mark_suspect(subscription.id for subscription in result['suspect'])
+    return result
+
+
+def validate_subscriptions(subscriptions: List) -> Dict[str, int]:
+    """
+    Validate the tokens of the given subscriptions in dry-run batches, deactivate the
+    dead ones and clear the suspect flag of the valid ones. Tokens whose check failed
+    for another reason stay suspect.
+    """
+    by_token = {}
+    for subscription in subscriptions:
+        by_token.setdefault(subscription.get_fcm_token(), []).append(subscription.id)
+
+    tokens = [token for token in by_token if token.strip()]
+    checked = FCMService.validate_tokens(tokens) if tokens else {'valid': [], 'invalid': [], 'unknown': []}
+    # Subscriptions without any token can never be sent to
+    invalid = checked['invalid'] + [token for token in by_token if not token.strip()]
+
+    deactivated = deactivate_subscriptions(
+        subscription_id for token in invalid for subscription_id in by_token[token]
+    )
+    PushSubscription.objects.filter(
+        id__in=[subscription_id for token in checked['valid'] for subscription_id in by_token[token]]
+    ).update(token_suspect=False)
+    return {'valid': len(checked['valid']), 'deactivated': deactivated, 'unknown': len(checked['unknown'])}
@@ -12,6 +12,8 @@ urlpatterns = [
     path("save_habit", views.save_habit, name="save_habit"),
     path("update_habit", views.update_habit, name="update_habit"),
     path("delete_habit", views.delete_habit, name="delete_habit"),
+    path("check_in_habit", views.check_in_habit, name="check_in_habit"),
+    path("get_habit_history", views.get_habit_history, name="get_habit_history"),
     path("submit_questionnaire", views.submit_questionnaire, name="submit_questionnaire"),
     path("get_suggestions", views.get_suggestions, name="get_suggestions"),
     path("get_questions", views.get_questions, name="get_questions"),
@@ -24,6 +26,7 @@ urlpatterns = [
     path("api/notifications/settings", views.get_notification_settings, name="get_notification_settings"),
     # Cron dispatcher (external scheduler calls this every minute)
     path("api/cron/dispatch", views.cron_dispatch, name="cron_dispatch"),
+    path("api/cron/dispatch/<str:job_id>", views.cron_dispatch_status, name="cron_dispatch_status"),
     
     # Community endpoints
     path("api/communities/create", views.create_community, name="create_community"),
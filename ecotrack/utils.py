@@ -1,42 +1,12 @@
+import copy
+import functools
+import hashlib
 import json
+import threading
+from collections import OrderedDict
+import numpy as np
 from django.utils import timezone
-
-CONFIG = {
-    "factors": {
-        "EF_ELECTRICITY": {"Yes": 0.05, "Partially": 0.25, "No": 0.475},
-        "EF_HEATING": {
-            "Natural Gas": 0.2, "Electricity": 0.45, "Oil": 0.27,
-            "Propane": 0.24, "Wood": 0.015, "Other": 0.3
-        },
-        "EF_VEHICLE_PER_KM": {
-            "Gasoline": 0.18, "Diesel": 0.17, "Hybrid": 0.12, "Electric": 0.05
-        },
-        "EF_FLIGHT": {"Short-haul (<3h)": 1100, "Medium-haul (3-6h)": 3000, "Long-haul (>6h)": 8000},
-        "EF_FLIGHT_PER_KM": 0.15,
-        "EF_DIET": {
-            "Vegan": 1600 / 12, "Vegetarian": 1900 / 12, "Pescatarian": 2100 / 12,
-            "Omnivore": 2500 / 12, "High Meat": 3300 / 12
-        },
-        "EF_PUBLIC_TRANSPORT_PER_KM": 0.1,
-        "EF_WASTE_LANDFILL": 0.45,
-        "EF_WATER_PER_LITRE": 0.0005
-    },
-    "multipliers": {
-        "FOOD_WASTE": {"Very little": 0.9, "Below average": 1.0, "Average": 1.2, "Above average": 1.5},
-        "FOOD_PACKAGING": {"Very little": 0.9, "Below average": 1.0, "Average": 1.3, "Above average": 1.6},
-        "SHOPPING": {"Rarely": 50, "Sometimes": 100, "Often": 200}
-    },
-    "constants": {
-        "HOUSEHOLD_SIZE_DEFAULT": 1,
-        "WEEKS_PER_MONTH": 4.33,
-        "MONTHS_PER_YEAR": 12,
-        "DAYS_PER_MONTH": 30,
-        "WASTE_PER_PERSON_PER_DAY_KG": 1.2,
-        "RECYCLING_DIVERSION_PER_ITEM": 0.05,
-        "COMPOST_DIVERSION": 0.15,
-        "OFFSET_PERCENTAGE": 0.10
-    }
-}
+from .emission_factors import CONFIG, FactorTables, get_factor_tables
 
 
 def _get_numeric_input(data: dict, key: str, default: float = 0.0) -> float:
@@ -47,91 +17,83 @@ def _get_numeric_input(data: dict, key: str, default: float = 0.0) -> float:
         return float(default)
 
 
-def _calculate_household_energy(data: dict) -> float:
+def _calculate_household_energy(data: dict, tables: FactorTables) -> float:
     """Calculates TOTAL emissions for the household from electricity and heating."""
     electricity_kwh = _get_numeric_input(data, "how_much_electricity_does_your_household_use_per_month")
-    electricity_source = data.get("is_your_electricity_from_renewable_sources", "No")
-    ef_electricity = CONFIG["factors"]["EF_ELECTRICITY"].get(electricity_source,
-                                                             CONFIG["factors"]["EF_ELECTRICITY"]["No"])
+    ef_electricity = tables["electricity"].lookup(data, "is_your_electricity_from_renewable_sources")
     electricity_emissions = electricity_kwh * ef_electricity
 
-    heating_source = data.get("what_is_your_primary_heating_source", "Natural Gas")
     heating_percent = _get_numeric_input(data,
                                          "what_percentage_of_your_monthly_electricity_consumption_do_you_think_is_used_for_heating")
     heating_kwh_equivalent = electricity_kwh * (heating_percent / 100)
-    ef_heating = CONFIG["factors"]["EF_HEATING"].get(heating_source, CONFIG["factors"]["EF_HEATING"]["Natural Gas"])
+    ef_heating = tables["heating"].lookup(data, "what_is_your_primary_heating_source")
     heating_emissions = heating_kwh_equivalent * ef_heating
 
     return electricity_emissions + heating_emissions
 
 
-def _calculate_personal_transportation(data: dict) -> float:
+def _calculate_personal_transportation(data: dict, tables: FactorTables) -> float:
     """Calculates PERSONAL emissions from vehicles, public transport, and flights."""
+    months_per_year = tables.scalars["MONTHS_PER_YEAR"]
+
     # Private Vehicles (assumes inputs are for the individual's travel)
     vehicle_emissions = 0
     num_vehicles = int(_get_numeric_input(data, "how_many_vehicles_are_in_your_household"))
     for i in range(1, num_vehicles + 1):
-        v_type = data.get(f"vehicle_{i}_type", "Gasoline")
         annual_km = _get_numeric_input(data, f"vehicle_{i}_mileage")
-        ef = CONFIG["factors"]["EF_VEHICLE_PER_KM"].get(v_type, CONFIG["factors"]["EF_VEHICLE_PER_KM"]["Gasoline"])
-        vehicle_emissions += (annual_km * ef) / CONFIG["constants"]["MONTHS_PER_YEAR"]
+        ef = tables["vehicle"].lookup(data, f"vehicle_{i}_type")
+        vehicle_emissions += (annual_km * ef) / months_per_year
 
     # Public Transport
     public_km_per_week = _get_numeric_input(data,
                                             "how_much_distance_do_you_commute_in_public_transport_per_week_on_average")
-    public_km_per_month = public_km_per_week * CONFIG["constants"]["WEEKS_PER_MONTH"]
-    public_transport_emissions = public_km_per_month * CONFIG["factors"]["EF_PUBLIC_TRANSPORT_PER_KM"]
+    public_km_per_month = public_km_per_week * tables.scalars["WEEKS_PER_MONTH"]
+    public_transport_emissions = public_km_per_month * tables.scalars["EF_PUBLIC_TRANSPORT_PER_KM"]
 
     # Flights
     flight_emissions = 0
     num_flights = int(_get_numeric_input(data, "how_many_flights_have_you_taken_in_the_past_year"))
     for i in range(1, num_flights + 1):
-        flight_type = data.get(f"flight_{i}_type", "Short-haul (<3h)")
-        km = CONFIG["factors"]["EF_FLIGHT"].get(flight_type, 2000)
-        flight_emissions += (km * CONFIG["factors"]["EF_FLIGHT_PER_KM"]) / CONFIG["constants"]["MONTHS_PER_YEAR"]
+        km = tables["flight"].lookup(data, f"flight_{i}_type")
+        flight_emissions += (km * tables.scalars["EF_FLIGHT_PER_KM"]) / months_per_year
 
     return vehicle_emissions + public_transport_emissions + flight_emissions
 
 
-def _calculate_personal_diet(data: dict) -> float:
+def _calculate_personal_diet(data: dict, tables: FactorTables) -> float:
     """Calculates PERSONAL emissions from diet."""
-    diet_type = data.get("what_best_describes_your_diet", "Omnivore")
-    diet_emissions = CONFIG["factors"]["EF_DIET"].get(diet_type, CONFIG["factors"]["EF_DIET"]["Omnivore"])
-
-    waste_level = data.get("how_much_food_do_you_waste", "Average")
-    packaging_level = data.get("how_much_of_your_food_is_packaged_processed", "Average")
-    food_multiplier = (CONFIG["multipliers"]["FOOD_WASTE"].get(waste_level, 1.2) *
-                       CONFIG["multipliers"]["FOOD_PACKAGING"].get(packaging_level, 1.3))
+    diet_emissions = tables["diet"].lookup(data, "what_best_describes_your_diet")
+    food_multiplier = (tables["food_waste"].lookup(data, "how_much_food_do_you_waste") *
+                       tables["food_packaging"].lookup(data, "how_much_of_your_food_is_packaged_processed"))
 
     return diet_emissions * food_multiplier
 
 
-def _calculate_household_waste(data: dict, household_size: int) -> float:
+def _calculate_household_waste(data: dict, household_size: int, tables: FactorTables) -> float:
     """Calculates TOTAL emissions for the household from landfill waste."""
-    total_waste = (CONFIG["constants"]["WASTE_PER_PERSON_PER_DAY_KG"] *
-                   household_size * CONFIG["constants"]["DAYS_PER_MONTH"])
+    total_waste = (tables.scalars["WASTE_PER_PERSON_PER_DAY_KG"] *
+                   household_size * tables.scalars["DAYS_PER_MONTH"])
 
     diversion_rate = 0
     for mat in ["glass", "metal", "plastic", "paper"]:
         if data.get(f"do_you_recycle_the_following_check_all_that_apply_{mat}") == "on":
-            diversion_rate += CONFIG["constants"]["RECYCLING_DIVERSION_PER_ITEM"]
+            diversion_rate += tables.scalars["RECYCLING_DIVERSION_PER_ITEM"]
     if data.get("do_you_compost_food_waste") in ["Some", "All"]:
-        diversion_rate += CONFIG["constants"]["COMPOST_DIVERSION"]
+        diversion_rate += tables.scalars["COMPOST_DIVERSION"]
 
     landfill_waste = total_waste * (1 - diversion_rate)
-    return landfill_waste * CONFIG["factors"]["EF_WASTE_LANDFILL"]
+    return landfill_waste * tables.scalars["EF_WASTE_LANDFILL"]
 
 
-def _calculate_personal_consumption(data: dict) -> float:
+def _calculate_personal_consumption(data: dict, tables: FactorTables) -> float:
     """Calculates PERSONAL emissions from general consumption (shopping)."""
-    shopping_freq = data.get("how_often_do_you_buy_new_clothes_electronics_or_appliances", "Sometimes")
-    return CONFIG["multipliers"]["SHOPPING"].get(shopping_freq, 100)
+    return tables["shopping"].lookup(data, "how_often_do_you_buy_new_clothes_electronics_or_appliances")
 
 
-def _calculate_household_water(data: dict) -> float:
+def _calculate_household_water(data: dict, tables: FactorTables) -> float:
     """Calculates TOTAL emissions for the household from water usage."""
     total_water_litres = _get_numeric_input(data, "how_much_water_does_your_household_use_per_month_in_litres")
-    return total_water_litres * CONFIG["factors"]["EF_WATER_PER_LITRE"]
+    return total_water_litres * tables.scalars["EF_WATER_PER_LITRE"]
 
 
 # --- Main Function ---
@@ -140,20 +102,21 @@ def calculate_personal_carbon_footprint(data: dict) -> dict:
     """
     Calculates a monthly carbon footprint for one person, accounting for shared household emissions.
     """
+    tables = get_factor_tables()
     household_size = int(_get_numeric_input(data, "how_many_people_are_in_your_household",
-                                            CONFIG["constants"]["HOUSEHOLD_SIZE_DEFAULT"]))
+                                            tables.scalars["HOUSEHOLD_SIZE_DEFAULT"]))
     # Ensure household_size is at least 1 to prevent division by zero
     household_size = max(1, household_size)
 
     # 1. Calculate total household emissions for shared categories
-    household_energy_emissions = _calculate_household_energy(data)
-    household_waste_emissions = _calculate_household_waste(data, household_size)
-    household_water_emissions = _calculate_household_water(data)
+    household_energy_emissions = _calculate_household_energy(data, tables)
+    household_waste_emissions = _calculate_household_waste(data, household_size, tables)
+    household_water_emissions = _calculate_household_water(data, tables)
 
     # 2. Calculate personal emissions for individual categories
-    personal_transport_emissions = _calculate_personal_transportation(data)
-    personal_diet_emissions = _calculate_personal_diet(data)
-    personal_consumption_emissions = _calculate_personal_consumption(data)
+    personal_transport_emissions = _calculate_personal_transportation(data, tables)
+    personal_diet_emissions = _calculate_personal_diet(data, tables)
+    personal_consumption_emissions = _calculate_personal_consumption(data, tables)
 
     # 3. Create the final breakdown, assigning a personal share of household emissions
     breakdown = {
@@ -167,7 +130,7 @@ def calculate_personal_carbon_footprint(data: dict) -> dict:
 
     # 4. Sum up and apply offsets
     total_emissions_before_offset = sum(breakdown.values())
-    offset_percent = CONFIG["constants"]["OFFSET_PERCENTAGE"] if data.get(
+    offset_percent = tables.scalars["OFFSET_PERCENTAGE"] if data.get(
         "do_you_offset_your_carbon_emissions") == "Yes" else 0
     total_emissions_after_offset = total_emissions_before_offset * (1 - offset_percent)
 
@@ -190,6 +153,215 @@ def calculate_personal_carbon_footprint(data: dict) -> dict:
     }
 
 
+# --- Batch Function ---
+
+def _numeric_column(surveys: list, key: str, default: float = 0.0) -> np.ndarray:
+    """Encodes a numeric answer of every survey as a float column (same rules as _get_numeric_input)."""
+    values = [data.get(key, default) for data in surveys]
+    # NumPy would read None as NaN and nested lists as extra dimensions, so only plain
+    # numbers and strings take the fast path; anything else is coerced value by value
+    if all(isinstance(value, (int, float, str)) for value in values):
+        try:
+            return np.array(values, dtype=float)
+        except (ValueError, TypeError):
+            pass
+    return np.array([_get_numeric_input(data, key, default) for data in surveys], dtype=float)
+
+
+def _count_column(surveys: list, key: str, default: float = 0.0) -> np.ndarray:
+    """Encodes a count answer of every survey as an integer column, truncating like int()."""
+    values = _numeric_column(surveys, key, default)
+    if not np.isfinite(values).all():
+        # Let int() raise the same error the scalar function would
+        [int(value) for value in values.tolist()]
+    return values.astype(np.int64)
+
+
+def _factor_column(surveys: list, key: str, table) -> np.ndarray:
+    """Encodes a categorical answer of every survey and returns the column of its factors."""
+    return table.array[table.encode(surveys, key)]
+
+
+def _flag_column(surveys: list, key: str, accepted: tuple) -> np.ndarray:
+    """Encodes whether each survey's answer is one of the accepted values as a boolean column."""
+    return np.array([data.get(key) in accepted for data in surveys], dtype=bool)
+
+
+def _round_column(values: np.ndarray, ndigits: int) -> list:
+    """
+    Rounds a column the way round() does and returns Python floats.
+
+    rint(x * 10**n) / 10**n gives the same float as round() unless x * 10**n sits
+    next to a .5 tie, where its own rounding error could flip the result; those
+    values (and very large ones) are rounded with round() instead.
+    """
+    scale = 10 ** ndigits
+    with np.errstate(invalid="ignore"):
+        scaled = values * scale
+        rounded = np.rint(scaled) / scale
+        unsafe = ~(np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) > 1e-6) | (np.abs(scaled) >= 1e9)
+    rounded = rounded.tolist()
+    for row in np.flatnonzero(unsafe).tolist():
+        rounded[row] = round(float(values[row]), ndigits)
+    return rounded
+
+
+def _sum_items(surveys: list, counts: np.ndarray, item_emissions) -> np.ndarray:
+    """
+    Sums the emissions of the numbered items (vehicles, flights) of every survey.
+
+    Item slot i is computed at once for all surveys that have at least i items, and
+    slots are added in order so every total matches the scalar loop.
+    """
+    totals = np.zeros(len(surveys))
+    for i in range(1, int(counts.max(initial=0)) + 1):
+        rows = np.flatnonzero(counts >= i)
+        totals[rows] += item_emissions([surveys[row] for row in rows.tolist()], i)
+    return totals
+
+
+def _calculate_footprint_columns(surveys: list) -> dict:
+    """
+    Encodes the surveys into columnar NumPy arrays and computes every category for
+    all of them in a single pass. Returns the unformatted per-survey columns.
+    """
+    size = len(surveys)
+    tables = get_factor_tables()
+    constants = tables.scalars
+
+    household_size = np.maximum(1, _count_column(surveys, "how_many_people_are_in_your_household",
+                                                 constants["HOUSEHOLD_SIZE_DEFAULT"]))
+
+    # 1. Household energy
+    electricity_kwh = _numeric_column(surveys, "how_much_electricity_does_your_household_use_per_month")
+    ef_electricity = _factor_column(surveys, "is_your_electricity_from_renewable_sources", tables["electricity"])
+    heating_percent = _numeric_column(
+        surveys, "what_percentage_of_your_monthly_electricity_consumption_do_you_think_is_used_for_heating")
+    ef_heating = _factor_column(surveys, "what_is_your_primary_heating_source", tables["heating"])
+    household_energy = (electricity_kwh * ef_electricity +
+                        electricity_kwh * (heating_percent / 100) * ef_heating)
+
+    # 2. Personal transportation
+    vehicle_emissions = _sum_items(
+        surveys, _count_column(surveys, "how_many_vehicles_are_in_your_household"),
+        lambda rows, i: (_numeric_column(rows, f"vehicle_{i}_mileage") *
+                         _factor_column(rows, f"vehicle_{i}_type", tables["vehicle"])) / constants["MONTHS_PER_YEAR"]
+    )
+    public_km_per_week = _numeric_column(
+        surveys, "how_much_distance_do_you_commute_in_public_transport_per_week_on_average")
+    public_transport_emissions = (public_km_per_week * constants["WEEKS_PER_MONTH"] *
+                                  constants["EF_PUBLIC_TRANSPORT_PER_KM"])
+    flight_emissions = _sum_items(
+        surveys, _count_column(surveys, "how_many_flights_have_you_taken_in_the_past_year"),
+        lambda rows, i: (_factor_column(rows, f"flight_{i}_type", tables["flight"]) *
+                         constants["EF_FLIGHT_PER_KM"]) / constants["MONTHS_PER_YEAR"]
+    )
+    transportation = vehicle_emissions + public_transport_emissions + flight_emissions
+
+    # 3. Personal diet
+    diet = _factor_column(surveys, "what_best_describes_your_diet", tables["diet"])
+    food_multiplier = (
+        _factor_column(surveys, "how_much_food_do_you_waste", tables["food_waste"]) *
+        _factor_column(surveys, "how_much_of_your_food_is_packaged_processed", tables["food_packaging"])
+    )
+    diet = diet * food_multiplier
+
+    # 4. Household waste
+    diversion_rate = np.zeros(size)
+    for mat in ["glass", "metal", "plastic", "paper"]:
+        recycles = _flag_column(surveys, f"do_you_recycle_the_following_check_all_that_apply_{mat}", ("on",))
+        diversion_rate[recycles] += constants["RECYCLING_DIVERSION_PER_ITEM"]
+    composts = _flag_column(surveys, "do_you_compost_food_waste", ("Some", "All"))
+    diversion_rate[composts] += constants["COMPOST_DIVERSION"]
+    total_waste = constants["WASTE_PER_PERSON_PER_DAY_KG"] * household_size * constants["DAYS_PER_MONTH"]
+    household_waste = total_waste * (1 - diversion_rate) * constants["EF_WASTE_LANDFILL"]
+
+    # 5. Personal consumption and household water
+    consumption = _factor_column(surveys, "how_often_do_you_buy_new_clothes_electronics_or_appliances",
+                                 tables["shopping"])
+    household_water = (_numeric_column(surveys, "how_much_water_does_your_household_use_per_month_in_litres") *
+                       constants["EF_WATER_PER_LITRE"])
+
+    breakdown = {
+        "home_energy": household_energy / household_size,
+        "transportation": transportation,
+        "diet": diet,
+        "waste": household_waste / household_size,
+        "consumption": consumption,
+        "water": household_water / household_size,
+    }
+
+    # 6. Sum up in breakdown order and apply offsets
+    total_before_offset = np.zeros(size)
+    for values in breakdown.values():
+        total_before_offset = total_before_offset + values
+    offset_applied = _flag_column(surveys, "do_you_offset_your_carbon_emissions", ("Yes",))
+    offset_percent = np.where(offset_applied, constants["OFFSET_PERCENTAGE"], 0)
+    total_after_offset = total_before_offset * (1 - offset_percent)
+
+    return {
+        "breakdown": breakdown,
+        "total_before_offset": total_before_offset,
+        "total_after_offset": total_after_offset,
+        "offset_applied": offset_applied,
+        "household_size": household_size,
+    }
+
+
+def calculate_personal_carbon_footprint_batch(surveys: list) -> list:
+    """
+    Calculates calculate_personal_carbon_footprint for many surveys at once.
+
+    Results are returned in input order and are identical to calling the scalar
+    function on each survey.
+    """
+    if not surveys:
+        return []
+
+    columns = _calculate_footprint_columns(surveys)
+    breakdown = columns["breakdown"]
+    total_before_offset = columns["total_before_offset"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentages = {k: (v / total_before_offset * 100).tolist() for k, v in breakdown.items()}
+
+    # Format the final output
+    rounded_breakdown = {k: _round_column(v, 2) for k, v in breakdown.items()}
+    rounded_total = _round_column(columns["total_after_offset"], 2)
+    no_emissions = (total_before_offset == 0).tolist()
+    offset_applied = columns["offset_applied"].tolist()
+    household_size = columns["household_size"].tolist()
+    categories = list(breakdown)
+
+    results = []
+    for row in range(len(surveys)):
+        if no_emissions[row]:
+            percent_breakdown = {k: "0.0%" for k in categories}
+        else:
+            percent_breakdown = {k: f"{percentages[k][row]:.1f}%" for k in categories}
+
+        results.append({
+            "summary": {
+                "personal_monthly_co2e_kg": rounded_total[row],
+                "offsets_applied": offset_applied[row],
+                "household_size_used": household_size[row]
+            },
+            "breakdown_kg_co2e": {k: rounded_breakdown[k][row] for k in categories},
+            "category_percentages": percent_breakdown
+        })
+    return results
+
+
+def calculate_personal_monthly_co2e_batch(surveys: list) -> list:
+    """
+    Returns only summary.personal_monthly_co2e_kg for each survey, skipping the
+    per-user breakdown dicts. Used when just the stored footprint is needed.
+    """
+    if not surveys:
+        return []
+    return _round_column(_calculate_footprint_columns(surveys)["total_after_offset"], 2)
+
+
 daily_survey_data = {
     # Transport choices for the day
     "transport_mode": "Bicycle",  # Options: "Bicycle", "Walk", "Public Transport", "Personal Vehicle", "Worked from Home"
@@ -433,6 +605,80 @@ def calculate_initial_sustainability_score(survey_data: dict) -> dict:
     }
 
 
+# --- Memoized Survey Calculations ---
+
+# Maximum number of distinct surveys remembered per cached calculator
+SURVEY_CACHE_SIZE = 1024
+
+
+def survey_fingerprint(data: dict) -> str:
+    """Returns a canonical hash of survey answers (independent of key order and formatting)."""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class SurveyResultCache:
+    """A thread-safe, bounded LRU cache with hit/miss counters."""
+
+    def __init__(self, maxsize: int = SURVEY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._entries), "maxsize": self.maxsize}
+
+
+def memoize_survey(func):
+    """
+    Caches a survey calculator by survey fingerprint and factor-table version.
+    Callers get a copy of the cached result, so they may modify it freely.
+    """
+    cache = SurveyResultCache()
+
+    @functools.wraps(func)
+    def wrapper(data: dict) -> dict:
+        key = (get_factor_tables().version, survey_fingerprint(data))
+        result = cache.get(key)
+        if result is None:
+            result = func(data)
+            cache.set(key, result)
+        return copy.deepcopy(result)
+
+    wrapper.cache = cache
+    wrapper.cache_info = cache.info
+    return wrapper
+
+
+calculate_personal_carbon_footprint_cached = memoize_survey(calculate_personal_carbon_footprint)
+calculate_initial_sustainability_score_cached = memoize_survey(calculate_initial_sustainability_score)
+
 
 def check_achievements(user):
     now_aware = timezone.now()
@@ -1,36 +1,35 @@
+import copy
 from datetime import datetime, timedelta, time
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponseRedirect
+from django.http import HttpResponse, JsonResponse, HttpResponseRedirect
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.csrf import csrf_protect, csrf_exempt
 from django.views.decorators.http import require_http_methods
-from .models import User, Community, CommunityMembership, CommunityMessage, CommunityTask, TaskParticipation
+from .models import User, Community, CommunityMembership, CommunityMessage, CommunityTask, TaskParticipation, Habit, HabitCheckIn
 from django.db import IntegrityError
 from django.contrib.auth import login, authenticate, logout
 from django.urls import reverse
 from .utils import *
 from uuid import uuid4
-from google import genai
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
-from django.views.decorators.http import require_GET
+from django.views.decorators.http import require_GET, condition
+from django.views.decorators.cache import cache_control
 from django.conf import settings
+from django.utils import timezone
+from asgiref.sync import sync_to_async
 from .models import PushSubscription
 from .firebase_service import FCMService
+from .ai_cache import get_cached, get_or_generate, habits_fingerprint
+from .checkin_scoring import annotate_questions, score_answers
+from .llm import LLMUnavailable, get_llm
+from . import dashboard_cache, outbox
+from .footprints import record_footprint, weekly_series
+from .notification_topics import broadcast_slot, move_topic, reminder_topic
 
 
 
-def update_latest_values(user, new_value):
-    if not user.last_8_footprint_measurements:
-        return [new_value] * 8
-    global_data_list = user.last_8_footprint_measurements
-    if len(global_data_list) >= 8:
-        global_data_list.pop(0) # Removes the element at index 0
-
-    global_data_list.append(new_value)
-
-    return global_data_list
-
 @login_required
 def index(request):
     if not request.user.survey_answered or request.user.days_since_last_survey > 7:
@@ -149,11 +148,12 @@ def survey(request):
         data = json.loads(request.body)
         user.user_data = data
         user.survey_answered = True
-        user.carbon_footprint = calculate_personal_carbon_footprint(data)['summary']['personal_monthly_co2e_kg']
-        user.sustainability_score = calculate_initial_sustainability_score(user.user_data)[
+        footprint = calculate_personal_carbon_footprint_cached(data)['summary']['personal_monthly_co2e_kg']
+        user.carbon_footprint = footprint
+        user.sustainability_score = calculate_initial_sustainability_score_cached(user.user_data)[
             'initial_sustainability_score']
-        user.last_8_footprint_measurements = update_latest_values(user, calculate_personal_carbon_footprint(data)['summary']['personal_monthly_co2e_kg'])
         user.save()
+        record_footprint(user, footprint)
         return JsonResponse({'status': 'success', 'message': 'Survey submitted successfully'}, status=200)
 
     if request.user.survey_answered:
@@ -161,159 +161,232 @@ def survey(request):
     return render(request, "survey_form.html")
 
 
+def _user_data_etag(request):
+    user = request.user
+    # The date is part of the tag: habits_today and the weekly footprint series change at midnight
+    return f"{user.pk}-{user.data_version}-{user.data_updated_at.timestamp():.6f}-{datetime.now().date()}"
+
+
+def _user_data_last_modified(request):
+    midnight = timezone.make_aware(datetime.combine(datetime.now().date(), time.min))
+    return max(request.user.data_updated_at, midnight)
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_user_data_etag, last_modified_func=_user_data_last_modified)
 def get_user_data(request):
-    if request.user.last_checkin < datetime.now().date():
-        request.user.habits_today = 0
-        request.user.save()
-
-    return JsonResponse({'status': 'success', 'data': {
-        "username": request.user.username,
-        "streak": request.user.streak,
-        "carbon_footprint": request.user.carbon_footprint,
-        "sustainability_score": request.user.sustainability_score,
-        "habits": request.user.habits,
-        "last_checkin_date": request.user.last_checkin,
-        "habits_today": request.user.habits_today,
-        "achievements": request.user.achievements,
-        "last_8_footprints": request.user.last_8_footprint_measurements,
-    }})
+    # Served from the per-user snapshot while the user's data (and the day) is unchanged
+    etag = _user_data_etag(request)
+    body = dashboard_cache.get_snapshot(request.user.pk, etag)
+    if body is None:
+        # Read-only: the daily reset of habits_today is derived from last_checkin, not saved
+        body = json.dumps({'status': 'success', 'data': {
+            "username": request.user.username,
+            "streak": request.user.streak,
+            "carbon_footprint": request.user.carbon_footprint,
+            "sustainability_score": request.user.sustainability_score,
+            "habits": request.user.habit_list(),
+            "last_checkin_date": request.user.last_checkin,
+            "habits_today": request.user.habits_completed_today(),
+            "achievements": request.user.achievements,
+            "last_8_footprints": weekly_series(request.user),
+        }}, cls=DjangoJSONEncoder).encode()
+        dashboard_cache.store_snapshot(request.user.pk, etag, body)
+    return HttpResponse(body, content_type='application/json')
+
+
+def _habit_id(data):
+    try:
+        return int(data.get('habit_id'))
+    except (TypeError, ValueError):
+        return None
 
 
 @login_required
 def save_habit(request):
     data = json.loads(request.body)
-    habit_id = uuid4()
-    habit = {
-        "id": str(habit_id.int)[:5],
-        "text": data.get('habit_text')
-    }
-    request.user.habits.append(habit)
-    request.user.save()
-    return JsonResponse({'status': 'success', 'message': 'Habit saved successfully'})
+    habit_text = (data.get('habit_text') or '').strip()
+    if not habit_text:
+        return JsonResponse({'status': 'error', 'message': 'Habit text is required'}, status=400)
+
+    habit = Habit.objects.create(user=request.user, text=habit_text)
+    User.touch_data([request.user.id])
+    return JsonResponse({'status': 'success', 'message': 'Habit saved successfully', 'habit_id': str(habit.id)})
 
 
 @login_required
 def update_habit(request):
     data = json.loads(request.body)
-    habit_id_to_update = str(data.get('habit_id'))  # This is the 'id' within the habit dictionary
-    new_habit_text = data.get('habit_text')
-
-    # Find the habit by its 'id' in the list
-    found = False
-    for habit in request.user.habits:
-        if habit.get('id') == habit_id_to_update:
-            habit['text'] = new_habit_text
-            found = True
-            break  # Exit loop once the habit is found and updated
-
-    if found:
-        request.user.save()  # Save the user object to persist changes to the habits list
+    new_habit_text = (data.get('habit_text') or '').strip()
+    if not new_habit_text:
+        return JsonResponse({'status': 'error', 'message': 'Habit text is required'}, status=400)
+
+    # Single-row UPDATE, scoped to the user's own habits
+    updated = Habit.objects.filter(id=_habit_id(data), user=request.user).update(
+        text=new_habit_text, updated_at=timezone.now(),
+    )
+    if updated:
+        User.touch_data([request.user.id])
         return JsonResponse({'status': 'success', 'message': 'Habit updated successfully'})
     else:
-        return JsonResponse({'status': 'error', 'message': 'Habit not found'}, status=500)
+        return JsonResponse({'status': 'error', 'message': 'Habit not found'}, status=404)
 
 
 @login_required
 def delete_habit(request):
     data = json.loads(request.body)
-    habit_id_to_delete = str(data.get('habit_id'))  # Ensure it's a string for comparison
-
-    # Create a new list excluding the habit to be deleted
-    # This is a common and safe way to remove items from a list while iterating
-    initial_habits_count = len(request.user.habits)
-    request.user.habits = [
-        habit for habit in request.user.habits
-        if habit.get('id') != habit_id_to_delete
-    ]
-
-    if len(request.user.habits) < initial_habits_count:
-        request.user.save()  # Save changes if a habit was actually removed
+
+    deleted, _ = Habit.objects.filter(id=_habit_id(data), user=request.user).delete()
+    if deleted:
+        User.touch_data([request.user.id])
         return JsonResponse({'status': 'success', 'message': 'Habit deleted successfully'})
     else:
         return JsonResponse({'status': 'error', 'message': 'Habit not found'}, status=404)
 
 
 @login_required
-def get_questions(request):
-    if request.method != "POST":
-        return HttpResponseRedirect(reverse('index'))
+@require_http_methods(["POST"])
+def check_in_habit(request):
+    """Record whether a habit was completed today (or on the given 'date', YYYY-MM-DD)"""
+    data = json.loads(request.body)
+    try:
+        date = datetime.strptime(data['date'], '%Y-%m-%d').date() if data.get('date') else timezone.localdate()
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+
+    habit_id = _habit_id(data)
+    if not Habit.objects.filter(id=habit_id, user=request.user).exists():
+        return JsonResponse({'status': 'error', 'message': 'Habit not found'}, status=404)
+
+    HabitCheckIn.objects.update_or_create(
+        habit_id=habit_id, date=date, defaults={'completed': bool(data.get('completed', True))},
+    )
+    return JsonResponse({'status': 'success', 'message': 'Habit check-in saved successfully'})
+
+
+@login_required
+def get_habit_history(request):
+    """Check-ins of one habit over the last 'days' days (default 30) with its streak and completion rate"""
+    try:
+        habit = Habit.objects.get(id=_habit_id(request.GET), user=request.user)
+    except Habit.DoesNotExist:
+        return JsonResponse({'status': 'error', 'message': 'Habit not found'}, status=404)
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 365)
+    except ValueError:
+        days = 30
+
+    today = timezone.localdate()
+    checkins = habit.checkins.filter(date__gt=today - timedelta(days=days), date__lte=today)
+    return JsonResponse({'status': 'success', 'data': {
+        'habit_id': str(habit.id),
+        'text': habit.text,
+        'checkins': [
+            {'date': date.isoformat(), 'completed': completed}
+            for date, completed in checkins.values_list('date', 'completed')
+        ],
+        'streak': habit.current_streak(today),
+        'completion_rate': habit.completion_rate(today, days),
+    }})
 
-    sample_questions = [
-        {
-            "id": "q1",
-            "question": "How did you commute today?",
-            "options": [
-                {"text": "🚶 Walk/Cycle", "value": "Walk/Cycle"},
-                {"text": "🚌 Public Transport", "value": "Public Transport"},
-                {"text": "🚗 Car (single)", "value": "Car (single)"},
-                {"text": "👥 Car (carpool)", "value": "Car (carpool)"},
-            ],
-        },
-        {
-            "id": "q2",
-            "question": "Did you consume meat today?",
-            "options": [
-                {"text": "🥩 Yes", "value": "Yes"},
-                {"text": "🥬 No (or Plant-based)", "value": "No"},
-            ],
-        },
-        {
-            "id": "q3",
-            "question": "Did you unplug unused electronics?",
-            "options": [
-                {"text": "✅ Yes, all", "value": "Yes, all"},
-                {"text": "⚡ Some", "value": "Some"},
-                {"text": "❌ No", "value": "No"},
-            ],
-        },
-    ]
-
-    client = genai.Client()
 
+SAMPLE_QUESTIONS = [
+    {
+        "id": "q1",
+        "question": "How did you commute today?",
+        "options": [
+            {"text": "🚶 Walk/Cycle", "value": "Walk/Cycle"},
+            {"text": "🚌 Public Transport", "value": "Public Transport"},
+            {"text": "🚗 Car (single)", "value": "Car (single)"},
+            {"text": "👥 Car (carpool)", "value": "Car (carpool)"},
+        ],
+    },
+    {
+        "id": "q2",
+        "question": "Did you consume meat today?",
+        "options": [
+            {"text": "🥩 Yes", "value": "Yes"},
+            {"text": "🥬 No (or Plant-based)", "value": "No"},
+        ],
+    },
+    {
+        "id": "q3",
+        "question": "Did you unplug unused electronics?",
+        "options": [
+            {"text": "✅ Yes, all", "value": "Yes, all"},
+            {"text": "⚡ Some", "value": "Some"},
+            {"text": "❌ No", "value": "No"},
+        ],
+    },
+]
+
+
+def questions_cache_key(habits):
+    return f"questions:{habits_fingerprint(habits)}"
+
+
+def generate_questions(habits):
+    """Ask Gemini for check-in questions covering each of the given habits"""
     prompt = f"""
     Give me a few questions based on user's habits to access their habits which they created to reduce carbon footprint.
      **Do not include any explanations, formatting, double quotes or backticks and make sure there is atleast one question related to each habit.
       Only provide a raw RFC8259 compliant JSON array.
-     ** Here is an output example: {sample_questions}
-     ** Here is the list of user's habits: {request.user.habits}
+     ** Here is an output example: {SAMPLE_QUESTIONS}
+     ** Here is the list of user's habits: {habits}
     """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-    )
+    response = get_llm().generate(prompt)
+
+    return annotate_questions(json.loads(response))
 
-    return JsonResponse({'status': 'success', 'data': json.loads(response.text)})
 
 @login_required
-def submit_questionnaire(request):
+def get_questions(request):
     if request.method != "POST":
         return HttpResponseRedirect(reverse('index'))
 
-    data = json.loads(request.body)
-    client = genai.Client()
+    habits = request.user.habit_list()
+    try:
+        questions = get_or_generate(
+            questions_cache_key(habits),
+            lambda: generate_questions(habits),
+            ttl=settings.AI_QUESTIONS_TTL,
+            stale_ttl=settings.AI_QUESTIONS_STALE_TTL,
+        )
+    except LLMUnavailable:
+        questions = annotate_questions(copy.deepcopy(SAMPLE_QUESTIONS))
+
+    return JsonResponse({'status': 'success', 'data': questions})
+
 
-    sample_output = {
-        "score": 5
-    }
+def judge_answers(answers):
+    """Ask Gemini whether each (question, answer) pair helps reduce the user's carbon footprint"""
+    sample_output = [1, 0]
 
     prompt = f"""
-    Given data of survey conducted on a user's habits to access their habits which they created to reduce carbon footprint.
-    Give each response to question a score of 1 if the response helps their goal(reduce carbon footprint) and 0 if it does not.
-    Return the total score of the survey in JSON format
-     **Do not include any explanations, formatting, or backticks and make sure there is atleast one question related to each habit.
-      Only provide a raw RFC8259 compliant JSON array.
-      ** Here is the data: {data}
+    Given (question, answer) pairs from a survey conducted on a user's habits to access their habits which they created to reduce carbon footprint.
+    Give each answer a score of 1 if the answer helps their goal(reduce carbon footprint) and 0 if it does not.
+    Return the scores in the same order as the pairs.
+     **Do not include any explanations, formatting, or backticks.
+      Only provide a raw RFC8259 compliant JSON array of integers.
+      ** Here are the pairs: {answers}
      ** Here is an output example: {sample_output}
     """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-    )
+    response = get_llm().generate(prompt)
+
+    return [int(verdict) for verdict in json.loads(response)]
 
-    score = int(json.loads(response.text)['score'])
+
+@login_required
+def submit_questionnaire(request):
+    if request.method != "POST":
+        return HttpResponseRedirect(reverse('index'))
+
+    data = json.loads(request.body)
+    questions = get_cached(questions_cache_key(request.user.habit_list()))
+    score = score_answers(data, questions, judge=judge_answers)
 
     if score:
         request.user.sustainability_score += score
@@ -335,45 +408,56 @@ def submit_questionnaire(request):
     return JsonResponse({'status': 'success', 'message': 'Questionnaire submitted successfully'})
 
 
-@login_required
-def get_suggestions(request):
-    sample_suggestions = [
-        {
-            "title": "Reduce Meat Consumption",
-            "reason":
-                "Producing meat requires significant resources. Opting for plant-based meals reduces your environmental impact.",
-            "carbonReduction": "5-10 kg CO2e/month",
-        },
-        {
-            "title": "Switch to LED Light Bulbs",
-            "reason":
-                "LEDs consume up to 85% less electricity than incandescent bulbs, lowering your carbon emissions and energy bills.",
-            "carbonReduction": "3-5 kg CO2e/month",
-        },
-        {
-            "title": "Compost Food Waste",
-            "reason":
-                "Composting diverts food from landfills, where it produces methane, a potent greenhouse gas.",
-            "carbonReduction": "2-4 kg CO2e/month",
-        },
-    ]
-
-    # return JsonResponse({'status': 'success', 'data': "Hello, world"})
-    client = genai.Client()
-
+SAMPLE_SUGGESTIONS = [
+    {
+        "title": "Reduce Meat Consumption",
+        "reason":
+            "Producing meat requires significant resources. Opting for plant-based meals reduces your environmental impact.",
+        "carbonReduction": "5-10 kg CO2e/month",
+    },
+    {
+        "title": "Switch to LED Light Bulbs",
+        "reason":
+            "LEDs consume up to 85% less electricity than incandescent bulbs, lowering your carbon emissions and energy bills.",
+        "carbonReduction": "3-5 kg CO2e/month",
+    },
+    {
+        "title": "Compost Food Waste",
+        "reason":
+            "Composting diverts food from landfills, where it produces methane, a potent greenhouse gas.",
+        "carbonReduction": "2-4 kg CO2e/month",
+    },
+]
+
+
+def generate_suggestions(habits):
+    """Ask Gemini for habit suggestions that complement the given habits"""
     prompt = f"""
     Give me a few suggestions of habits to perform to reduce carbon footprint.
      **Do not include any explanations, formatting, or backticks. Only provide a raw RFC8259 compliant JSON array.
-     ** Here is an output example: {sample_suggestions}
-** Here are the user's existing habits: {request.user.habits}
+     ** Here is an output example: {SAMPLE_SUGGESTIONS}
+** Here are the user's existing habits: {habits}
     """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-    )
+    response = get_llm().generate(prompt)
 
-    return JsonResponse({'status': 'success', 'data': json.loads(response.text)})
+    return json.loads(response)
+
+
+@login_required
+def get_suggestions(request):
+    habits = request.user.habit_list()
+    try:
+        suggestions = get_or_generate(
+            f"suggestions:{habits_fingerprint(habits)}",
+            lambda: generate_suggestions(habits),
+            ttl=settings.AI_SUGGESTIONS_TTL,
+            stale_ttl=settings.AI_SUGGESTIONS_STALE_TTL,
+        )
+    except LLMUnavailable:
+        suggestions = SAMPLE_SUGGESTIONS
+
+    return JsonResponse({'status': 'success', 'data': suggestions})
 
 # Push Notification Views
 import json
@@ -383,105 +467,71 @@ from .firebase_service import FCMService
 from datetime import datetime, time
 
 
-# Cron-job.org dispatcher: call this every minute to send scheduled notifications
-@require_GET
-@csrf_exempt  # This is a server-to-server endpoint; we'll protect with a secret instead of CSRF
-def cron_dispatch(request):
-    # Simple bearer-like secret check: /api/cron/dispatch?token=... or Authorization: Bearer ...
+def _cron_authorized(request):
+    # Simple bearer-like secret check: ?token=... or Authorization: Bearer ...
     token = request.GET.get('token') or request.headers.get('Authorization', '').replace('Bearer ', '').strip()
     expected = getattr(settings, 'CRON_SECRET', '')
-    if not expected or token != expected:
+    return bool(expected) and token == expected
+
+
+# Cron-job.org dispatcher: call this every minute to send scheduled notifications.
+# Async so it never waits on FCM: it queues the minute's reminders, hands delivery to a
+# background thread (or to process_outbox workers) and returns the job id right away.
+@require_GET
+@csrf_exempt  # This is a server-to-server endpoint; we'll protect with a secret instead of CSRF
+async def cron_dispatch(request):
+    if not _cron_authorized(request):
         return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=401)
 
     # Use Django timezone utilities so we honor settings.TIME_ZONE
     from django.utils import timezone
-    now = timezone.localtime(timezone.now())
-    current_time = time(hour=now.hour, minute=now.minute)
-    today = now.date()
-
-    # Pick subscriptions scheduled for this minute, active, and not already sent for this exact minute today
-    qs = PushSubscription.objects.filter(
-        is_active=True,
-        notification_time__hour=current_time.hour,
-        notification_time__minute=current_time.minute,
-    ).exclude(
-        last_sent_date=today,
-        last_sent_time=current_time,
-    )
+    now = timezone.localtime(timezone.now()).replace(second=0, microsecond=0)
 
-    total = qs.count()
-    sent = 0
-    failed = 0
-    failed_ids = []
-
-    # Batch by device type/token validity, prefer multicast for efficiency
-    tokens = []
-    subs_by_token = {}
-    for sub in qs:
-        if sub.has_valid_fcm_token():
-            token = sub.get_fcm_token()
-            tokens.append(token)
-            subs_by_token[token] = sub
-        else:
-            failed += 1
-            failed_ids.append(sub.id)
-            
-            
-    client = genai.Client()
+    # Topic mode: one message to the minute's topic, sent on the background thread (it queues the
+    # topic's subscribers per token if it fails); only subscriptions not in the topic are queued below
+    topic = ''
+    if getattr(settings, 'FCM_DISPATCH_MODE', 'batch') == 'topic':
+        topic = reminder_topic(now.time())
+        outbox.run_in_background(broadcast_slot, now)
 
-    prompt = f"""
-                Generate 1 single short, catchy, and engaging notification message strictly to encourage users to fill out the EcoTrack check-in form.
-                EcoTrack is an app that helps users track their sustainability habits and promotes eco-friendly behavior. It includes features like:
-                - Daily surveys to track eco actions 🌱
-                - Personalized sustainability score 📊
-                - AI chatbot to guide users 🤖
-                - Personalized suggestions for greener living 💡
-                - Achievements for completing surveys and taking eco-friendly actions 🎁
-                - Daily streaks kept alive by submitting check-in everyday
-                 Ensure the notifications are:
-                - under 60 characters
-                - Friendly, heartwarming, motivating, and aligned with EcoTrack's eco-conscious mission
-                - Include clear call-to-actions like "Share your thoughts", "fill now", "complete now"
-                - Include relevant emojis for engagement
-                - Highlight rewards or benefits if possible
-                Give the message a human touch, with some warmth, inviting gesture and showing that you care for the user.
-            """
+    # Queue this minute's reminders in the outbox; repeated or concurrent calls queue each one once
+    enqueued = await sync_to_async(outbox.enqueue_slot)(now, skip_topic=topic)
+
+    # Deliver them (and any retries that have come due) here unless separate process_outbox
+    # workers are running; in topic mode this runs after the broadcast and its fallback
+    if getattr(settings, 'OUTBOX_INLINE_DELIVERY', True) and (
+            enqueued or topic or await sync_to_async(outbox.has_due)()):
+        outbox.deliver_in_background()
+
+    job_id = outbox.slot_job_id(now)
+    return JsonResponse({
+        'status': 'success',
+        'job_id': job_id,
+        'status_url': reverse('cron_dispatch_status', args=[job_id]),
+        'time': now.strftime('%H:%M'),
+        'date': now.date().isoformat(),
+        'total_candidates': enqueued,
+        'broadcast_topic': topic or None,
+    }, status=202)
+
+
+@require_GET
+@csrf_exempt
+async def cron_dispatch_status(request, job_id):
+    """Progress of a dispatch job: sent, failed and in-flight reminder counts."""
+    if not _cron_authorized(request):
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=401)
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-        ).text
-    except:
-        response = f"Hey user!, time to track your footprints 🌱"
-
-    title = 'EcoTrack Reminder'
-    body = response
-
-    if tokens:
-        # Send per token to avoid environments where FCM batch (/batch) is blocked or returns 404
-        for t in tokens:
-            ok = FCMService.send_notification(t, title, body, data={'type': 'daily_reminder'})
-            sub = subs_by_token.get(t)
-            if ok:
-                sent += 1
-                if sub:
-                    sub.last_sent_date = today
-                    sub.last_sent_time = current_time
-                    sub.save(update_fields=['last_sent_date', 'last_sent_time', 'updated_at'])
-            else:
-                failed += 1
-                if sub:
-                    failed_ids.append(sub.id)
+        progress = await sync_to_async(outbox.job_progress)(job_id)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid job id'}, status=400)
 
     return JsonResponse({
         'status': 'success',
-        'time': current_time.strftime('%H:%M'),
-        'date': today.isoformat(),
-        'total_candidates': total,
-        'sent': sent,
-        'failed': failed,
-        'failed_ids': failed_ids,
+        'job_id': job_id,
+        'done': progress['in_flight'] == 0,
+        **progress,
     })
 
 
@@ -509,13 +559,6 @@ def subscribe_push(request):
         except ValueError:
             time_obj = datetime.strptime('09:00', '%H:%M').time()
         
-        # Validate FCM token
-        if not FCMService.validate_token(fcm_token):
-            return JsonResponse({
-                'status': 'error',
-                'message': 'Invalid FCM token'
-            }, status=400)
-        
         # Create or update push subscription
         push_subscription, created = PushSubscription.objects.update_or_create(
             user=request.user,
@@ -523,9 +566,13 @@ def subscribe_push(request):
                 'fcm_token': fcm_token,
                 'device_type': device_type,
                 'notification_time': time_obj,
-                'is_active': True
+                'is_active': True,
+                # Checked in the next validate_fcm_tokens batch instead of during the request
+                'token_suspect': True,
             }
         )
+        # Topic membership (FCM_DISPATCH_MODE = 'topic'); on failure sync_reminder_topics catches up
+        move_topic(push_subscription)
         
         return JsonResponse({
             'status': 'success',
@@ -553,6 +600,7 @@ def unsubscribe_push(request):
         push_subscription = PushSubscription.objects.get(user=request.user)
         push_subscription.is_active = False
         push_subscription.save()
+        move_topic(push_subscription)
         
         return JsonResponse({
             'status': 'success',
@@ -600,6 +648,7 @@ def update_notification_time(request):
             push_subscription = PushSubscription.objects.get(user=request.user)
             push_subscription.notification_time = time_obj
             push_subscription.save()
+            move_topic(push_subscription)
             
             return JsonResponse({
                 'status': 'success',
@@ -1,16 +1,30 @@
 #!/usr/bin/env python
 """
-Simple scheduler for daily push notifications.
-This script runs continuously and sends notifications at appropriate times.
-For production, use a proper task scheduler like cron (Linux/Mac) or Task Scheduler (Windows).
+Scheduler daemon for daily push notifications.
+Loads all deliverable subscriptions into a 1440-slot time wheel (one slot per minute
+of the day) and, at every minute boundary, dispatches only a slot that has
+subscriptions, so idle minutes cost no database queries. Dispatching goes through
+the same NotificationOutbox as cron_dispatch: the slot's reminders are enqueued
+(once, however many dispatchers run) and delivered with leases, and failed sends
+are retried when their retry time comes. The wheel is kept fresh from the
+subscription change feed (ecotrack/notification_wheel.py) and fully reloaded every
+--resync minutes. When the feed's cache is not shared with the web processes, the
+daemon instead polls recently updated subscriptions right before each non-empty
+slot and every --poll-interval minutes, so idle minutes still cost no queries
+(a subscription moved to an otherwise empty minute may wait up to --poll-interval
+minutes to be seen). The last fired slot is recorded in a state file; slots missed
+while the daemon was down (or while a slow run overran its minute) are caught up,
+up to --max-catch-up minutes back.
+For production, you can also use a system scheduler (cron / Task Scheduler) instead.
 """
 
+import argparse
+import json
 import os
 import sys
 import time
-import schedule
 import django
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # Add the Django project to the path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -20,35 +34,148 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DjangoProject.settings')
 django.setup()
 
 # Import after Django setup
-from django.core.management import call_command
+from django.conf import settings
+from django.utils import timezone
+from ecotrack import outbox
+from ecotrack.notification_topics import broadcast_slot, reminder_topic
+from ecotrack.notification_wheel import TimeWheel, changed_since, current_feed_seq, feed_is_shared, read_changes
 
 
-def send_notifications():
-    """Send daily notifications using Django management command"""
-    try:
-        print(f"{datetime.now()} - Running daily notifications...")
-        call_command('send_daily_notifications')
-        print(f"{datetime.now()} - Daily notifications completed")
-    except Exception as e:
-        print(f"{datetime.now()} - Error running notifications: {e}")
+class Scheduler:
+    def __init__(self, state_path, resync_minutes, max_catch_up, poll_interval=5):
+        self.state_path = state_path
+        self.resync = timedelta(minutes=resync_minutes)
+        self.max_catch_up = timedelta(minutes=max_catch_up)
+        self.wheel = TimeWheel()
+        self.feed_seq = 0
+        self.loaded_at = None
+        # Earliest retry time of reminders whose send failed
+        self.retry_at = None
+        # A process-local feed cache never sees the web processes' changes, poll the database instead
+        self.poll_database = not feed_is_shared()
+        self.poll_interval = timedelta(minutes=poll_interval)
+        self.polled_at = None
+
+    def reload(self):
+        # Read the feed position (or poll time) first, so changes made during the load are applied afterwards
+        self.feed_seq = current_feed_seq()
+        self.polled_at = timezone.now()
+        self.wheel.load()
+        self.loaded_at = timezone.now()
+        print(f"{datetime.now()} - Loaded {len(self.wheel)} subscriptions into the time wheel")
+
+    def refresh(self, slot):
+        """Apply pending schedule changes (cache reads only), reloading if the feed has a gap."""
+        if timezone.now() - self.loaded_at >= self.resync:
+            self.reload()
+            return
+        if self.poll_database:
+            # Query only for a slot that will be sent anyway, or when the poll interval is up
+            if self.wheel.slot(slot.hour * 60 + slot.minute) or timezone.now() - self.polled_at >= self.poll_interval:
+                since, self.polled_at = self.polled_at, timezone.now()
+                self.wheel.apply(changed_since(since))
+            return
+        self.feed_seq, changes = read_changes(self.feed_seq)
+        if changes is None:
+            print(f"{datetime.now()} - Change feed incomplete, reloading the time wheel")
+            self.reload()
+        else:
+            self.wheel.apply(changes)
+
+    def fire(self, slot):
+        """Send the notifications of one slot (a minute-aligned local datetime)."""
+        minute = slot.hour * 60 + slot.minute
+        count = len(self.wheel.slot(minute))
+        if not count:
+            return
+        print(f"{datetime.now()} - Sending {count} notifications scheduled for {slot:%Y-%m-%d %H:%M}...")
+        try:
+            topic = ''
+            if getattr(settings, 'FCM_DISPATCH_MODE', 'batch') == 'topic':
+                # Topic subscribers are left to the broadcast (which queues them itself if it fails)
+                topic = reminder_topic(minute)
+                broadcast_slot(slot)
+            outbox.enqueue_slot(slot, skip_topic=topic)
+            self.deliver()
+        except Exception as e:
+            print(f"{datetime.now()} - Error running notifications for {slot:%H:%M}: {e}")
+
+    def deliver(self):
+        """Deliver the outbox and remember when its earliest retry comes due."""
+        results = outbox.process()
+        print(f"{datetime.now()} - Sent {len(results['sent'])}, failed {len(results['failed'])}, "
+              f"retrying {len(results['retry'])}")
+        # Retries that were due have just been claimed; keep the earliest one still ahead
+        pending = [row.lease_expires_at for row in results['retry']]
+        if self.retry_at is not None and self.retry_at > timezone.now():
+            pending.append(self.retry_at)
+        self.retry_at = min(pending) if pending else None
+
+    def retry_due(self):
+        if self.retry_at is not None and timezone.now() > self.retry_at:
+            try:
+                self.deliver()
+            except Exception as e:
+                print(f"{datetime.now()} - Error retrying notifications: {e}")
+
+    def load_last_fired(self, now):
+        try:
+            with open(self.state_path) as f:
+                last_fired = datetime.fromisoformat(json.load(f)['last_fired'])
+        except (OSError, ValueError, KeyError):
+            return now - timedelta(minutes=1)
+        return max(last_fired, now - self.max_catch_up - timedelta(minutes=1))
+
+    def save_last_fired(self, slot):
+        with open(self.state_path, 'w') as f:
+            json.dump({'last_fired': slot.isoformat()}, f)
+
+    def run(self):
+        self.reload()
+        # Reminders left queued (or mid-send) by a previous run
+        self.deliver()
+        now = timezone.localtime().replace(second=0, microsecond=0)
+        next_slot = self.load_last_fired(now) + timedelta(minutes=1)
+        if next_slot < now:
+            print(f"{datetime.now()} - Catching up {int((now - next_slot).total_seconds() // 60)} missed minutes")
+
+        while True:
+            # Fire every slot up to the current minute; slots passed during a long run are caught up
+            while next_slot <= timezone.localtime():
+                self.refresh(next_slot)
+                self.fire(next_slot)
+                self.save_last_fired(next_slot)
+                next_slot += timedelta(minutes=1)
+            self.retry_due()
+            time.sleep(min(1.0, max(0.0, (next_slot - timezone.localtime()).total_seconds())))
 
 
 def main():
+    parser = argparse.ArgumentParser(description='EcoTrack notification scheduler daemon')
+    parser.add_argument('--resync', type=int, default=60,
+                        help='Reload all subscriptions from the database every this many minutes')
+    parser.add_argument('--max-catch-up', type=int, default=180,
+                        help='Send slots missed during downtime only if at most this many minutes old')
+    parser.add_argument('--state', default=str(settings.BASE_DIR / '.notification_scheduler.json'),
+                        help='File recording the last fired slot')
+    parser.add_argument('--poll-interval', type=int, default=5,
+                        help='Without a shared change feed cache, poll the database for subscription changes '
+                             'this often (in minutes) besides right before each non-empty slot')
+    args = parser.parse_args()
+
     print("Starting EcoTrack notification scheduler...")
-    
-    # Schedule the notification check to run every minute
-    # The management command will only send notifications to users whose time has come
-    schedule.every().minute.do(send_notifications)
-    
+    scheduler = Scheduler(args.state, args.resync, args.max_catch_up, args.poll_interval)
+    if scheduler.poll_database:
+        print(f"Warning: the '{settings.NOTIFICATION_WHEEL_CACHE_ALIAS}' cache is not shared with the web "
+              f"processes (set NOTIFICATION_CACHE_BACKEND), polling the database for subscription changes "
+              f"every {args.poll_interval} minutes and before each non-empty slot")
     print("Scheduler started. Press Ctrl+C to stop.")
-    
+
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        scheduler.run()
     except KeyboardInterrupt:
         print("\nScheduler stopped.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()